@@ -0,0 +1,161 @@
+import os
+import sys
+import time
+from collections import Counter
+
+import pandas as pd
+
+from summaries import full_queries, normalize_value, timed_query
+
+# Colunas de cada tabela usadas pelas análises de `respostas em SQL.sql`
+ANALYTICS_COLUMNS = {
+    'SalesOrderDetail': ['SalesOrderID', 'ProductID', 'OrderQty'],
+    'SalesOrderHeader': ['SalesOrderID', 'OrderDate', 'CustomerID', 'TotalDue'],
+    'Product': ['ProductID', 'Name', 'DaysToManufacture'],
+    'SpecialOfferProduct': ['ProductID'],
+}
+
+def load_frames(csv_folder, reader=None, chunksize=None):
+    # DataFrames tipados pelo mesmo pipeline da carga (leitor + transform_chunk),
+    # guardando apenas as colunas usadas nas análises
+    from database_loader import csv_readers, discover_csv_files, get_chunk_size, transform_chunk, CSV_READER
+
+    files = discover_csv_files(csv_folder)
+    frames = {}
+    for table_name, columns in ANALYTICS_COLUMNS.items():
+        if table_name not in files:
+            raise ValueError(f"Arquivo da tabela {table_name} não encontrado em {csv_folder}.")
+        file_path, model_class = files[table_name]
+        chunks = csv_readers[reader or CSV_READER](file_path, chunksize or get_chunk_size(table_name), model_class)
+        frames[table_name] = pd.concat([transform_chunk(df, model_class)[columns] for df in chunks], ignore_index=True)
+    return frames
+
+def build_key_indexes(frames):
+    # Índices pela chave primária das tabelas do lado "um" das junções, calculados uma vez;
+    # get_indexer devolve, para cada chave procurada, a posição da linha (-1 se não existir)
+    keys = {
+        'SalesOrderHeader': pd.Index(frames['SalesOrderHeader']['SalesOrderID']),
+        'Product': pd.Index(frames['Product']['ProductID']),
+    }
+    for table_name, index in keys.items():
+        if not index.is_unique:
+            raise ValueError(f"Chave primária duplicada em {table_name}.")
+    return keys
+
+def order_line_counts(frames, keys):
+    counts = frames['SalesOrderDetail']['SalesOrderID'].value_counts(sort=False)
+    counts = counts[counts >= 3]
+    return pd.DataFrame({'SalesOrderID': counts.index, 'QuantidadeLinhas': counts.to_numpy()})
+
+def top_products_by_days_to_manufacture(frames, keys):
+    # A junção com SpecialOfferProduct repete cada linha de detalhe uma vez por oferta do produto,
+    # então a quantidade por produto é multiplicada pelo número de ofertas
+    product = frames['Product']
+    quantity = frames['SalesOrderDetail'].groupby('ProductID', sort=False)['OrderQty'].sum(min_count=1)
+    offers = frames['SpecialOfferProduct']['ProductID'].value_counts(sort=False)
+
+    offer_positions = offers.index.get_indexer(quantity.index)
+    product_positions = keys['Product'].get_indexer(quantity.index)
+    found = (offer_positions >= 0) & (product_positions >= 0)
+    sold = pd.DataFrame({
+        'DaysToManufacture': product['DaysToManufacture'].array[product_positions[found]],
+        'Name': product['Name'].array[product_positions[found]],
+        'TotalSold': quantity.array[found] * offers.to_numpy()[offer_positions[found]],
+    })
+
+    sold = sold.groupby(['DaysToManufacture', 'Name'], dropna=False, sort=False)['TotalSold'].sum(min_count=1).reset_index()
+    # Mesmo desempate da versão SQL: maior quantidade primeiro, depois o nome
+    sold = sold.sort_values(['DaysToManufacture', 'TotalSold', 'Name'], ascending=[True, False, True])
+    sold = sold[sold.groupby('DaysToManufacture', dropna=False).cumcount() < 3]
+    return sold.reset_index(drop=True)
+
+def orders_per_customer(frames, keys):
+    counts = frames['SalesOrderHeader']['CustomerID'].value_counts(dropna=False)
+    return pd.DataFrame({'CustomerID': counts.index, 'NumberOfOrders': counts.to_numpy()})
+
+def quantity_per_product_and_date(frames, keys):
+    detail = frames['SalesOrderDetail']
+    header_positions = keys['SalesOrderHeader'].get_indexer(detail['SalesOrderID'])
+    product_positions = keys['Product'].get_indexer(detail['ProductID'])
+    found = (header_positions >= 0) & (product_positions >= 0)
+    lines = pd.DataFrame({
+        'Name': frames['Product']['Name'].array[product_positions[found]],
+        'ProductID': detail['ProductID'].array[found],
+        'OrderDate': frames['SalesOrderHeader']['OrderDate'].array[header_positions[found]],
+        'OrderQty': detail['OrderQty'].array[found],
+    })
+    totals = (lines.groupby(['Name', 'ProductID', 'OrderDate'], dropna=False, sort=False)['OrderQty']
+              .sum(min_count=1).rename('TotalQuantity').reset_index())
+    totals['OrderDate'] = totals['OrderDate'].dt.date
+    return totals.sort_values(['OrderDate', 'Name'], ignore_index=True)
+
+def large_orders_september_2011(frames, keys):
+    header = frames['SalesOrderHeader']
+    selected = header[
+        (header['OrderDate'] >= pd.Timestamp('2011-09-01'))
+        & (header['OrderDate'] < pd.Timestamp('2011-10-01'))
+        & (header['TotalDue'] > 1000)
+    ]
+    selected = selected[['SalesOrderID', 'OrderDate', 'TotalDue']].sort_values('TotalDue', ascending=False, ignore_index=True)
+    selected['OrderDate'] = selected['OrderDate'].dt.date
+    return selected
+
+# As mesmas análises de summaries.full_queries, com os mesmos nomes
+analytics_queries = {
+    'order_line_counts': order_line_counts,
+    'top_products_by_days_to_manufacture': top_products_by_days_to_manufacture,
+    'orders_per_customer': orders_per_customer,
+    'quantity_per_product_and_date': quantity_per_product_and_date,
+    'large_orders_september_2011': large_orders_september_2011,
+}
+
+def run_analytics(frames):
+    # Resultado e tempo de cada análise; os índices de chave entram no tempo total
+    start = time.perf_counter()
+    keys = build_key_indexes(frames)
+    results = {'key_indexes': (None, time.perf_counter() - start)}
+    for name, query in analytics_queries.items():
+        start = time.perf_counter()
+        results[name] = (query(frames, keys), time.perf_counter() - start)
+    return results
+
+def frame_rows(df):
+    # Linhas no mesmo formato de summaries.timed_query (nulos como None)
+    values = df.astype(object).where(df.notna(), None)
+    return [tuple(normalize_value(value) for value in row) for row in values.itertuples(index=False)]
+
+def compare_with_database(engine, results):
+    # Compara cada resultado com a consulta SQL equivalente, executada no banco já carregado;
+    # a ordem das linhas empatadas no ORDER BY pode variar, então a comparação ignora a ordem
+    matches = {}
+    with engine.connect() as connection:
+        for name in analytics_queries:
+            df, seconds = results[name]
+            database_rows, database_seconds = timed_query(connection, full_queries[name])
+            matches[name] = Counter(frame_rows(df)) == Counter(database_rows)
+            status = 'ok' if matches[name] else 'DIVERGENTE'
+            print(f"{name}: {status} ({len(df)} linhas; pandas {seconds * 1000:.1f} ms, banco {database_seconds * 1000:.1f} ms)")
+    return matches
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from sqlalchemy import create_engine
+
+    load_dotenv()
+    csv_folder = sys.argv[1] if len(sys.argv) > 1 else os.getenv('CSV_FOLDER_PATH')
+    if not csv_folder:
+        print("Uso: python analytics.py <pasta dos CSVs>  (com DATABASE_URL, compara com o banco)")
+        sys.exit(2)
+
+    start = time.perf_counter()
+    frames = load_frames(csv_folder)
+    print(f"Leitura e tipagem: {(time.perf_counter() - start) * 1000:.1f} ms")
+    results = run_analytics(frames)
+    print(f"Índices de chave: {results['key_indexes'][1] * 1000:.1f} ms")
+
+    database_url = os.getenv('DATABASE_URL')
+    if database_url:
+        sys.exit(0 if all(compare_with_database(create_engine(database_url), results).values()) else 1)
+    for name in analytics_queries:
+        df, seconds = results[name]
+        print(f"{name}: {len(df)} linhas em {seconds * 1000:.1f} ms")
@@ -0,0 +1,127 @@
+from contextlib import contextmanager
+
+import pandas as pd
+
+from coercion import CSV_DELIMITER, CSV_DECIMAL, CSV_NA_VALUES, pandas_dtype_for, read_sample, get_datetime_format
+from source_files import compression_for, open_source, split_archive_path
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:  # dependência opcional
+    pa = None
+
+# Tamanho (em bytes) de cada bloco lido e convertido em paralelo pelo Arrow
+ARROW_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Tipos Arrow que viram dtypes anuláveis do pandas, iguais aos do leitor padrão
+def arrow_types_mapper(arrow_type):
+    if pa.types.is_integer(arrow_type):
+        return pd.Int64Dtype()
+    if pa.types.is_boolean(arrow_type):
+        return pd.BooleanDtype()
+    return None
+
+def arrow_schema_for(model_class, column_names):
+    # Esquema Arrow dos DataFrames já tipados pelo carregador, na ordem das colunas recebidas
+    table = model_class.__table__
+    arrow_types = {
+        'Int64': pa.int64(),
+        'boolean': pa.bool_(),
+        'datetime': pa.timestamp('ns'),
+        'float64': pa.float64(),
+        'str': pa.string(),
+    }
+    fields = []
+    for name in column_names:
+        kind = pandas_dtype_for(table.columns[name].type) if name in table.columns else None
+        fields.append(pa.field(name, arrow_types.get(kind, pa.string())))
+    return pa.schema(fields)
+
+def build_arrow_options(model_class, file_path, block_size=ARROW_BLOCK_SIZE):
+    table = model_class.__table__
+    header, sample = read_sample(file_path)
+
+    column_types = {}
+    numeric_columns = []
+    timestamp_parsers = [pa_csv.ISO8601]
+    for position, name in enumerate(header):
+        if name not in table.columns:
+            continue
+        kind = pandas_dtype_for(table.columns[name].type)
+        if kind == 'Int64':
+            column_types[name] = pa.int64()
+        elif kind == 'boolean':
+            column_types[name] = pa.bool_()
+        elif kind == 'datetime':
+            column_types[name] = pa.timestamp('ns')
+            values = [row[position] for row in sample if position < len(row)]
+            date_format = get_datetime_format(table.name, name, values)
+            # O parser ISO8601 já cobre frações de segundo, que o strptime do Arrow não aceita
+            if date_format and '%f' not in date_format and date_format not in timestamp_parsers:
+                timestamp_parsers.append(date_format)
+        elif kind == 'float64':
+            # Lida como texto: os arquivos misturam vírgula e ponto como separador decimal
+            column_types[name] = pa.string()
+            numeric_columns.append(name)
+        else:
+            column_types[name] = pa.string()
+
+    read_options = pa_csv.ReadOptions(block_size=block_size, use_threads=True, encoding='utf8')
+    parse_options = pa_csv.ParseOptions(delimiter=CSV_DELIMITER)
+    convert_options = pa_csv.ConvertOptions(
+        column_types=column_types,
+        null_values=CSV_NA_VALUES,
+        strings_can_be_null=True,
+        timestamp_parsers=timestamp_parsers,
+    )
+    return read_options, parse_options, convert_options, numeric_columns
+
+def convert_numeric_columns(batch, numeric_columns):
+    # Troca vírgula por ponto e converte para double, tudo dentro do Arrow
+    columns = []
+    for name, column in zip(batch.schema.names, batch.columns):
+        if name in numeric_columns:
+            column = pc.cast(pc.replace_substring(column, CSV_DECIMAL, '.'), pa.float64())
+        columns.append(column)
+    return pa.Table.from_arrays(columns, names=batch.schema.names)
+
+@contextmanager
+def arrow_input(file_path):
+    # CSV puro mapeado em memória, sem cópia para buffers do Python; gzip e zstd descomprimidos
+    # pelo próprio Arrow, em fluxo; membros de .zip pelo zipfile
+    if split_archive_path(file_path) is not None:
+        with open_source(file_path) as f:
+            yield f
+    elif compression_for(file_path):
+        with pa.input_stream(file_path, compression=compression_for(file_path)) as f:
+            yield f
+    else:
+        with pa.memory_map(file_path) as f:
+            yield f
+
+def read_csv_batches(file_path, model_class, block_size=ARROW_BLOCK_SIZE):
+    # Lote a lote (RecordBatch), já tipados, sem carregar o arquivo inteiro
+    if pa is None:
+        raise ImportError("O leitor 'arrow' requer o pacote pyarrow (pip install pyarrow).")
+    read_options, parse_options, convert_options, numeric_columns = build_arrow_options(model_class, file_path, block_size)
+    with arrow_input(file_path) as source, pa_csv.open_csv(source, read_options=read_options, parse_options=parse_options, convert_options=convert_options) as reader:
+        for batch in reader:
+            yield convert_numeric_columns(batch, numeric_columns)
+
+def read_csv_with_arrow(file_path, chunksize, model_class):
+    # Reagrupa os lotes do Arrow em blocos de `chunksize` linhas e entrega DataFrames do pandas
+    pending = []
+    pending_rows = 0
+    for table in read_csv_batches(file_path, model_class):
+        pending.append(table)
+        pending_rows += table.num_rows
+        while pending_rows >= chunksize:
+            combined = pa.concat_tables(pending)
+            yield combined.slice(0, chunksize).to_pandas(types_mapper=arrow_types_mapper)
+            remainder = combined.slice(chunksize)
+            pending = [remainder]
+            pending_rows = remainder.num_rows
+    if pending_rows:
+        yield pa.concat_tables(pending).to_pandas(types_mapper=arrow_types_mapper)
@@ -0,0 +1,238 @@
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_data import generate_dataset
+
+# Motores de carga comparados; 'rowwise' é o upsert linha a linha de test/test.py
+LOAD_ENGINES = ['append', 'upsert', 'rowwise']
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def peak_rss_mb():
+    # ru_maxrss é informado em KB no Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def timed_chunks(chunks, stats):
+    # Soma em stats['read_seconds'] o tempo gasto produzindo os blocos (leitura + tipagem)
+    iterator = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        try:
+            df = next(iterator)
+        except StopIteration:
+            stats['read_seconds'] += time.perf_counter() - start
+            return
+        stats['read_seconds'] += time.perf_counter() - start
+        stats['rows'] += len(df)
+        yield df
+
+def load_rowwise_module(database_url):
+    # test/test.py lê DATABASE_URL do ambiente na importação
+    os.environ['DATABASE_URL'] = database_url
+    spec = importlib.util.spec_from_file_location('rowwise_upsert', os.path.join(ROOT_DIR, 'test', 'test.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+    return module
+
+def write_rowwise(engine, chunks, table_name, rowwise):
+    from sqlalchemy.orm import sessionmaker
+
+    model_class = next(cls for cls in rowwise.file_to_class_mapping.values() if cls.__tablename__ == table_name)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        with session.no_autoflush:
+            for df in chunks:
+                df = df.astype(object).where(df.notna(), None)
+                for _, row in df.iterrows():
+                    rowwise.insert_or_update_data(session, model_class, row.to_dict())
+        session.commit()
+    finally:
+        session.close()
+
+def reset_database(engine):
+    # Cada execução parte de um banco vazio: modelos, tabelas de controle (marca d'água, manifesto,
+    # perfil de lotes, índices aprovados), resumos e hashes de linha
+    import database_loader
+    from load_state import StateBase
+    from row_hash import row_hash_table
+    from summaries import SummaryBase
+
+    for table in database_loader.Base.metadata.sorted_tables:
+        row_hash_table(table).drop(engine, checkfirst=True)
+    SummaryBase.metadata.drop_all(engine)
+    StateBase.metadata.drop_all(engine)
+    database_loader.Base.metadata.drop_all(engine)
+    database_loader.create_tables(engine)
+
+def run_pipeline(engine, data_dir, load_engine, options):
+    # A carga de produção (process_csv_files): agendador, pipeline em threads e as opções de
+    # load_options (compactação, referências, lotes adaptativos...) valem como na CLI
+    import database_loader
+
+    metrics_path = os.path.join(tempfile.mkdtemp(), 'metrics.jsonl')
+    start = time.perf_counter()
+    # Sem cache Parquet: a primeira execução o preencheria e as seguintes leriam dele
+    results = database_loader.process_csv_files(engine, data_dir, metrics_path=metrics_path, mode=load_engine, cache_dir='', **options)
+    seconds = time.perf_counter() - start
+    with open(metrics_path) as f:
+        records = [json.loads(line) for line in f]
+    tables = []
+    for record in records:
+        stages = record['stages']
+        tables.append({
+            'table': record['table'],
+            'status': record['status'] if results.get(record['table']) is not None else 'failed',
+            'rows': stages['read']['rows'],
+            'bytes': record['bytes_read'],
+            'seconds': round(record['seconds'], 3),
+            # Com o pipeline, leitura e gravação se sobrepõem: a soma passa do tempo da tabela
+            'read_seconds': round(stages['read']['seconds'] + stages['transform']['seconds'], 3),
+            'write_seconds': round(stages['write']['seconds'], 3),
+            'stages': {name: round(stage['seconds'], 3) for name, stage in stages.items() if stage['seconds']},
+            'rows_per_second': round(stages['read']['rows'] / record['seconds']) if record['seconds'] else None,
+        })
+    return tables, seconds
+
+def run_rowwise(engine, data_dir, database_url, reader):
+    # Linha a linha, tabela por tabela na ordem das FKs, como em test/test.py
+    import database_loader
+    from scheduler import build_dependency_graph, topological_levels
+
+    rowwise = load_rowwise_module(database_url)
+    files = database_loader.discover_csv_files(data_dir)
+    order = [name for level in topological_levels(build_dependency_graph(database_loader.Base.metadata, files)) for name in level]
+    tables = []
+    for table_name in order:
+        file_path, model_class = files[table_name]
+        chunksize = database_loader.get_chunk_size(table_name)
+        stats = {'rows': 0, 'read_seconds': 0.0}
+        chunks = timed_chunks(
+            (database_loader.transform_chunk(df, model_class)
+             for df in database_loader.csv_readers[reader](file_path, chunksize, model_class)),
+            stats,
+        )
+        start = time.perf_counter()
+        write_rowwise(engine, chunks, table_name, rowwise)
+        seconds = time.perf_counter() - start
+        tables.append({
+            'table': table_name,
+            'status': 'ok',
+            'rows': stats['rows'],
+            'bytes': os.path.getsize(file_path),
+            'seconds': round(seconds, 3),
+            'read_seconds': round(stats['read_seconds'], 3),
+            'write_seconds': round(seconds - stats['read_seconds'], 3),
+            'rows_per_second': round(stats['rows'] / seconds) if seconds else None,
+        })
+    return tables, sum(table['seconds'] for table in tables)
+
+def run_load(database_url, data_dir, load_engine, options):
+    # Executado em um processo novo, para que o pico de memória seja medido isoladamente;
+    # as métricas por tabela são lidas do histórico JSON-lines gravado pela carga
+    os.environ['METRICS_FORMAT'] = 'jsonl'
+    import database_loader
+
+    engine = database_loader.create_tuned_engine(database_url)
+    reset_database(engine)
+    if load_engine == 'rowwise':
+        tables, seconds = run_rowwise(engine, data_dir, database_url, options['reader'])
+    else:
+        tables, seconds = run_pipeline(engine, data_dir, load_engine, options)
+    engine.dispose()
+    return {'tables': tables, 'seconds': round(seconds, 3), 'peak_rss_mb': peak_rss_mb()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de carga ponta a ponta com dados sintéticos.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[10000, 100000],
+                        help='Linhas de SalesOrderDetail por cenário (10k a 10M)')
+    parser.add_argument('--engines', nargs='+', default=LOAD_ENGINES, choices=LOAD_ENGINES)
+    parser.add_argument('--reader', default='pandas', choices=['pandas', 'arrow', 'parallel'])
+    parser.add_argument('--write-method', default='auto')
+    # Opções de process_csv_files repassadas às cargas append e upsert (padrão: desligadas)
+    parser.add_argument('--workers', type=int, help='Tabelas carregadas em paralelo (padrão: LOAD_WORKERS)')
+    parser.add_argument('--compact', action='store_true', help='COMPACT_FRAMES')
+    parser.add_argument('--adaptive', action='store_true', help='ADAPTIVE_BATCHES')
+    parser.add_argument('--references', action='store_true', help='CHECK_REFERENCES')
+    parser.add_argument('--detect-changes', action='store_true', help='DETECT_CHANGES')
+    parser.add_argument('--summaries', action='store_true', help='MAINTAIN_SUMMARIES')
+    parser.add_argument('--defer-constraints', action='store_true', help='DEFER_CONSTRAINTS')
+    parser.add_argument('--postgres-url', help='Também mede contra um PostgreSQL local (o esquema é recriado)')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'case-etl-bench'))
+    parser.add_argument('--rowwise-max-rows', type=int, default=100000,
+                        help="Ignora o motor 'rowwise' acima desta escala")
+    parser.add_argument('--output', help='Arquivo JSON-lines onde os resultados são acrescentados')
+    args = parser.parse_args()
+
+    options = {
+        'reader': args.reader,
+        'write_method': args.write_method,
+        'max_workers': args.workers,
+        'compact': args.compact,
+        'adaptive': args.adaptive,
+        'references': args.references,
+        'detect_changes': args.detect_changes,
+        'summaries': args.summaries,
+        'defer_constraints': args.defer_constraints,
+    }
+    commit = current_commit()
+    for scale in args.scales:
+        data_dir = os.path.join(args.data_dir, str(scale))
+        if not os.path.exists(os.path.join(data_dir, 'Sales.SalesOrderDetail.csv')):
+            generate_dataset(data_dir, scale)
+
+        targets = [('sqlite', f"sqlite:///{os.path.join(args.data_dir, f'bench-{scale}.db')}")]
+        if args.postgres_url:
+            targets.append(('postgresql', args.postgres_url))
+
+        for backend, database_url in targets:
+            for load_engine in args.engines:
+                if load_engine == 'rowwise' and scale > args.rowwise_max_rows:
+                    continue
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                    run = pool.submit(run_load, database_url, data_dir, load_engine, options).result()
+                total_rows = sum(table['rows'] for table in run['tables'])
+                # Tempo total da carga; no pipeline, tabelas independentes rodam em paralelo
+                total_seconds = run['seconds']
+                result = {
+                    'commit': commit,
+                    'timestamp': datetime.now().isoformat(timespec='seconds'),
+                    'scale': scale,
+                    'backend': backend,
+                    'engine': load_engine,
+                    'reader': args.reader,
+                    'write_method': args.write_method,
+                    'options': {name: value for name, value in options.items() if name not in ('reader', 'write_method') and value},
+                    'rows': total_rows,
+                    'seconds': round(total_seconds, 3),
+                    'rows_per_second': round(total_rows / total_seconds) if total_seconds else None,
+                    'peak_rss_mb': run['peak_rss_mb'],
+                    'tables': run['tables'],
+                }
+                line = json.dumps(result)
+                print(line)
+                if args.output:
+                    with open(args.output, 'a') as f:
+                        f.write(line + '\n')
+
+if __name__ == '__main__':
+    main()
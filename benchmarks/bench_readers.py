@@ -0,0 +1,67 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_loader import csv_readers, transform_chunk, file_to_class_mapping, get_chunk_size
+
+def replicate_csv(source_path, target_path, copies):
+    # Repete as linhas de dados de um CSV de amostra para obter um arquivo grande
+    with open(source_path, 'rb') as f:
+        header = f.readline()
+        body = f.read()
+    if not body.endswith(b'\n'):
+        body += b'\n'
+    with open(target_path, 'wb') as f:
+        f.write(header)
+        for _ in range(copies):
+            f.write(body)
+
+def bench_reader(reader_name, file_path, model_class, chunksize):
+    start = time.perf_counter()
+    rows = 0
+    for df in csv_readers[reader_name](file_path, chunksize, model_class):
+        rows += len(transform_chunk(df, model_class))
+    elapsed = time.perf_counter() - start
+    size_mb = os.path.getsize(file_path) / (1024 * 1024)
+    return {
+        'reader': reader_name,
+        'file': os.path.basename(file_path),
+        'rows': rows,
+        'megabytes': round(size_mb, 2),
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(rows / elapsed),
+        'megabytes_per_second': round(size_mb / elapsed, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Vazão de leitura e tipagem de CSV por leitor.')
+    parser.add_argument('file', help='Arquivo CSV (o nome, sem extensão, deve estar em file_to_class_mapping)')
+    parser.add_argument('--readers', nargs='+', default=sorted(csv_readers))
+    parser.add_argument('--copies', type=int, default=1, help='Replica as linhas do arquivo N vezes antes de medir')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    base_name = os.path.splitext(os.path.basename(args.file))[0]
+    model_class = file_to_class_mapping[base_name]
+    chunksize = get_chunk_size(model_class.__tablename__)
+
+    file_path = args.file
+    if args.copies > 1:
+        file_path = os.path.join(tempfile.gettempdir(), f'bench.{base_name}.csv')
+        replicate_csv(args.file, file_path, args.copies)
+    try:
+        for reader_name in args.readers:
+            # Melhor de N execuções, para reduzir o efeito de cache e ruído
+            runs = [bench_reader(reader_name, file_path, model_class, chunksize) for _ in range(args.repeat)]
+            print(json.dumps(min(runs, key=lambda run: run['seconds'])))
+    finally:
+        if file_path != args.file:
+            os.remove(file_path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+import argparse
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# Proporções aproximadas do AdventureWorks em relação a SalesOrderDetail
+DETAILS_PER_HEADER = 4
+HEADERS_PER_CUSTOMER = 1.6
+PRODUCT_COUNT = 504
+SPECIAL_OFFER_COUNT = 16
+EXTRA_SPECIAL_OFFER_PRODUCTS = 34
+
+# Linhas geradas e gravadas por vez nos arquivos grandes
+GENERATION_BLOCK_ROWS = 500000
+
+# Período dos pedidos (mesmo intervalo da base original, inclui setembro de 2011)
+ORDER_DATE_START = pd.Timestamp('2011-05-31')
+ORDER_DATE_DAYS = 1130
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.000'
+
+def rowguids(rng, count):
+    raw = rng.bytes(16 * count)
+    return [str(uuid.UUID(bytes=raw[i * 16:(i + 1) * 16])).upper() for i in range(count)]
+
+def money(values):
+    # Separador decimal vírgula, como nos extratos originais
+    return np.char.replace(np.char.mod('%.2f', values), '.', ',')
+
+def with_nulls(rng, values, null_fraction):
+    values = pd.Series(values, dtype=object)
+    values[rng.random(len(values)) < null_fraction] = None
+    return values
+
+def write_csv(df, output_dir, file_name, append=False):
+    path = os.path.join(output_dir, f'{file_name}.csv')
+    # BOM no cabeçalho, ';' como delimitador e NULL literal, como nos arquivos de origem
+    df.to_csv(
+        path,
+        sep=';',
+        index=False,
+        na_rep='NULL',
+        date_format=DATETIME_FORMAT,
+        mode='a' if append else 'w',
+        header=not append,
+        encoding='utf-8' if append else 'utf-8-sig',
+    )
+
+def generate_products(rng):
+    ids = np.arange(1, PRODUCT_COUNT + 1)
+    list_price = np.round(rng.uniform(2, 3500, PRODUCT_COUNT), 2)
+    return pd.DataFrame({
+        'ProductID': ids,
+        'Name': [f'Product {i}' for i in ids],
+        'ProductNumber': [f'PN-{i:04d}' for i in ids],
+        'MakeFlag': rng.integers(0, 2, PRODUCT_COUNT),
+        'FinishedGoodsFlag': rng.integers(0, 2, PRODUCT_COUNT),
+        'Color': with_nulls(rng, rng.choice(['Black', 'Red', 'Silver', 'Yellow', 'Blue'], PRODUCT_COUNT), 0.5),
+        'SafetyStockLevel': rng.choice([4, 100, 500, 800, 1000], PRODUCT_COUNT),
+        'ReorderPoint': rng.choice([3, 75, 375, 600, 750], PRODUCT_COUNT),
+        'StandardCost': money(np.round(list_price * 0.6, 2)),
+        'ListPrice': money(list_price),
+        'Size': with_nulls(rng, rng.choice(['S', 'M', 'L', 'XL', '44', '48', '52'], PRODUCT_COUNT), 0.6),
+        'SizeUnitMeasureCode': with_nulls(rng, np.full(PRODUCT_COUNT, 'CM '), 0.7),
+        'WeightUnitMeasureCode': with_nulls(rng, np.full(PRODUCT_COUNT, 'LB '), 0.6),
+        # Weight usa ponto como separador decimal nos arquivos originais
+        'Weight': with_nulls(rng, np.char.mod('%.2f', rng.uniform(1, 30, PRODUCT_COUNT)), 0.6),
+        'DaysToManufacture': rng.choice([0, 1, 2, 4], PRODUCT_COUNT),
+        'ProductLine': with_nulls(rng, rng.choice(['R ', 'M ', 'T ', 'S '], PRODUCT_COUNT), 0.4),
+        'Class': with_nulls(rng, rng.choice(['L ', 'M ', 'H '], PRODUCT_COUNT), 0.5),
+        'Style': with_nulls(rng, rng.choice(['U ', 'W ', 'M '], PRODUCT_COUNT), 0.6),
+        'ProductSubcategoryID': with_nulls(rng, rng.integers(1, 38, PRODUCT_COUNT), 0.4),
+        'ProductModelID': with_nulls(rng, rng.integers(1, 129, PRODUCT_COUNT), 0.4),
+        'SellStartDate': pd.Timestamp('2008-04-30'),
+        'SellEndDate': None,
+        'DiscontinuedDate': None,
+        'rowguid': rowguids(rng, PRODUCT_COUNT),
+        'ModifiedDate': pd.Timestamp('2014-02-08 10:01:36'),
+    })
+
+def generate_special_offer_products(rng):
+    # Oferta 1 cobre todos os produtos; as demais, pares extras sem repetição
+    pairs = {(1, product_id) for product_id in range(1, PRODUCT_COUNT + 1)}
+    while len(pairs) < PRODUCT_COUNT + EXTRA_SPECIAL_OFFER_PRODUCTS:
+        pairs.add((int(rng.integers(2, SPECIAL_OFFER_COUNT + 1)), int(rng.integers(1, PRODUCT_COUNT + 1))))
+    pairs = sorted(pairs)
+    return pd.DataFrame({
+        'SpecialOfferID': [offer for offer, _ in pairs],
+        'ProductID': [product for _, product in pairs],
+        'rowguid': rowguids(rng, len(pairs)),
+        'ModifiedDate': pd.Timestamp('2011-04-01'),
+    })
+
+def generate_people(rng, count):
+    ids = np.arange(1, count + 1)
+    return pd.DataFrame({
+        'BusinessEntityID': ids,
+        'PersonType': rng.choice(['IN', 'SC', 'EM', 'VC'], count, p=[0.9, 0.05, 0.03, 0.02]),
+        'NameStyle': 0,
+        'Title': with_nulls(rng, rng.choice(['Mr.', 'Ms.', 'Mrs.'], count), 0.95),
+        'FirstName': np.char.add('First', (ids % 1000).astype(str)),
+        'MiddleName': with_nulls(rng, rng.choice(['A', 'B', 'C', 'J'], count), 0.4),
+        'LastName': np.char.add('Last', (ids % 5000).astype(str)),
+        'Suffix': None,
+        'EmailPromotion': rng.integers(0, 3, count),
+        'AdditionalContactInfo': None,
+        'Demographics': '<IndividualSurvey><TotalPurchaseYTD>0</TotalPurchaseYTD></IndividualSurvey>',
+        'rowguid': rowguids(rng, count),
+        'ModifiedDate': pd.Timestamp('2013-07-31'),
+    })
+
+def generate_customers(rng, count, person_count):
+    ids = np.arange(1, count + 1)
+    # Cerca de 3% são lojas, sem pessoa associada
+    person_ids = with_nulls(rng, rng.permutation(person_count)[:count] + 1, 0.03)
+    return pd.DataFrame({
+        'CustomerID': ids,
+        'PersonID': person_ids,
+        'StoreID': with_nulls(rng, rng.integers(292, 2052, count), 0.9),
+        'TerritoryID': rng.integers(1, 11, count),
+        'AccountNumber': [f'AW{i:08d}' for i in ids],
+        'rowguid': rowguids(rng, count),
+        'ModifiedDate': pd.Timestamp('2014-09-12 11:15:07'),
+    })
+
+def generate_headers(rng, first_id, count, customer_count):
+    ids = np.arange(first_id, first_id + count)
+    order_dates = ORDER_DATE_START + pd.to_timedelta(rng.integers(0, ORDER_DATE_DAYS, count), unit='D')
+    subtotal = np.round(rng.gamma(1.2, 1500, count), 2)
+    tax = np.round(subtotal * 0.08, 2)
+    freight = np.round(subtotal * 0.025, 2)
+    return pd.DataFrame({
+        'SalesOrderID': ids,
+        'RevisionNumber': 8,
+        'OrderDate': order_dates,
+        'DueDate': order_dates + pd.Timedelta(days=12),
+        'ShipDate': order_dates + pd.Timedelta(days=7),
+        'Status': '5',
+        'OnlineOrderFlag': rng.integers(0, 2, count),
+        'SalesOrderNumber': np.char.add('SO', ids.astype(str)),
+        'PurchaseOrderNumber': with_nulls(rng, np.char.add('PO', rng.integers(10**9, 10**10, count).astype(str)), 0.8),
+        'AccountNumber': np.char.add('10-4020-', (ids % 1000000).astype(str)),
+        'CustomerID': rng.integers(1, customer_count + 1, count),
+        'SalesPersonID': with_nulls(rng, rng.integers(274, 291, count), 0.8),
+        'TerritoryID': rng.integers(1, 11, count),
+        'BillToAddressID': rng.integers(1, 30000, count),
+        'ShipToAddressID': rng.integers(1, 30000, count),
+        'ShipMethodID': rng.choice([1, 5], count),
+        'CreditCardID': with_nulls(rng, rng.integers(1, 19000, count), 0.05),
+        'CreditCardApprovalCode': with_nulls(rng, np.char.add('105041Vi', rng.integers(10000, 99999, count).astype(str)), 0.05),
+        'CurrencyRateID': None,
+        'SubTotal': money(subtotal),
+        'TaxAmt': money(tax),
+        'Freight': money(freight),
+        'TotalDue': money(subtotal + tax + freight),
+        'Comment': None,
+        'rowguid': rowguids(rng, count),
+        'ModifiedDate': order_dates + pd.Timedelta(days=7),
+    })
+
+def generate_details(rng, first_id, count, header_count, special_offer_products):
+    # (SpecialOfferID, ProductID) sempre sorteado entre os pares existentes
+    offers = special_offer_products.iloc[rng.integers(0, len(special_offer_products), count)]
+    qty = rng.integers(1, 11, count)
+    unit_price = np.round(rng.uniform(1, 2500, count), 2)
+    discount = rng.choice([0.0, 0.0, 0.0, 0.02, 0.05, 0.1], count)
+    return pd.DataFrame({
+        'SalesOrderID': rng.integers(1, header_count + 1, count),
+        'SalesOrderDetailID': np.arange(first_id, first_id + count),
+        'CarrierTrackingNumber': with_nulls(rng, np.char.add('4911-403C-', rng.integers(10, 99, count).astype(str)), 0.5),
+        'OrderQty': qty,
+        'ProductID': offers['ProductID'].to_numpy(),
+        'SpecialOfferID': offers['SpecialOfferID'].to_numpy(),
+        'UnitPrice': money(unit_price),
+        'UnitPriceDiscount': money(discount),
+        'LineTotal': money(np.round(qty * unit_price * (1 - discount), 6)),
+        'rowguid': rowguids(rng, count),
+        'ModifiedDate': pd.Timestamp('2011-05-31'),
+    })
+
+def generate_dataset(output_dir, detail_rows, seed=42):
+    # Gera os seis arquivos mapeados em file_to_class_mapping, com chaves consistentes entre si
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    header_count = max(1, detail_rows // DETAILS_PER_HEADER)
+    customer_count = max(1, int(header_count / HEADERS_PER_CUSTOMER))
+    person_count = customer_count
+
+    products = generate_products(rng)
+    write_csv(products, output_dir, 'Production.Product')
+    special_offer_products = generate_special_offer_products(rng)
+    write_csv(special_offer_products, output_dir, 'Sales.SpecialOfferProduct')
+    write_csv(generate_people(rng, person_count), output_dir, 'Person.Person')
+    write_csv(generate_customers(rng, customer_count, person_count), output_dir, 'Sales.Customer')
+
+    for first in range(0, header_count, GENERATION_BLOCK_ROWS):
+        count = min(GENERATION_BLOCK_ROWS, header_count - first)
+        write_csv(generate_headers(rng, first + 1, count, customer_count), output_dir, 'Sales.SalesOrderHeader', append=first > 0)
+    for first in range(0, detail_rows, GENERATION_BLOCK_ROWS):
+        count = min(GENERATION_BLOCK_ROWS, detail_rows - first)
+        details = generate_details(rng, first + 1, count, header_count, special_offer_products)
+        write_csv(details, output_dir, 'Sales.SalesOrderDetail', append=first > 0)
+
+    return {
+        'Product': PRODUCT_COUNT,
+        'SpecialOfferProduct': len(special_offer_products),
+        'Person': person_count,
+        'Customer': customer_count,
+        'SalesOrderHeader': header_count,
+        'SalesOrderDetail': detail_rows,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera arquivos CSV sintéticos no formato AdventureWorks.')
+    parser.add_argument('output_dir')
+    parser.add_argument('--rows', type=int, default=10000, help='Linhas de SalesOrderDetail (10k a 10M)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    print(generate_dataset(args.output_dir, args.rows, args.seed))
+
+if __name__ == '__main__':
+    main()
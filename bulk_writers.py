@@ -0,0 +1,127 @@
+import csv
+import io
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Date, DateTime
+
+from compaction import expand_compact_columns, uuid_text
+
+# Linhas convertidas em objetos Python por vez na gravação: um dict ou tupla por linha custa bem
+# mais que as colunas do bloco, que não é convertido inteiro de uma vez
+RECORD_SLICE_ROWS = 10000
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def format_copy_value(value):
+    # Inteiros que viraram float por causa de NULL (ex.: 14.0) seriam rejeitados por colunas INT
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def copy_rows(connection, table_name, columns, rows, schema=None):
+    # Envia as linhas como COPY ... FROM STDIN (CSV) pela conexão DBAPI por trás do engine
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([format_copy_value(value) for value in row])
+    buffer.seek(0)
+
+    target = quote_identifier(table_name)
+    if schema:
+        target = f'{quote_identifier(schema)}.{target}'
+    column_list = ', '.join(quote_identifier(column) for column in columns)
+    sql = f'COPY {target} ({column_list}) FROM STDIN WITH (FORMAT csv)'
+
+    cursor = connection.connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg (3)
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+def column_values(series, column_type):
+    # Valores Python de uma coluna, convertida sozinha: um bloco compactado (compaction.py) não
+    # é expandido inteiro antes da gravação. NaN/NaT/NA viram None, gravados como NULL
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Cada código vira uma referência ao texto da categoria; o código -1 (nulo) pega o None do final
+        categories = np.append(series.cat.categories.to_numpy(dtype=object), None)
+        return categories[series.cat.codes.to_numpy()].tolist()
+    if series.dtype.kind == 'S':
+        series = uuid_text(series)
+    elif isinstance(column_type, DateTime):
+        series = pd.to_datetime(series).astype(object)
+    elif isinstance(column_type, Date):
+        series = pd.to_datetime(series).dt.date
+    # Cópia da coluna, para não alterar o bloco; to_numpy(dtype=object) já deixa escalares Python
+    values = np.array(series.to_numpy(dtype=object), dtype=object)
+    values[pd.isna(values)] = None
+    return values.tolist()
+
+def prepare_rows(df, table):
+    # Colunas do modelo presentes no bloco e um gerador das linhas como tuplas (column_values),
+    # convertidas RECORD_SLICE_ROWS por vez
+    columns = [column for column in table.columns if column.name in df.columns]
+
+    def rows():
+        for start in range(0, len(df), RECORD_SLICE_ROWS):
+            part = df.iloc[start:start + RECORD_SLICE_ROWS]
+            yield from zip(*[column_values(part[column.name], column.type) for column in columns])
+    return [column.name for column in columns], rows()
+
+def prepare_records(df, table):
+    # Registros para os INSERTs do SQLAlchemy, que aplicam o tratamento de tipo do modelo
+    # (ex.: Uuid, Date no SQLite): append e upsert gravam os mesmos valores. Gera listas de
+    # até RECORD_SLICE_ROWS registros, cada uma enviada em um executemany
+    columns, rows = prepare_rows(df, table)
+    while True:
+        records = [dict(zip(columns, row)) for row in islice(rows, RECORD_SLICE_ROWS)]
+        if not records:
+            return
+        yield records
+
+def copy_method(pd_table, connection, keys, data_iter):
+    # Assinatura exigida pelo parâmetro `method` de DataFrame.to_sql
+    copy_rows(connection, pd_table.name, keys, data_iter, schema=pd_table.schema)
+
+# Backends de escrita selecionáveis pelo nome; o valor é repassado ao `method` de to_sql
+write_methods = {
+    'copy': copy_method,
+    'executemany': None,
+    'multi': 'multi',
+}
+
+def resolve_write_method(dialect_name, write_method='auto'):
+    if write_method == 'auto':
+        # COPY só existe no PostgreSQL; nos demais dialetos usa executemany em lote
+        write_method = 'copy' if dialect_name == 'postgresql' else 'executemany'
+    if write_method not in write_methods:
+        raise ValueError(f"Método de escrita desconhecido: {write_method}")
+    if write_method == 'copy' and dialect_name != 'postgresql':
+        raise ValueError(f"COPY não é suportado pelo dialeto {dialect_name}.")
+    return write_method
+
+def write_dataframe(connection, df, table_name, write_method='auto', table=None):
+    # table: a tabela do modelo; as linhas são montadas coluna a coluna pelo tipo dela em vez
+    # da inferência do to_sql, inclusive nos blocos compactados
+    write_method = resolve_write_method(connection.dialect.name, write_method)
+    if table is None:
+        expand_compact_columns(df).to_sql(table_name, connection, if_exists='append', index=False, method=write_methods[write_method])
+    elif df.empty:
+        return
+    elif write_method == 'copy':
+        columns, rows = prepare_rows(df, table)
+        copy_rows(connection, table.name, columns, rows, schema=table.schema)
+    else:
+        for records in prepare_records(df, table):
+            if write_method == 'multi':
+                connection.execute(table.insert().values(records))
+            else:
+                connection.execute(table.insert(), records)
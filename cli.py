@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import sys
+
+# O .env é lido no início de main, antes de qualquer módulo do carregador: as configurações
+# (DATABASE_URL, LOAD_MODE, METRICS_PATH...) são lidas do ambiente na importação de cada módulo.
+# Os módulos pesados (pandas, conexão com o banco) são importados dentro de cada subcomando,
+# apenas quando ele precisa deles; plan usa só os modelos e amostras dos arquivos
+
+# Linhas por segundo assumidas por plan para tabelas sem carga confirmada no histórico de métricas
+# (PLAN_ROWS_PER_SECOND, lida em plan_command, depois do .env)
+DEFAULT_PLAN_ROWS_PER_SECOND = '20000'
+
+def require_database_url():
+    if not os.getenv('DATABASE_URL'):
+        print("A variável DATABASE_URL não está definida (ambiente ou .env).")
+        sys.exit(2)
+
+def create_tables_command(args):
+    require_database_url()
+    from database_loader import create_db_engine, create_tables
+
+    create_tables(create_db_engine(), partition_orders=args.partition_orders or None)
+    return 0
+
+def load_command(args):
+    require_database_url()
+    folder = args.folder or os.getenv('CSV_FOLDER_PATH')
+    if not folder:
+        print("Informe a pasta dos CSVs ou defina CSV_FOLDER_PATH.")
+        return 2
+    from database_loader import create_db_engine, create_tables, load_options_from_env, process_csv_files
+
+    options = load_options_from_env()
+    for name, option in (('mode', 'mode'), ('reader', 'reader'), ('incremental', 'incremental'),
+                         ('skip_unchanged', 'skip_unchanged'), ('workers', 'max_workers'), ('metrics_path', 'metrics_path')):
+        if getattr(args, name):
+            options[option] = getattr(args, name)
+    engine = create_db_engine()
+    create_tables(engine)
+    results = process_csv_files(engine, folder, **options)
+    return 0 if all(result is not None for result in results.values()) else 1
+
+def reload_command(args):
+    require_database_url()
+    from database_loader import create_db_engine, create_tables, load_options_from_env, reload_diverted_file
+    from quarantine import new_run_id
+
+    options = load_options_from_env()
+    # Opções de process_csv_files sem efeito em um arquivo só (sem a pasta, nada a adiar nem paralelizar)
+    for name in ('defer_constraints', 'max_workers', 'metrics_path'):
+        options.pop(name)
+    if args.mode:
+        options['mode'] = args.mode
+    engine = create_db_engine()
+    create_tables(engine)
+    run_id = new_run_id()
+    failed = 0
+    for file_path in args.files:
+        failed += reload_diverted_file(engine, file_path, run_id=run_id, **options) is None
+    return 1 if failed else 0
+
+def history_rates(metrics_path):
+    # Linhas lidas por segundo na última carga confirmada de cada tabela (histórico JSON-lines)
+    rates = {}
+    if not metrics_path or not os.path.exists(metrics_path):
+        return rates
+    with open(metrics_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            rows = record.get('stages', {}).get('read', {}).get('rows', 0)
+            if record.get('status') == 'ok' and rows and record.get('seconds'):
+                rates[record['table']] = rows / record['seconds']
+    return rates
+
+def plan_command(args):
+    folder = args.folder or os.getenv('CSV_FOLDER_PATH')
+    if not folder:
+        print("Informe a pasta dos CSVs ou defina CSV_FOLDER_PATH.")
+        return 2
+    from metrics import METRICS_FORMAT, METRICS_PATH
+    from models import Base, file_to_class_mapping
+    from scheduler import LOAD_WORKERS, build_dependency_graph, topological_levels
+    from source_files import discover_source_files, estimate_rows, source_bytes
+
+    files = discover_source_files(folder, file_to_class_mapping)
+    if not files:
+        print(f"Nenhum arquivo mapeado em {folder}.")
+        return 1
+    default_rate = float(os.getenv('PLAN_ROWS_PER_SECOND', DEFAULT_PLAN_ROWS_PER_SECOND))
+    rates = history_rates(args.metrics_path or (METRICS_PATH if METRICS_FORMAT == 'jsonl' else None))
+    # O SQLite aceita apenas um escritor por vez (como em process_csv_files)
+    workers = 1 if os.getenv('DATABASE_URL', '').startswith('sqlite') else (args.workers or LOAD_WORKERS)
+
+    estimates = {}
+    problems = 0
+    for table_name, (file_path, model_class) in files.items():
+        estimate = estimate_rows(file_path)
+        rate = rates.get(table_name, default_rate)
+        estimate['seconds'] = estimate['rows'] / rate
+        estimate['source'] = 'histórico' if table_name in rates else 'padrão'
+        estimates[table_name] = estimate
+        # Colunas do cabeçalho comparadas com o modelo, antes de qualquer leitura completa
+        missing = [column.name for column in model_class.__table__.columns if column.name not in estimate['columns']]
+        extra = [name for name in estimate['columns'] if name not in model_class.__table__.columns]
+        if missing or extra:
+            problems += 1
+            print(f"{table_name}: colunas ausentes {missing or '-'}; colunas sem modelo {extra or '-'}")
+
+    total_seconds = 0.0
+    print(f"Ordem de carga ({workers} worker{'s' if workers > 1 else ''}):")
+    for number, level in enumerate(topological_levels(build_dependency_graph(Base.metadata, files)), 1):
+        # As tabelas de um nível rodam em paralelo: o nível dura pelo menos a maior delas
+        times = [estimates[name]['seconds'] for name in level]
+        level_seconds = max(max(times), sum(times) / workers)
+        total_seconds += level_seconds
+        print(f"Nível {number} (~{level_seconds:.1f}s)")
+        for name in level:
+            estimate = estimates[name]
+            rows = f"{estimate['rows']:,}".replace(',', '.')
+            print(f"  {name}: {os.path.basename(files[name][0])}, {source_bytes(files[name][0]) / 1e6:.1f} MB, "
+                  f"{'' if estimate['exact'] else '~'}{rows} linhas, ~{estimate['seconds']:.1f}s ({estimate['source']})")
+    print(f"Tempo estimado de leitura e gravação: ~{total_seconds:.1f}s")
+    return 1 if problems else 0
+
+def verify_command(args):
+    require_database_url()
+    from sqlalchemy import func, inspect, select
+
+    from database_loader import Base, create_db_engine
+    from deferred_constraints import count_orphans
+
+    engine = create_db_engine()
+    problems = 0
+    with engine.connect() as connection:
+        existing = set(inspect(connection).get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing:
+                print(f"{table.name}: tabela não existe")
+                problems += 1
+                continue
+            count = connection.execute(select(func.count()).select_from(table)).scalar()
+            print(f"{table.name}: {count} linhas")
+            for fk in sorted(table.foreign_key_constraints, key=lambda fk: [column.name for column in fk.columns]):
+                if fk.referred_table.name not in existing:
+                    continue
+                orphans = count_orphans(connection, fk)
+                if orphans:
+                    problems += 1
+                    print(f"  {orphans} linhas sem correspondente em {fk.referred_table.name} ({', '.join(column.name for column in fk.columns)})")
+    if args.summaries:
+        from summaries import check_summaries
+
+        problems += sum(not matches for matches in check_summaries(engine).values())
+    return 1 if problems else 0
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(prog='cli.py', description="Carga dos CSVs de vendas para o banco de dados.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    create = subparsers.add_parser('create-tables', help="Cria as tabelas que ainda não existem")
+    create.add_argument('--partition-orders', action='store_true', help="Particiona os pedidos por mês de OrderDate (PostgreSQL)")
+    create.set_defaults(run=create_tables_command)
+
+    load = subparsers.add_parser('load', help="Carrega os CSVs da pasta (padrão: CSV_FOLDER_PATH)")
+    load.add_argument('folder', nargs='?')
+    load.add_argument('--mode', choices=['append', 'upsert'], help="Padrão: LOAD_MODE")
+    load.add_argument('--reader', choices=['pandas', 'arrow', 'parallel'], help="Padrão: CSV_READER")
+    load.add_argument('--workers', type=int, help="Tabelas carregadas em paralelo (padrão: LOAD_WORKERS)")
+    load.add_argument('--incremental', action='store_true', default=None, help="Carrega só as linhas novas")
+    load.add_argument('--skip-unchanged', action='store_true', default=None, help="Pula os arquivos já carregados e inalterados")
+    load.add_argument('--metrics-path', help="Padrão: METRICS_PATH")
+    load.set_defaults(run=load_command)
+
+    reload = subparsers.add_parser('reload', help="Recarrega arquivos de órfãs ou rejeitadas (<Tabela>.<carga>.orphans.csv ou .rejects.csv)")
+    reload.add_argument('files', nargs='+')
+    reload.add_argument('--mode', choices=['append', 'upsert'], help="Padrão: LOAD_MODE")
+    reload.set_defaults(run=reload_command)
+
+    plan = subparsers.add_parser('plan', help="Mostra a ordem de carga e estima linhas e tempo sem ler os arquivos inteiros")
+    plan.add_argument('folder', nargs='?')
+    plan.add_argument('--workers', type=int, help="Padrão: LOAD_WORKERS")
+    plan.add_argument('--metrics-path', help="Histórico de métricas JSON-lines usado nas estimativas (padrão: METRICS_PATH)")
+    plan.set_defaults(run=plan_command)
+
+    verify = subparsers.add_parser('verify', help="Conta as linhas e os órfãos de cada chave estrangeira")
+    verify.add_argument('--summaries', action='store_true', help="Compara também as tabelas de resumo com o recálculo")
+    verify.set_defaults(run=verify_command)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import csv
+
+import pandas as pd
+from sqlalchemy import Integer, Float, Numeric, Boolean, Date, DateTime, String
+
+from source_files import open_text_source
+
+# Convenções dos arquivos de origem
+CSV_DELIMITER = ';'
+CSV_DECIMAL = ','
+CSV_NA_VALUES = ['NULL', '']
+
+# Formatos de data/hora tentados, em ordem, na primeira linha com valor de cada coluna
+DATETIME_FORMATS = [
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y',
+]
+
+# Formato detectado por (tabela, coluna), reaproveitado entre arquivos e execuções
+datetime_format_cache = {}
+
+def pandas_dtype_for(column_type):
+    # Ordem importa: Boolean e DateTime não herdam de Integer/String, mas Float herda de Numeric
+    if isinstance(column_type, Boolean):
+        return 'boolean'
+    if isinstance(column_type, Integer):
+        return 'Int64'
+    if isinstance(column_type, (Float, Numeric)):
+        return 'float64'
+    if isinstance(column_type, (Date, DateTime)):
+        return 'datetime'
+    if isinstance(column_type, String):
+        return 'str'
+    return None
+
+def read_sample(file_path, rows=20):
+    # Cabeçalho (sem BOM) e as primeiras linhas do arquivo, sem ler o restante
+    with open_text_source(file_path) as f:
+        reader = csv.reader(f, delimiter=CSV_DELIMITER)
+        header = next(reader, [])
+        sample = [row for _, row in zip(range(rows), reader)]
+    return header, sample
+
+def detect_datetime_format(values):
+    for value in values:
+        if value in CSV_NA_VALUES:
+            continue
+        for date_format in DATETIME_FORMATS:
+            try:
+                pd.to_datetime(value, format=date_format)
+                return date_format
+            except ValueError:
+                continue
+        return None
+    return None
+
+def get_datetime_format(table_name, column_name, values):
+    key = (table_name, column_name)
+    if key not in datetime_format_cache:
+        date_format = detect_datetime_format(values)
+        if date_format is None:
+            # Amostra sem valores: deixa o pandas inferir e tenta de novo no próximo arquivo
+            return None
+        datetime_format_cache[key] = date_format
+    return datetime_format_cache[key]
+
+def build_read_options(model_class, file_path):
+    # Monta dtype, decimal, na_values e parse_dates para pd.read_csv a partir das
+    # colunas do modelo, de modo que a tipagem aconteça no próprio parser
+    table = model_class.__table__
+    header, sample = read_sample(file_path)
+
+    dtype = {}
+    parse_dates = []
+    date_formats = {}
+    for position, name in enumerate(header):
+        if name not in table.columns:
+            continue
+        kind = pandas_dtype_for(table.columns[name].type)
+        if kind == 'datetime':
+            parse_dates.append(name)
+            values = [row[position] for row in sample if position < len(row)]
+            date_formats[name] = get_datetime_format(table.name, name, values)
+        elif kind == 'float64':
+            # Não fixa o dtype: colunas com separador decimal misto ficam como texto
+            # e são convertidas depois (ver numeric_columns)
+            continue
+        elif kind is not None:
+            dtype[name] = kind
+
+    return {
+        'delimiter': CSV_DELIMITER,
+        'decimal': CSV_DECIMAL,
+        'encoding': 'utf-8-sig',
+        'na_values': CSV_NA_VALUES,
+        'keep_default_na': False,
+        'dtype': dtype,
+        'parse_dates': parse_dates,
+        'date_format': {name: fmt for name, fmt in date_formats.items() if fmt},
+    }
+
+def numeric_columns(model_class):
+    return [column.name for column in model_class.__table__.columns if pandas_dtype_for(column.type) == 'float64']
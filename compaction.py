@@ -0,0 +1,99 @@
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger, Integer, SmallInteger, String, Text, Uuid
+
+try:
+    import pyarrow  # noqa: F401
+    COMPACT_STRING_DTYPE = pd.StringDtype('pyarrow')
+except ImportError:  # dependência opcional: sem ela, os textos únicos continuam como objetos
+    COMPACT_STRING_DTYPE = None
+
+# Reduz a memória de cada bloco antes da gravação (ver compact_chunk)
+COMPACT_FRAMES = os.getenv('COMPACT_FRAMES') == '1'
+
+# Colunas de texto viram categóricas quando o número de valores distintos no bloco
+# não passa desta fração das linhas não nulas
+CATEGORY_MAX_RATIO = 0.5
+
+# Tipos inteiros anuláveis do menor para o maior; o maior possível vem do modelo
+integer_dtypes = ['Int8', 'Int16', 'Int32', 'Int64']
+
+def model_integer_dtype(column_type):
+    if isinstance(column_type, SmallInteger):
+        return 'Int16'
+    if isinstance(column_type, BigInteger):
+        return 'Int64'
+    return 'Int32'
+
+def smallest_integer_dtype(series, widest):
+    # Menor tipo anulável que comporta os valores do bloco, limitado ao tipo do modelo
+    values = series.dropna()
+    if values.empty:
+        return integer_dtypes[0]
+    low, high = values.min(), values.max()
+    for dtype in integer_dtypes[:integer_dtypes.index(widest) + 1]:
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return dtype
+    return widest
+
+def uuid_to_bytes(series):
+    # '6c4bb8a4-...' (36 caracteres) -> 16 bytes; None se houver nulos ou valores fora do formato
+    if series.isna().any():
+        return None
+    hex_text = ''.join(series.str.replace('-', '', regex=False))
+    if len(hex_text) != 32 * len(series):
+        return None
+    try:
+        data = bytes.fromhex(hex_text)
+    except ValueError:
+        return None
+    return pd.Series(np.frombuffer(data, dtype='S16'), index=series.index, name=series.name)
+
+def compact_chunk(df, model_class):
+    # Tipos escolhidos a partir do modelo: inteiros anuláveis reduzidos, textos curtos repetidos
+    # como categóricos, os demais textos em Arrow e UUIDs como 16 bytes. Os escritores leem esses tipos
+    # coluna a coluna (bulk_writers.column_values).
+    table = model_class.__table__
+    # Cópia rasa: o bloco pode ser um recorte de outro (filtro incremental, órfãos desviados)
+    df = df.copy(deep=False)
+    for name in df.columns:
+        if name not in table.columns:
+            continue
+        column_type = table.columns[name].type
+        series = df[name]
+        if isinstance(column_type, Integer) and pd.api.types.is_integer_dtype(series):
+            df[name] = series.astype(smallest_integer_dtype(series, model_integer_dtype(column_type)))
+        elif isinstance(column_type, Uuid) and series.dtype == object:
+            packed = uuid_to_bytes(series)
+            if packed is not None:
+                df[name] = packed
+        elif isinstance(column_type, String) and series.dtype == object:
+            # Textos longos (Text) e códigos quase únicos (ex.: SalesOrderNumber) ficam em um único
+            # buffer Arrow, sem um objeto Python por valor
+            if not isinstance(column_type, Text) and series.nunique() <= CATEGORY_MAX_RATIO * series.count():
+                df[name] = series.astype('category')
+            elif COMPACT_STRING_DTYPE is not None:
+                df[name] = series.astype(COMPACT_STRING_DTYPE)
+    return df
+
+def uuid_text(series):
+    # UUIDs de 16 bytes de volta para texto em maiúsculas, como nos arquivos de origem.
+    # Os bytes do array inteiro, e não os itens: o numpy corta os bytes nulos do final de cada item
+    data = series.to_numpy().tobytes()
+    values = [str(uuid.UUID(bytes=data[i:i + 16])).upper() for i in range(0, len(data), 16)]
+    return pd.Series(values, index=series.index, name=series.name, dtype=object)
+
+def expand_compact_columns(df):
+    # Cópia com os UUIDs em texto, para blocos pequenos (ex.: arquivo de rejeitadas); os escritores
+    # e o hash das linhas convertem coluna a coluna, sem expandir o bloco inteiro
+    packed = [name for name in df.columns if df[name].dtype.kind == 'S']
+    if not packed:
+        return df
+    df = df.copy()
+    for name in packed:
+        df[name] = uuid_text(df[name])
+    return df
@@ -1,189 +1,429 @@
 import os
+import re
+from contextlib import ExitStack, contextmanager, nullcontext
+
+if __name__ == "__main__":
+    # Executado como script, o .env é lido antes dos módulos do carregador, que leem as suas
+    # configurações na importação. Importado, quem chama lê o .env (ex.: cli.main)
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
 import pandas as pd
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, Float, Numeric, Date, Text, DateTime
-from sqlalchemy.orm import declarative_base
-from dotenv import load_dotenv
-
-# Carregar variáveis de ambiente
-load_dotenv()
-
-# Definição da base declarativa
-Base = declarative_base()
-
-# Definindo a classe de modelo para SalesOrderDetail
-class SalesOrderDetail(Base):
-    __tablename__ = 'SalesOrderDetail'
-    SalesOrderID = Column(Integer, primary_key=True)
-    SalesOrderDetailID = Column(Integer, primary_key=True)
-    CarrierTrackingNumber = Column(String(255))
-    OrderQty = Column(Integer)
-    ProductID = Column(Integer)
-    SpecialOfferID = Column(Integer)
-    UnitPrice = Column(Float)
-    UnitPriceDiscount = Column(Float)
-    LineTotal = Column(Float)
-    rowguid = Column(String)
-    ModifiedDate = Column(DateTime)
-
-# Definindo a classe de modelo para SalesOrderHeader
-class SalesOrderHeader(Base):
-    __tablename__ = 'SalesOrderHeader'
-    SalesOrderID = Column(Integer, primary_key=True)
-    RevisionNumber = Column(Integer)
-    OrderDate = Column(Date)
-    DueDate = Column(Date)
-    ShipDate = Column(Date)
-    Status = Column(String(50))
-    OnlineOrderFlag = Column(Boolean)
-    SalesOrderNumber = Column(String(50))
-    PurchaseOrderNumber = Column(String(50))
-    AccountNumber = Column(String(50))
-    CustomerID = Column(Integer)
-    SalesPersonID = Column(Integer)
-    TerritoryID = Column(Integer)
-    BillToAddressID = Column(Integer)
-    ShipToAddressID = Column(Integer)
-    ShipMethodID = Column(Integer)
-    CreditCardID = Column(Integer)
-    CreditCardApprovalCode = Column(String(50))
-    CurrencyRateID = Column(Integer)
-    SubTotal = Column(Numeric(18, 2))
-    TaxAmt = Column(Numeric(18, 2))
-    Freight = Column(Numeric(18, 2))
-    TotalDue = Column(Numeric(18, 2))
-    Comment = Column(Text)
-    rowguid = Column(String)
-    ModifiedDate = Column(DateTime)
-
-# Definindo a classe de modelo para Product
-class Product(Base):
-    __tablename__ = 'Product'
-    ProductID = Column(Integer, primary_key=True)
-    Name = Column(String(255))
-    ProductNumber = Column(String(50))
-    MakeFlag = Column(Boolean)
-    FinishedGoodsFlag = Column(Boolean)
-    Color = Column(String(50))
-    SafetyStockLevel = Column(Integer)
-    ReorderPoint = Column(Integer)
-    StandardCost = Column(Numeric(18, 2))
-    ListPrice = Column(Numeric(18, 2))
-    Size = Column(String(50))
-    SizeUnitMeasureCode = Column(String(10))
-    WeightUnitMeasureCode = Column(String(10))
-    Weight = Column(Numeric(18, 2))
-    DaysToManufacture = Column(Integer)
-    ProductLine = Column(String(2))
-    Class = Column(String(2))
-    Style = Column(String(50))
-    ProductSubcategoryID = Column(Integer)
-    ProductModelID = Column(Integer)
-    SellStartDate = Column(Date)
-    SellEndDate = Column(Date)
-    DiscontinuedDate = Column(Date)
-    rowguid = Column(String)
-    ModifiedDate = Column(DateTime)
-
-# Definindo a classe de modelo para SpecialOfferProduct
-class SpecialOfferProduct(Base):
-    __tablename__ = 'SpecialOfferProduct'
-    SpecialOfferID = Column(Integer, primary_key=True)
-    ProductID = Column(Integer, primary_key=True)
-    rowguid = Column(String)
-    ModifiedDate = Column(DateTime)
-
-# Definindo a classe de modelo para Customer
-class Customer(Base):
-    __tablename__ = 'Customer'
-    CustomerID = Column(Integer, primary_key=True)
-    PersonID = Column(Integer)
-    StoreID = Column(Integer)
-    TerritoryID = Column(Integer)
-    AccountNumber = Column(String(50))
-    rowguid = Column(String)
-    ModifiedDate = Column(DateTime)
-
-# Definindo a classe de modelo para Person
-class Person(Base):
-    __tablename__ = 'Person'
-    BusinessEntityID = Column(Integer, primary_key=True)
-    PersonType = Column(String(2))
-    NameStyle = Column(Boolean)
-    Title = Column(String(50))
-    FirstName = Column(String(50))
-    MiddleName = Column(String(50))
-    LastName = Column(String(50))
-    Suffix = Column(String(10))
-    EmailPromotion = Column(Integer)
-    AdditionalContactInfo = Column(Text)
-    Demographics = Column(Text)
-    rowguid = Column(String)
-    ModifiedDate = Column(DateTime)
-
-# Mapeamento dos nomes dos arquivos para as classes de modelo
-file_to_class_mapping = {
-    'Sales.Customer': Customer,
-    'Person.Person': Person,
-    'Production.Product': Product,
-    'Sales.SalesOrderDetail': SalesOrderDetail,
-    'Sales.SalesOrderHeader': SalesOrderHeader,
-    'Sales.SpecialOfferProduct': SpecialOfferProduct
-}
 
-# Carregar a URL do banco de dados e o caminho da pasta CSV das variáveis de ambiente
-DATABASE_URL = os.getenv('DATABASE_URL')
-CSV_FOLDER_PATH = os.getenv('CSV_FOLDER_PATH')
+# Os leitores Arrow e paralelo, o cache Parquet, o particionamento e o index_advisor são
+# importados apenas quando a carga os usa (pyarrow.csv, pyarrow.parquet, processos)
+
+# Modelos e mapeamento arquivo -> modelo, re-exportados daqui
+from models import (
+    Base, SalesOrderDetail, SalesOrderHeader, Product, SpecialOfferProduct, Customer, Person,
+    file_to_class_mapping,
+)
+from upsert import upsert_chunks_to_db
+from scheduler import LOAD_WORKERS, build_dependency_graph, run_in_dependency_order
+from bulk_writers import write_dataframe
+from coercion import build_read_options, numeric_columns
+from source_files import discover_source_files, is_plain_file, open_source
+from compaction import COMPACT_FRAMES, compact_chunk
+from pipeline import staged
+from row_hash import DETECT_CHANGES, drop_unchanged, new_change_state, row_hash_hook
+from key_cache import CHECK_REFERENCES, ORPHAN_DIR, drop_orphans, new_key_cache, orphan_path_for
+from load_profile import ADAPTIVE_BATCHES, adaptive_batches, create_tuned_engine, new_batch_tuner, save_batch_profile, starting_batch_size
+from quarantine import REJECT_DIR, new_run_id, reject_path_for, write_rejects, write_with_quarantine
+from deferred_constraints import DEFER_CONSTRAINTS, drop_deferred_objects, rebuild_deferred_objects
+from summaries import MAINTAIN_SUMMARIES, create_summary_tables, summary_batch_hook
+from metrics import new_file_metrics, measure_chunks, measure_each, measure_writer, write_metrics
+from load_state import (
+    create_state_tables, get_watermark, set_watermark, filter_chunks_by_watermark, watermark_hook,
+    watermark_guard, next_watermark,
+    get_manifest_entry, check_file_fingerprint, record_manifest_entry,
+)
+
+# Quantidade padrão de linhas lidas, transformadas e gravadas por vez
+DEFAULT_CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', '50000'))
+
+# Backend de escrita: 'auto' (COPY no PostgreSQL, executemany nos demais), 'copy', 'executemany' ou 'multi'
+WRITE_METHOD = os.getenv('WRITE_METHOD', 'auto')
+
+# Leitor de CSV: 'pandas' (parser C, uma thread) ou 'arrow' (pyarrow.csv, multithread)
+CSV_READER = os.getenv('CSV_READER', 'pandas')
+
+# Arquivos desviados por uma carga, recarregáveis por reload_diverted_file
+DIVERTED_FILE_PATTERN = re.compile(r'^(?P<table>\w+)(?:\.\w+)?\.(?:orphans|rejects)\.csv$')
+
+# Tamanho de bloco específico por tabela (sobrepõe o padrão)
+table_chunk_sizes = {
+    'Person': 10000,  # Demographics e AdditionalContactInfo trazem XML grande por linha
+    'SalesOrderDetail': 100000,
+}
 
 def create_db_engine():
-    return create_engine(DATABASE_URL)
+    # Pool, executemany e tamanho das páginas do insertmanyvalues configuráveis (load_profile.py);
+    # a URL é lida na chamada, depois de um load_dotenv feito após a importação
+    return create_tuned_engine(os.getenv('DATABASE_URL'))
 
-def create_tables(engine):
+def create_tables(engine, partition_orders=None):
+    from partitioning import PARTITION_ORDERS, create_partitioned_tables
+
+    partition_orders = PARTITION_ORDERS if partition_orders is None else partition_orders
+    if partition_orders:
+        # SalesOrderHeader e SalesOrderDetail particionadas por mês de OrderDate (partitioning.py)
+        create_partitioned_tables(engine, Base.metadata)
     Base.metadata.create_all(engine)
+    create_state_tables(engine)
+    create_summary_tables(engine)
+
+def get_chunk_size(table_name, chunk_sizes=None):
+    if chunk_sizes and table_name in chunk_sizes:
+        return chunk_sizes[table_name]
+    return table_chunk_sizes.get(table_name, DEFAULT_CHUNK_SIZE)
+
+def chain_batch_hooks(hooks):
+    # Um único batch_hook que abre os informados em ordem (e os fecha na ordem inversa)
+    hooks = [hook for hook in hooks if hook]
+    if len(hooks) <= 1:
+        return hooks[0] if hooks else None
+
+    @contextmanager
+    def batch_hook(connection, df):
+        with ExitStack() as stack:
+            for hook in hooks:
+                stack.enter_context(hook(connection, df))
+            yield
+    return batch_hook
+
+def insert_chunks_to_db(engine, chunks, table_name, write_method=None, finalize=None, reject_dir=None, batch_hook=None, route=None, run_id=None):
+    # Todos os blocos de um arquivo são gravados na mesma transação;
+    # finalize(connection) roda dentro dela, antes do commit.
+    # Com reject_dir, linhas com erro são isoladas e desviadas em vez de abortar a tabela; elas
+    # vão para <tabela>.<run_id>.rejects.csv depois do commit.
+    # batch_hook(connection, bloco), se informado, é um context manager que envolve cada gravação
+    # route(connection, bloco), se informado, divide o bloco em [(tabela, linhas)] a gravar
+    write_method = write_method or WRITE_METHOD
+    reject_path = reject_path_for(reject_dir, table_name, run_id or new_run_id()) if reject_dir else None
+    rejects = []
+    total_rows = 0
+    rejected_rows = 0
+
+    def write_batch(connection, df):
+        with batch_hook(connection, df) if batch_hook else nullcontext():
+            if route:
+                for table, part in route(connection, df):
+                    write_dataframe(connection, part, table.name, write_method, table)
+            else:
+                write_dataframe(connection, df, table_name, write_method, Base.metadata.tables.get(table_name))
 
-def insert_data_to_db(engine, df, table_name):
     try:
-        df.to_sql(table_name, engine, if_exists='append', index=False)
-        print(f"Dados inseridos com sucesso na tabela {table_name}.")
+        with engine.begin() as connection:
+            for df in chunks:
+                if reject_path:
+                    rejected = write_with_quarantine(connection, df, write_batch, rejects)
+                else:
+                    rejected = 0
+                    write_batch(connection, df)
+                total_rows += len(df) - rejected
+                rejected_rows += rejected
+            if finalize:
+                finalize(connection)
+        print(f"Dados inseridos com sucesso na tabela {table_name} ({total_rows} linhas).")
+        if rejected_rows:
+            write_rejects(rejects, reject_path)
+            print(f"{rejected_rows} linhas rejeitadas na tabela {table_name}; detalhes em {reject_path}.")
+        return total_rows
     except Exception as e:
         print(f"Erro ao inserir dados na tabela {table_name}: {e}")
+        return None
+
+def insert_data_to_db(engine, df, table_name, write_method=None, reject_dir=None):
+    return insert_chunks_to_db(engine, [df], table_name, write_method, reject_dir=reject_dir)
 
 def replace_comma_with_dot_and_convert(df, columns_to_convert):
     for column in columns_to_convert:
         if column in df.columns and df[column].dtype == object:
             df[column] = df[column].str.replace(',', '.').astype(float)
 
-def process_csv_files(engine, csv_folder):
-    columns_to_fix = ['StandardCost', 'ListPrice', 'UnitPrice', 'UnitPriceDiscount', 'LineTotal', 'SubTotal', 'Freight', 'TotalDue', 'TaxAmt']
-    for file_name in os.listdir(csv_folder):
-        if file_name.endswith('.csv'):
-            base_name_with_prefix, _ = os.path.splitext(file_name)
-            if base_name_with_prefix in file_to_class_mapping:
-                model_class = file_to_class_mapping[base_name_with_prefix]
-                nome_tabela = model_class.__tablename__
-                df = pd.read_csv(os.path.join(csv_folder, file_name), delimiter=';', encoding='utf-8')
-                
-                replace_comma_with_dot_and_convert(df, columns_to_fix)
-
-                # Tratamento específico para campos booleanos
-                if 'NameStyle' in df.columns:
-                    df['NameStyle'] = df['NameStyle'].astype(bool)
-                if 'MakeFlag' in df.columns:
-                    df['MakeFlag'] = df['MakeFlag'].astype(bool)
-                if 'FinishedGoodsFlag' in df.columns:
-                    df['FinishedGoodsFlag'] = df['FinishedGoodsFlag'].astype(bool)   
-                if 'OnlineOrderFlag' in df.columns:
-                    df['OnlineOrderFlag'] = df['OnlineOrderFlag'].astype(bool)
-
-
-                insert_data_to_db(engine, df, nome_tabela)
-            else:
-                print(f"Não foi encontrado mapeamento para o arquivo: {file_name}")
+def transform_chunk(df, model_class):
+    # Inteiros, booleanos, datas e NULL já chegam tipados do parser (ver coercion.py);
+    # restam apenas colunas numéricas com separador decimal diferente do padrão
+    replace_comma_with_dot_and_convert(df, numeric_columns(model_class))
+    if 'RejectError' in df.columns:
+        # Arquivos de rejeitadas e órfãs recarregados trazem o motivo como coluna extra
+        df = df.drop(columns='RejectError')
+    return df
+
+def read_csv_in_chunks(file_path, chunksize, read_options=None):
+    # Gerador: apenas um bloco de cada vez fica em memória. CSVs puros são mapeados em memória
+    # (mmap); os comprimidos são descomprimidos em fluxo direto para o parser (source_files.py)
+    read_options = read_options or {'delimiter': ';', 'encoding': 'utf-8'}
+    if is_plain_file(file_path):
+        with pd.read_csv(file_path, chunksize=chunksize, memory_map=True, **read_options) as reader:
+            yield from reader
+        return
+    with open_source(file_path) as source, pd.read_csv(source, chunksize=chunksize, **read_options) as reader:
+        yield from reader
+
+def read_csv_with_pandas(file_path, chunksize, model_class):
+    return read_csv_in_chunks(file_path, chunksize, build_read_options(model_class, file_path))
+
+def read_csv_with_arrow(file_path, chunksize, model_class):
+    from arrow_reader import read_csv_with_arrow as read
+
+    return read(file_path, chunksize, model_class)
+
+def read_csv_in_parallel(file_path, chunksize, model_class):
+    from parallel_reader import read_csv_in_parallel as read
+
+    return read(file_path, chunksize, model_class)
+
+# Leitores disponíveis: recebem (caminho, linhas_por_bloco, classe_modelo) e geram DataFrames
+csv_readers = {
+    'pandas': read_csv_with_pandas,
+    'arrow': read_csv_with_arrow,
+    'parallel': read_csv_in_parallel,
+}
+
+def load_csv_file(engine, file_path, model_class, chunksize=None, mode='append', write_method=None, incremental=False, skip_unchanged=False, reader=None, cache_dir=None, metrics=None, reject_dir=None, summaries=None, compact=None, adaptive=None, references=None, key_cache=None, detect_changes=None, run_id=None):
+    nome_tabela = model_class.__tablename__
+    # Nome dos arquivos de rejeitadas e órfãs desta carga (um por carga confirmada)
+    run_id = run_id or new_run_id()
+    chunksize = chunksize or get_chunk_size(nome_tabela)
+    finalizers = []
+    fingerprint = None
+
+    # Métricas por estágio deste arquivo, acrescentadas à lista `metrics` quando informada
+    file_metrics = new_file_metrics(nome_tabela, file_path)
+    if metrics is not None:
+        metrics.append(file_metrics)
+
+    if skip_unchanged:
+        file_name = os.path.basename(file_path)
+        with engine.connect() as connection:
+            entry = get_manifest_entry(connection, nome_tabela, file_name)
+        unchanged, fingerprint = check_file_fingerprint(file_path, entry)
+        if unchanged:
+            if entry.ModifiedTime != fingerprint['ModifiedTime']:
+                # Mesmo conteúdo com outro mtime: atualiza para que a próxima checagem dispense o hash
+                with engine.begin() as connection:
+                    record_manifest_entry(connection, nome_tabela, file_name, fingerprint)
+            print(f"Arquivo {file_name} sem alterações desde a última carga; tabela {nome_tabela} ignorada.")
+            file_metrics['status'] = 'skipped'
+            return {'inserted': 0, 'updated': 0} if mode == 'upsert' else 0
+        finalizers.append(lambda connection: record_manifest_entry(connection, nome_tabela, file_name, fingerprint))
+
+    def read_chunks():
+        # Leitura do CSV em sua própria thread (fila 'read'), à frente da transformação
+        typed = staged(csv_readers[reader or CSV_READER](file_path, chunksize, model_class), 'read', file_metrics)
+        return measure_each(typed, file_metrics, 'transform', transform_chunk, model_class)
+
+    cache_dir = os.getenv('PARQUET_CACHE_DIR') if cache_dir is None else cache_dir
+    if cache_dir:
+        from parquet_cache import cached_chunks
+
+        # Blocos já tipados e limpos vêm do cache Parquet quando o arquivo não mudou
+        # Com skip_unchanged, o hash do conteúdo já foi calculado pelo manifesto
+        content_hash = fingerprint['ContentHash'] if fingerprint else None
+        chunks = cached_chunks(read_chunks, file_path, model_class, chunksize, cache_dir, content_hash=content_hash)
+    else:
+        chunks = read_chunks()
+    # Mede a produção dos blocos (CSV ou cache); o tempo de transformação é descontado no final
+    chunks = measure_chunks(chunks, file_metrics, 'read')
+
+    if incremental:
+        # Apenas linhas com ModifiedDate acima da marca d'água seguem para o escritor
+        with engine.connect() as connection:
+            watermark = get_watermark(connection, nome_tabela)
+        watermark_state = {}
+        chunks = filter_chunks_by_watermark(chunks, watermark)
+
+        def advance_watermark(connection):
+            # A marca d'água avança na mesma transação dos dados, até o maior ModifiedDate gravado
+            watermark = next_watermark(watermark_state, reloadable=mode == 'upsert')
+            if watermark is not None:
+                set_watermark(connection, nome_tabela, watermark)
+        finalizers.append(advance_watermark)
+
+    references = CHECK_REFERENCES if references is None else references
+    orphan_counts = {}
+    orphans = None
+    reject_dir = reject_dir or REJECT_DIR
+    orphan_path = orphan_path_for(reject_dir or ORPHAN_DIR, nome_tabela, run_id)
+    if references and model_class.__table__.foreign_key_constraints:
+        # Linhas sem correspondente nas tabelas pai (chaves lidas uma vez e mantidas em memória)
+        # são desviadas para o arquivo de órfãos antes de chegar ao banco
+        key_cache = key_cache if key_cache is not None else new_key_cache()
+        drop = watermark_guard(drop_orphans, watermark_state) if incremental else drop_orphans
+        orphans = []
+        chunks = measure_each(chunks, file_metrics, 'references', drop, model_class, key_cache, engine, orphans, orphan_counts)
+        file_metrics['orphans'] = orphan_counts
+
+    detect_changes = DETECT_CHANGES if detect_changes is None else detect_changes
+    if detect_changes:
+        # Chaves repetidas no arquivo e linhas iguais às da última gravação não chegam ao banco;
+        # o hash das linhas gravadas é registrado em <tabela>RowHash
+        change_state = new_change_state(engine, model_class, updates=mode == 'upsert')
+        chunks = measure_each(chunks, file_metrics, 'changes', drop_unchanged, model_class, change_state)
+
+    compact = COMPACT_FRAMES if compact is None else compact
+    if compact:
+        # Tipos compactos escolhidos pelo modelo; o tempo entra no estágio 'compact'
+        chunks = measure_each(chunks, file_metrics, 'compact', compact_chunk, model_class)
+
+    # Transformação, filtro e compactação em outra thread (fila 'transform'): o bloco N+1 é
+    # preparado enquanto o bloco N é gravado
+    chunks = staged(chunks, 'transform', file_metrics)
+
+    adaptive = ADAPTIVE_BATCHES if adaptive is None else adaptive
+    if adaptive:
+        # Lotes de gravação ajustados pela vazão medida, a partir do melhor tamanho da carga anterior
+        tuner = new_batch_tuner(starting_batch_size(engine, nome_tabela, chunksize))
+        file_metrics['batches'] = tuner
+        chunks = adaptive_batches(chunks, tuner)
+        finalizers.append(lambda connection: save_batch_profile(connection, engine, nome_tabela, tuner))
+
+    def finalize(connection):
+        for finalizer in finalizers:
+            finalizer(connection)
+
+    # Tabelas de resumo atualizadas a cada bloco gravado, na mesma transação
+    summaries = MAINTAIN_SUMMARIES if summaries is None else summaries
+    batch_hook = chain_batch_hooks([
+        summary_batch_hook(nome_tabela, file_metrics) if summaries else None,
+        row_hash_hook(model_class) if detect_changes else None,
+        watermark_hook(watermark_state) if incremental else None,
+    ])
+
+    # Tabelas particionadas por mês: cada bloco é gravado direto nas partições dos seus meses,
+    # criadas conforme aparecem
+    from partitioning import partition_router, partitioned_table_names
+
+    with engine.connect() as connection:
+        partitioned = nome_tabela in partitioned_table_names(connection)
+    route = partition_router(engine, model_class, mode) if partitioned else None
+
+    if mode == 'upsert':
+        write = lambda chunks: upsert_chunks_to_db(engine, chunks, model_class, write_method, finalize, reject_dir, batch_hook, route, run_id)
+    else:
+        write = lambda chunks: insert_chunks_to_db(engine, chunks, nome_tabela, write_method, finalize, reject_dir, batch_hook, route, run_id)
+    result = measure_writer(chunks, file_metrics, write)
+    if detect_changes:
+        file_metrics['duplicates'] = change_state['duplicates']
+        file_metrics['unchanged'] = change_state['unchanged']
+        print(f"Tabela {nome_tabela}: {change_state['unchanged']} linhas sem alteração ignoradas, {change_state['duplicates']} chaves repetidas no arquivo descartadas.")
+    if orphans and result is not None:
+        # Órfãos gravados só depois do commit da tabela, no arquivo desta carga; os de cargas
+        # anteriores ficam até serem recarregados (reload_diverted_file)
+        write_rejects(orphans, orphan_path)
+        print(f"{sum(orphan_counts.values())} linhas órfãs desviadas na tabela {nome_tabela}; detalhes em {orphan_path}.")
+    file_metrics['stages']['read']['seconds'] -= file_metrics['stages']['transform']['seconds']
+    if 'summary' in file_metrics['stages']:
+        file_metrics['stages']['write']['seconds'] -= file_metrics['stages']['summary']['seconds']
+    return result
+
+def discover_csv_files(csv_folder):
+    # Retorna {nome_tabela: (caminho_do_arquivo, classe_modelo)} para os arquivos mapeados
+    return discover_source_files(csv_folder, file_to_class_mapping)
+
+def reload_diverted_file(engine, file_path, run_id=None, **load_options):
+    # Recarrega um arquivo de órfãs ou rejeitadas (<Tabela>.<run_id>.orphans.csv ou .rejects.csv)
+    # depois de corrigidos os dados ou as tabelas pai. A tabela vem do nome do arquivo, sem
+    # marca d'água, manifesto nem cache Parquet; as linhas que falharem de novo vão para os
+    # arquivos desta carga, e o arquivo recarregado é renomeado para .replayed
+    match = DIVERTED_FILE_PATTERN.match(os.path.basename(file_path))
+    models = {model_class.__tablename__: model_class for model_class in file_to_class_mapping.values()}
+    if not match or match['table'] not in models:
+        raise ValueError(f"Arquivo de rejeitadas ou órfãs sem tabela conhecida: {file_path}")
+    load_options.update(incremental=False, skip_unchanged=False, cache_dir='')
+    result = load_csv_file(engine, file_path, models[match['table']], run_id=run_id, **load_options)
+    if result is not None:
+        os.replace(file_path, f'{file_path}.replayed')
+    return result
+
+def process_csv_files(engine, csv_folder, chunk_sizes=None, max_workers=None, metrics_path=None, defer_constraints=None, **load_options):
+    # load_options é repassado a load_csv_file (mode, write_method, incremental, skip_unchanged, reader, cache_dir, reject_dir, summaries, compact, adaptive, references, detect_changes)
+    files = discover_csv_files(csv_folder)
+    graph = build_dependency_graph(Base.metadata, files)
+
+    defer_constraints = DEFER_CONSTRAINTS if defer_constraints is None else defer_constraints
+    if defer_constraints:
+        # Sem FKs durante a carga, as tabelas não precisam esperar pelas tabelas pai;
+        # a integridade é verificada de uma vez na reconstrução. Os resumos, porém, juntam
+        # detalhes e cabeçalhos já confirmados, e o detalhe particionado busca a OrderDate nos
+        # cabeçalhos; nesses casos a ordem do grafo é mantida.
+        drop_deferred_objects(engine, Base.metadata, files)
+        from partitioning import partitioned_table_names
+
+        with engine.connect() as connection:
+            partitioned = partitioned_table_names(connection) & set(files)
+        if not load_options.get('summaries', MAINTAIN_SUMMARIES) and not load_options.get('references', CHECK_REFERENCES) and not partitioned:
+            graph = {name: set() for name in graph}
+
+    max_workers = max_workers or LOAD_WORKERS
+    if engine.dialect.name == 'sqlite':
+        # O SQLite aceita apenas um escritor por vez
+        max_workers = 1
+
+    def load_table(table_name):
+        # Cada worker obtém sua própria conexão do pool do engine
+        file_path, model_class = files[table_name]
+        chunksize = get_chunk_size(table_name, chunk_sizes)
+        return load_csv_file(engine, file_path, model_class, chunksize, metrics=metrics, key_cache=key_cache, run_id=run_id, **load_options)
+
+    def rebuild_table(table_name):
+        return rebuild_deferred_objects(engine, Base.metadata, table_name)
+
+    # Chaves das tabelas pai compartilhadas pelas tabelas filhas desta carga; como cada tabela
+    # só começa depois das tabelas pai, as chaves são lidas já com os dados novos
+    key_cache = new_key_cache()
+    # Mesmo identificador nos arquivos de rejeitadas e órfãs de todas as tabelas desta carga
+    run_id = new_run_id()
+    metrics = []
+    try:
+        results = run_in_dependency_order(graph, load_table, max_workers)
+    finally:
+        if not defer_constraints:
+            # Índices aprovados pelo index_advisor.py que ainda não existam (ex.: banco novo)
+            from index_advisor import build_advised_indexes
+
+            build_advised_indexes(engine, Base.metadata, files)
+        else:
+            rebuilt = run_in_dependency_order(graph, rebuild_table, max_workers)
+            # Tempo de reconstrução registrado como um estágio à parte nas métricas de cada arquivo
+            for record in metrics:
+                if rebuilt.get(record['table']):
+                    record['stages']['rebuild'] = {'seconds': rebuilt[record['table']]['seconds'], 'rows': 0}
+    # Grava as métricas em METRICS_PATH (ou metrics_path), no formato METRICS_FORMAT
+    write_metrics(metrics, metrics_path)
+    return results
+
+def load_options_from_env():
+    # Opções de process_csv_files definidas pelas variáveis de ambiente (aqui e em cli.py), lidas
+    # na chamada: as constantes dos módulos podem ter sido lidas antes do load_dotenv
+    enabled = lambda name: os.getenv(name) == '1'
+    return {
+        'mode': os.getenv('LOAD_MODE', 'append'),
+        'reader': os.getenv('CSV_READER', 'pandas'),
+        'write_method': os.getenv('WRITE_METHOD', 'auto'),
+        'max_workers': int(os.getenv('LOAD_WORKERS', '4')),
+        'metrics_path': os.getenv('METRICS_PATH'),
+        # Vazio desativa o cache (None voltaria para PARQUET_CACHE_DIR da importação)
+        'cache_dir': os.getenv('PARQUET_CACHE_DIR', ''),
+        'reject_dir': os.getenv('REJECT_DIR'),
+        'incremental': enabled('INCREMENTAL_LOAD'),
+        'skip_unchanged': enabled('SKIP_UNCHANGED'),
+        'defer_constraints': enabled('DEFER_CONSTRAINTS'),
+        'summaries': enabled('MAINTAIN_SUMMARIES'),
+        'compact': enabled('COMPACT_FRAMES'),
+        'adaptive': enabled('ADAPTIVE_BATCHES'),
+        'references': enabled('CHECK_REFERENCES'),
+        'detect_changes': enabled('DETECT_CHANGES'),
+    }
 
 if __name__ == "__main__":
-    if DATABASE_URL and CSV_FOLDER_PATH:
+    csv_folder = os.getenv('CSV_FOLDER_PATH')
+    if os.getenv('DATABASE_URL') and csv_folder:
         engine = create_db_engine()
         create_tables(engine)
-        process_csv_files(engine, CSV_FOLDER_PATH)
+        process_csv_files(engine, csv_folder, **load_options_from_env())
     else:
         print("As configurações de conexão ao banco de dados ou o caminho da pasta CSV não estão definidas.")
 
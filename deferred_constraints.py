@@ -0,0 +1,119 @@
+import os
+import time
+
+from sqlalchemy import and_, func, inspect, select, text
+from sqlalchemy.exc import DBAPIError
+
+
+# Remove índices secundários e chaves estrangeiras antes da carga e os recria depois
+DEFER_CONSTRAINTS = os.getenv('DEFER_CONSTRAINTS') == '1'
+
+def foreign_key_columns(constraint):
+    return tuple(column.name for column in constraint.columns)
+
+def foreign_key_name(constraint):
+    # Mesmo nome que o PostgreSQL gera para uma FK sem nome explícito
+    if constraint.name:
+        return constraint.name
+    return f"{constraint.table.name}_{'_'.join(foreign_key_columns(constraint))}_fkey"
+
+def quote(connection, name):
+    return connection.dialect.identifier_preparer.quote(name)
+
+def first_line(error):
+    return str(getattr(error, 'orig', None) or error).strip().splitlines()[0]
+
+def drop_deferred_objects(engine, metadata, table_names):
+    # Remove os índices secundários (dos modelos e os aprovados pelo index_advisor.py) e, no
+    # PostgreSQL, as FKs declaradas nos modelos das tabelas a carregar. A chave primária é
+    # mantida, pois o upsert depende dela.
+    # No SQLite as FKs ficam na definição da tabela e só são verificadas com
+    # PRAGMA foreign_keys=ON, que o engine não ativa; basta validá-las no final.
+    from index_advisor import advised_indexes
+
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        for table_name in sorted(table_names):
+            table = metadata.tables[table_name]
+            for index in list(table.indexes) + advised_indexes(connection, metadata, table_name):
+                index.drop(connection, checkfirst=True)
+            if connection.dialect.name != 'postgresql':
+                continue
+            declared = {(foreign_key_columns(fk), fk.referred_table.name) for fk in table.foreign_key_constraints}
+            for fk in inspector.get_foreign_keys(table_name):
+                if (tuple(fk['constrained_columns']), fk['referred_table']) in declared:
+                    connection.execute(text(f"ALTER TABLE {quote(connection, table_name)} DROP CONSTRAINT {quote(connection, fk['name'])}"))
+
+def validate_postgresql_foreign_keys(connection, table):
+    # Recria as FKs como NOT VALID e as valida em seguida, em uma única varredura por FK.
+    # Se houver órfãos, a FK continua valendo para novas linhas e a violação é relatada.
+    # Tabelas particionadas (partitioning.py) não aceitam FKs NOT VALID: a FK é criada e validada
+    # no mesmo comando, e com órfãos fica de fora. As FKs para elas não existem nesse layout.
+    from partitioning import partitioned_table_names
+
+    existing = {tuple(fk['constrained_columns']) for fk in inspect(connection).get_foreign_keys(table.name)}
+    partitioned = partitioned_table_names(connection)
+    violations = []
+    for fk in sorted(table.foreign_key_constraints, key=foreign_key_columns):
+        if fk.referred_table.name in partitioned:
+            continue
+        name = quote(connection, foreign_key_name(fk))
+        table_name = quote(connection, table.name)
+        check = f"ALTER TABLE {table_name} VALIDATE CONSTRAINT {name}"
+        if foreign_key_columns(fk) not in existing:
+            columns = ', '.join(quote(connection, column) for column in foreign_key_columns(fk))
+            referred = ', '.join(quote(connection, element.column.name) for element in fk.elements)
+            add = (f"ALTER TABLE {table_name} ADD CONSTRAINT {name} FOREIGN KEY ({columns}) "
+                   f"REFERENCES {quote(connection, fk.referred_table.name)} ({referred})")
+            if table.name in partitioned:
+                check = add
+            else:
+                connection.execute(text(f"{add} NOT VALID"))
+        try:
+            with connection.begin_nested():
+                connection.execute(text(check))
+        except DBAPIError as e:
+            violations.append(first_line(e))
+    return violations
+
+def validate_sqlite_foreign_keys(connection, table):
+    # Cada linha de foreign_key_check é um registro órfão: (tabela, rowid, tabela pai, fkid)
+    rows = connection.execute(text(f"PRAGMA foreign_key_check({quote(connection, table.name)})")).fetchall()
+    orphans = {}
+    for row in rows:
+        orphans[row[2]] = orphans.get(row[2], 0) + 1
+    return [f"{count} linhas sem correspondente em {parent}" for parent, count in sorted(orphans.items())]
+
+def count_orphans(connection, fk):
+    # Linhas da tabela filha com a FK preenchida e sem correspondente na tabela pai, por consulta
+    # (sem alterar restrições; vale também para FKs que não existem no banco)
+    child, parent = fk.table, fk.referred_table
+    join = child.outerjoin(parent, and_(*[element.parent == element.column for element in fk.elements]))
+    filled = [element.parent.isnot(None) for element in fk.elements]
+    query = select(func.count()).select_from(join).where(*filled, fk.elements[0].column.is_(None))
+    return connection.execute(query).scalar()
+
+foreign_key_validators = {
+    'postgresql': validate_postgresql_foreign_keys,
+    'sqlite': validate_sqlite_foreign_keys,
+}
+
+def rebuild_deferred_objects(engine, metadata, table_name):
+    # Recria os índices a partir dos modelos e valida as FKs da tabela; idempotente, de modo
+    # que uma carga interrompida é corrigida na próxima execução
+    from index_advisor import advised_indexes
+
+    table = metadata.tables[table_name]
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        indexes = list(table.indexes) + advised_indexes(connection, metadata, table_name)
+        for index in sorted(indexes, key=lambda index: index.name):
+            index.create(connection, checkfirst=True)
+        validator = foreign_key_validators.get(connection.dialect.name)
+        violations = validator(connection, table) if validator else []
+    seconds = time.perf_counter() - start
+
+    print(f"Índices e chaves estrangeiras da tabela {table_name} recriados em {seconds:.2f}s.")
+    for violation in violations:
+        print(f"Chave estrangeira violada na tabela {table_name}: {violation}")
+    return {'seconds': seconds, 'indexes': len(indexes), 'foreign_keys': len(table.foreign_key_constraints), 'violations': violations}
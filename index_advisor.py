@@ -0,0 +1,351 @@
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import Column, Index, MetaData, Table, create_engine, delete, select
+
+from load_state import AdvisedIndex
+
+# Arquivo com as consultas da carga de trabalho analisada pelo advisor
+INDEX_WORKLOAD = os.getenv('INDEX_WORKLOAD', 'respostas em SQL.sql')
+
+# Um índice só é mantido se o plano o usar, alguma consulta ficar ao menos tantas vezes mais rápida
+# e nenhuma outra ficar tantas vezes mais lenta
+MIN_SPEEDUP = float(os.getenv('INDEX_MIN_SPEEDUP', '1.2'))
+
+# Execuções por medição (vale a melhor) e largura máxima das colunas incluídas em um índice de cobertura
+TIMING_REPEAT = 5
+MAX_INCLUDE_COLUMNS = 4
+
+# Entre candidatos da mesma primeira coluna, um índice mais largo (mais colunas ou cobertura) só
+# substitui um mais estreito se o ganho for ao menos tanto maior; diferenças menores são ruído
+WIDER_INDEX_MARGIN = 0.1
+
+SQL_KEYWORDS = {
+    'on', 'where', 'join', 'left', 'right', 'inner', 'outer', 'full', 'cross', 'group', 'order',
+    'having', 'limit', 'union', 'as', 'select', 'from', 'with',
+}
+CLAUSE_END = r'(?=\b(?:JOIN|LEFT|RIGHT|INNER|FULL|CROSS|WHERE|GROUP|HAVING|ORDER|LIMIT|UNION)\b|\)|$)'
+
+def parse_workload(path):
+    # Consultas SELECT/WITH do arquivo, sem comentários
+    with open(path, encoding='utf-8') as f:
+        sql = f.read()
+    sql = re.sub(r'/\*.*?\*/', ' ', sql, flags=re.S)
+    sql = re.sub(r'--[^\n]*', ' ', sql)
+    statements = [' '.join(statement.split()) for statement in sql.split(';')]
+    return [statement for statement in statements if re.match(r'(SELECT|WITH)\b', statement, re.I)]
+
+def table_references(sql, metadata):
+    # Apelido (ou nome) -> tabela dos modelos, para cada FROM/JOIN com uma tabela conhecida
+    references = {}
+    for name, alias in re.findall(r'\b(?:FROM|JOIN)\s+("[^"]+"|[\w.]+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.I):
+        table = metadata.tables.get(name.strip('"'))
+        if table is None:
+            continue
+        references[name.strip('"')] = table
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            references[alias] = table
+    return references
+
+def column_references(text, references):
+    # (tabela, coluna, posição) de cada coluna citada em um trecho da consulta
+    found = []
+    for match in re.finditer(r'(?:(\w+)\.)?"(\w+)"|(\w+)\.(\w+)', text):
+        alias, name = (match.group(1), match.group(2)) if match.group(2) else (match.group(3), match.group(4))
+        if alias:
+            tables = [references[alias]] if alias in references else []
+        else:
+            tables = {table for table in references.values() if name in table.c}
+        if len(tables) == 1:
+            table = next(iter(tables))
+            if name in table.c:
+                found.append((table, name, match.end()))
+    return found
+
+def profile_query(sql, metadata):
+    # Colunas de cada tabela usadas em junções, filtros (igualdade ou intervalo) e agrupamentos
+    references = table_references(sql, metadata)
+    profile = {}
+
+    def usage(table):
+        return profile.setdefault(table.name, {'join': [], 'equality': [], 'range': [], 'group': [], 'columns': set()})
+
+    for table, name, _ in column_references(sql, references):
+        usage(table)['columns'].add(name)
+    for clause in re.findall(r'\bON\b(.*?)' + CLAUSE_END, sql, re.I):
+        for table, name, _ in column_references(clause, references):
+            usage(table)['join'].append(name)
+    for clause in re.findall(r'\bWHERE\b(.*?)' + CLAUSE_END, sql, re.I):
+        for table, name, end in column_references(clause, references):
+            operator = re.match(r'\s*(>=|<=|<>|!=|=|<|>|BETWEEN\b|IN\b|LIKE\b)', clause[end:], re.I)
+            if operator:
+                kind = 'equality' if operator.group(1).upper() in ('=', 'IN') else 'range'
+                usage(table)[kind].append(name)
+    for clause in re.findall(r'\bGROUP\s+BY\b(.*?)' + CLAUSE_END, sql, re.I):
+        for table, name, _ in column_references(clause, references):
+            usage(table)['group'].append(name)
+    return profile
+
+def unique(names):
+    return tuple(dict.fromkeys(names))
+
+def index_name(table_name, columns, include):
+    return f"ix_{table_name}_{'_'.join(columns)}" + ('_cov' if include else '')
+
+def propose_indexes(queries, metadata):
+    # Candidatos por consulta: um índice por coluna de junção, um composto para os filtros
+    # (igualdade antes de intervalo) e um para o agrupamento; cada um em versão simples e de
+    # cobertura (com as demais colunas da tabela usadas pela consulta). Índices cujo início
+    # coincide com a chave primária são descartados.
+    candidates = {}
+    for sql in queries:
+        for table_name, usage in profile_query(sql, metadata).items():
+            primary_key = tuple(column.name for column in metadata.tables[table_name].primary_key)
+            keys = [(name,) for name in unique(usage['join'])]
+            keys.append(unique(usage['equality'] + usage['range']))
+            keys.append(unique(usage['group']))
+            for columns in keys:
+                if not columns or primary_key[:len(columns)] == columns:
+                    continue
+                include = tuple(sorted(usage['columns'] - set(columns)))
+                variants = [()] + ([include] if include and len(include) <= MAX_INCLUDE_COLUMNS else [])
+                for variant in variants:
+                    name = index_name(table_name, columns, variant)
+                    candidates.setdefault(name, {'name': name, 'table': table_name, 'columns': columns, 'include': variant})
+    return list(candidates.values())
+
+def build_index(metadata, table_name, columns, include, name, dialect_name):
+    # Índice sobre uma cópia da tabela, para não alterar os modelos. No PostgreSQL as colunas de
+    # cobertura vão em INCLUDE; nos demais dialetos, ao final da chave.
+    source = metadata.tables[table_name]
+    copy = Table(table_name, MetaData(), *[Column(column.name, column.type) for column in source.columns])
+    if dialect_name == 'postgresql':
+        return Index(name, *[copy.c[column] for column in columns], postgresql_include=list(include))
+    return Index(name, *[copy.c[column] for column in columns + include])
+
+def split_columns(value):
+    return tuple(value.split(',')) if value else ()
+
+def advised_indexes(connection, metadata, table_name=None):
+    # Índices aprovados pelo advisor (tabela AdvisedIndex), prontos para create/drop
+    table = AdvisedIndex.__table__
+    query = select(table)
+    if table_name:
+        query = query.where(table.c.TableName == table_name)
+    return [
+        build_index(metadata, row.TableName, split_columns(row.Columns), split_columns(row.IncludeColumns),
+                    row.IndexName, connection.dialect.name)
+        for row in connection.execute(query)
+        if row.TableName in metadata.tables
+    ]
+
+def build_advised_indexes(engine, metadata, table_names):
+    # Cria, após a carga, os índices aprovados que ainda não existem nas tabelas carregadas
+    with engine.begin() as connection:
+        for table_name in sorted(table_names):
+            for index in advised_indexes(connection, metadata, table_name):
+                index.create(connection, checkfirst=True)
+
+def explain(connection, sql):
+    if connection.dialect.name == 'postgresql':
+        return '\n'.join(row[0] for row in connection.exec_driver_sql(f'EXPLAIN {sql}'))
+    if connection.dialect.name == 'sqlite':
+        return '\n'.join(row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}'))
+    return ''
+
+def uses_index(plan, name):
+    # Nome inteiro no plano: ix_Person_FirstName_LastName não casa com ix_Person_FirstName_LastName_cov
+    return re.search(rf'(?<!\w){re.escape(name)}(?!\w)', plan) is not None
+
+def time_query(connection, sql, repeat):
+    # Melhor de `repeat` execuções, com todas as linhas lidas
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.exec_driver_sql(sql).fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def analyze(connection, table_name):
+    connection.exec_driver_sql(f'ANALYZE {connection.dialect.identifier_preparer.quote(table_name)}')
+
+def measure_queries(connection, queries, repeat):
+    measurements = []
+    for sql in queries:
+        try:
+            measurements.append({'plan': explain(connection, sql), 'seconds': time_query(connection, sql, repeat), 'error': None})
+        except Exception as e:
+            measurements.append({'plan': None, 'seconds': None, 'error': str(getattr(e, 'orig', None) or e).strip().splitlines()[0]})
+    return measurements
+
+def evaluate_candidate(connection, metadata, candidate, queries, affected, current, repeat):
+    # Cria o índice, mede as consultas da tabela cujo plano passa a usá-lo e o remove. As
+    # consultas que não o usam ficam de fora: a diferença de tempo nelas seria apenas ruído.
+    index = build_index(metadata, candidate['table'], candidate['columns'], candidate['include'],
+                        candidate['name'], connection.dialect.name)
+    index.create(connection)
+    analyze(connection, candidate['table'])
+    speedups = {}
+    try:
+        for i in affected:
+            if uses_index(explain(connection, queries[i]), candidate['name']):
+                seconds = time_query(connection, queries[i], repeat)
+                if seconds is not None:
+                    speedups[i] = current[i] / seconds if seconds else float('inf')
+    finally:
+        index.drop(connection)
+    candidate['used'] = bool(speedups)
+    candidate['speedup'] = max(speedups.values(), default=1.0)
+    candidate['worst_speedup'] = min(speedups.values(), default=1.0)
+    return candidate
+
+def index_width(candidate):
+    return len(candidate['columns']) + len(candidate['include'])
+
+def pick_candidate(helpful):
+    # Do mais estreito ao mais largo: cada um só é trocado por outro com ganho acima da margem
+    best = None
+    for candidate in sorted(helpful, key=index_width):
+        if best is None or candidate['speedup'] > best['speedup'] * (1 + WIDER_INDEX_MARGIN):
+            best = candidate
+    return best
+
+def slowest_ratio(before, after):
+    # Maior razão entre o tempo atual e o da linha de base, nas consultas medidas nos dois momentos
+    ratios = [new['seconds'] / old['seconds'] for old, new in zip(before, after)
+              if old['seconds'] and new['seconds'] is not None]
+    return max(ratios, default=1.0)
+
+def measure_without(connection, metadata, candidates, queries, repeat):
+    # Mede as consultas sem os índices dos candidatos, recriados em seguida
+    indexes = [build_index(metadata, candidate['table'], candidate['columns'], candidate['include'],
+                           candidate['name'], connection.dialect.name) for candidate in candidates]
+    tables = {candidate['table'] for candidate in candidates}
+    for index in indexes:
+        index.drop(connection)
+    for table_name in tables:
+        analyze(connection, table_name)
+    measurements = measure_queries(connection, queries, repeat)
+    for index in indexes:
+        index.create(connection)
+    for table_name in tables:
+        analyze(connection, table_name)
+    return measurements
+
+def record_advised_index(connection, candidate):
+    connection.execute(AdvisedIndex.__table__.insert().values(
+        IndexName=candidate['name'],
+        TableName=candidate['table'],
+        Columns=','.join(candidate['columns']),
+        IncludeColumns=','.join(candidate['include']),
+        Speedup=candidate['speedup'],
+        CreatedAt=datetime.now(),
+    ))
+
+def advise_indexes(engine, metadata, workload_path=None, repeat=TIMING_REPEAT, min_speedup=None):
+    # Propõe índices a partir das consultas do arquivo, testa cada um isoladamente (EXPLAIN +
+    # tempo antes e depois) e mantém, entre os candidatos com a mesma primeira coluna (um índice
+    # composto também atende a consultas pela primeira coluna), o de maior ganho, se ele ajudar.
+    # No fim, o conjunto aprovado é comparado com a linha de base (ver abaixo).
+    # Deve rodar após a carga, com as tabelas já populadas.
+    min_speedup = min_speedup or MIN_SPEEDUP
+    # Ao menos uma execução, para que time_query sempre retorne um tempo
+    repeat = max(repeat, 1)
+    queries = parse_workload(workload_path or INDEX_WORKLOAD)
+    candidates = propose_indexes(queries, metadata)
+    query_tables = [set(profile_query(sql, metadata)) for sql in queries]
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        # A linha de base não deve contar com índices de uma execução anterior
+        for index in advised_indexes(connection, metadata):
+            index.drop(connection, checkfirst=True)
+        connection.execute(delete(AdvisedIndex.__table__))
+        for table_name in set().union(*query_tables):
+            analyze(connection, table_name)
+
+        before = measure_queries(connection, queries, repeat)
+        current = {i: m['seconds'] for i, m in enumerate(before) if m['error'] is None}
+        for i, measurement in enumerate(before):
+            if measurement['error']:
+                print(f"Consulta {i + 1} ignorada: {measurement['error']}")
+
+        groups = {}
+        for candidate in candidates:
+            groups.setdefault((candidate['table'], candidate['columns'][0]), []).append(candidate)
+
+        kept = []
+        for (table_name, _), variants in groups.items():
+            affected = [i for i in current if table_name in query_tables[i]]
+            if not affected:
+                continue
+            evaluated = []
+            for candidate in variants:
+                try:
+                    evaluated.append(evaluate_candidate(connection, metadata, candidate, queries, affected, current, repeat))
+                except Exception as e:
+                    # Um candidato que não pode ser criado ou medido é ignorado, sem interromper os demais
+                    candidate['error'] = str(getattr(e, 'orig', None) or e).strip().splitlines()[0]
+            helpful = [c for c in evaluated
+                       if c['used'] and c['speedup'] >= min_speedup and c['worst_speedup'] >= 1 / min_speedup]
+            if not helpful:
+                continue
+            best = pick_candidate(helpful)
+            build_index(metadata, table_name, best['columns'], best['include'], best['name'],
+                        connection.dialect.name).create(connection)
+            analyze(connection, table_name)
+            record_advised_index(connection, best)
+            kept.append(best)
+            # Os próximos candidatos são comparados com os índices já aprovados
+            for i in affected:
+                current[i] = time_query(connection, queries[i], repeat)
+
+        after = measure_queries(connection, queries, repeat)
+        # Linha de base medida de novo, sem os aprovados: depois de tantos índices criados e removidos,
+        # a mesma consulta pode levar outro tempo, e a comparação com a medição inicial mediria essa deriva
+        baseline = measure_without(connection, metadata, kept, queries, repeat) if kept else after
+        # Aprovados um a um, os índices podem, juntos, deixar uma consulta mais lenta que a linha de
+        # base. Sai, a cada passo, o índice cuja remoção mais reduz a pior piora, até nenhuma
+        # consulta ficar mais de min_speedup vezes mais lenta.
+        while kept and slowest_ratio(baseline, after) > min_speedup:
+            trials = [(measure_without(connection, metadata, [candidate], queries, repeat), candidate) for candidate in kept]
+            after, removed = min(trials, key=lambda trial: slowest_ratio(baseline, trial[0]))
+            build_index(metadata, removed['table'], removed['columns'], removed['include'], removed['name'],
+                        connection.dialect.name).drop(connection)
+            analyze(connection, removed['table'])
+            table = AdvisedIndex.__table__
+            connection.execute(delete(table).where(table.c.IndexName == removed['name']))
+            kept.remove(removed)
+            removed['removed'] = True
+
+    for i, (old, new) in enumerate(zip(baseline, after)):
+        if before[i]['error'] is None and old['seconds'] is not None:
+            new_time = '-' if new['seconds'] is None else f"{new['seconds'] * 1000:.1f} ms"
+            print(f"Consulta {i + 1}: {old['seconds'] * 1000:.1f} ms -> {new_time}")
+    for candidate in candidates:
+        if 'error' in candidate:
+            print(f"{candidate['name']}: ignorado ({candidate['error']})")
+        elif 'speedup' in candidate:
+            status = 'mantido' if candidate in kept else 'removido no conjunto' if candidate.get('removed') else 'descartado'
+            print(f"{candidate['name']}: {status} (ganho {candidate['speedup']:.2f}x, "
+                  f"{'usado' if candidate['used'] else 'não usado'} pelo plano)")
+    return {'queries': queries, 'before': before, 'baseline': baseline, 'after': after, 'candidates': candidates, 'kept': kept}
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    from database_loader import Base, create_tables
+
+    load_dotenv()
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("Uso: DATABASE_URL=... python index_advisor.py [arquivo.sql]")
+        sys.exit(2)
+    engine = create_engine(database_url)
+    create_tables(engine)
+    # INDEX_WORKLOAD e INDEX_MIN_SPEEDUP relidos aqui: as constantes do módulo foram lidas antes do .env
+    workload_path = sys.argv[1] if len(sys.argv) > 1 else os.getenv('INDEX_WORKLOAD')
+    advise_indexes(engine, Base.metadata, workload_path, min_speedup=float(os.getenv('INDEX_MIN_SPEEDUP', MIN_SPEEDUP)))
@@ -0,0 +1,133 @@
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Integer, func, select
+
+# Verifica as chaves estrangeiras de cada bloco em memória antes da gravação
+CHECK_REFERENCES = os.getenv('CHECK_REFERENCES') == '1'
+
+# Pasta do arquivo de órfãos quando a carga não tem REJECT_DIR
+ORPHAN_DIR = os.getenv('ORPHAN_DIR', 'rejeitadas')
+
+# Tabelas pai com pelo menos tantas chaves usam um filtro de Bloom em vez do array ordenado:
+# memória fixa, mas uma fração BLOOM_FALSE_POSITIVE_RATE dos órfãos passa e fica para o banco
+BLOOM_MIN_KEYS = int(os.getenv('KEY_CACHE_BLOOM_MIN_KEYS', '10000000'))
+BLOOM_FALSE_POSITIVE_RATE = float(os.getenv('KEY_CACHE_BLOOM_FP_RATE', '0.01'))
+
+# Linhas buscadas por vez ao ler as chaves de uma tabela pai
+KEY_FETCH_ROWS = 100000
+
+def new_key_cache():
+    # Chaves das tabelas pai, lidas uma vez por carga e compartilhadas entre as threads
+    return {'lock': threading.Lock(), 'keys': {}}
+
+def orphan_path_for(directory, table_name, run_id=None):
+    # Um arquivo por carga confirmada (<tabela>.<run_id>.orphans.csv), como o das rejeitadas
+    if run_id:
+        return os.path.join(directory, f'{table_name}.{run_id}.orphans.csv')
+    return os.path.join(directory, f'{table_name}.orphans.csv')
+
+def packs_exactly(columns):
+    # Até duas colunas inteiras (32 bits no modelo) cabem sem perda em um único int64
+    return len(columns) <= 2 and all(isinstance(column.type, Integer) for column in columns)
+
+def pack_keys(frame, exact):
+    # Uma chave (simples ou composta) por linha como int64; sem nulos
+    if not exact:
+        # Demais chaves pelo hash do texto, igual para os tipos do pai (banco) e do filho (pandas)
+        return pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy().view(np.int64)
+    values = [frame[name].to_numpy(dtype=np.int64) for name in frame.columns]
+    if len(values) == 1:
+        return values[0]
+    return (values[0] << 32) + (values[1] & 0xFFFFFFFF)
+
+def mix64(values):
+    # splitmix64: espalha chaves sequenciais (IDs) por todos os bits antes do módulo
+    x = values.view(np.uint64)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def new_bloom_filter(expected_keys, false_positive_rate=None):
+    false_positive_rate = false_positive_rate or BLOOM_FALSE_POSITIVE_RATE
+    size = max(int(-expected_keys * math.log(false_positive_rate) / math.log(2) ** 2), 64)
+    hashes = max(round(size / max(expected_keys, 1) * math.log(2)), 1)
+    return {'kind': 'bloom', 'bits': np.zeros((size + 7) // 8, dtype=np.uint8), 'size': size, 'hashes': hashes}
+
+def bloom_positions(bloom, keys):
+    # Hash duplo (h1 + i*h2) para as k posições de cada chave
+    with np.errstate(over='ignore'):
+        h1 = mix64(keys)
+        h2 = mix64(h1.view(np.int64)) | np.uint64(1)
+        size = np.uint64(bloom['size'])
+        for i in range(bloom['hashes']):
+            yield ((h1 + np.uint64(i) * h2) % size).astype(np.int64)
+
+def bloom_add(bloom, keys):
+    for positions in bloom_positions(bloom, keys):
+        np.bitwise_or.at(bloom['bits'], positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+
+def bloom_contains(bloom, keys):
+    found = np.ones(len(keys), dtype=bool)
+    for positions in bloom_positions(bloom, keys):
+        found &= ((bloom['bits'][positions >> 3] >> (positions & 7)) & 1).astype(bool)
+    return found
+
+def load_parent_keys(engine, parent, referred, exact):
+    # Lê as chaves da tabela pai em partes: array ordenado e sem repetições, ou filtro de Bloom
+    columns = [parent.c[name] for name in referred]
+    with engine.connect() as connection:
+        count = connection.execute(select(func.count()).select_from(parent)).scalar()
+        result = connection.execution_options(yield_per=KEY_FETCH_ROWS).execute(select(*columns))
+        if count >= BLOOM_MIN_KEYS:
+            keys = new_bloom_filter(count)
+            for rows in result.partitions():
+                bloom_add(keys, pack_keys(pd.DataFrame(rows, columns=referred), exact))
+            return keys
+        parts = [pack_keys(pd.DataFrame(rows, columns=referred), exact) for rows in result.partitions()]
+    packed = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+    return {'kind': 'sorted', 'keys': np.unique(packed)}
+
+def parent_keys(key_cache, engine, fk, exact):
+    parent = fk.referred_table
+    referred = tuple(element.column.name for element in fk.elements)
+    with key_cache['lock']:
+        if (parent.name, referred) not in key_cache['keys']:
+            key_cache['keys'][parent.name, referred] = load_parent_keys(engine, parent, referred, exact)
+        return key_cache['keys'][parent.name, referred]
+
+def contains(keys, values):
+    if keys['kind'] == 'bloom':
+        return bloom_contains(keys, values)
+    # Busca binária vetorizada no array ordenado
+    positions = np.searchsorted(keys['keys'], values)
+    found = positions < len(keys['keys'])
+    found[found] = keys['keys'][positions[found]] == values[found]
+    return found
+
+def drop_orphans(df, model_class, key_cache, engine, orphans, counts):
+    # Remove do bloco as linhas cujas FKs não existem na tabela pai (nulos não são checados,
+    # como no banco), guarda-as com o motivo na lista orphans e conta-as por FK em counts
+    table = model_class.__table__
+    orphan = np.zeros(len(df), dtype=bool)
+    reasons = np.full(len(df), '', dtype=object)
+    for fk in sorted(table.foreign_key_constraints, key=lambda fk: [column.name for column in fk.columns]):
+        names = [column.name for column in fk.columns]
+        if fk.referred_table is table or not set(names) <= set(df.columns):
+            continue
+        exact = packs_exactly(list(fk.columns))
+        present = df[names].notna().all(axis=1).to_numpy()
+        missing = np.zeros(len(df), dtype=bool)
+        missing[present] = ~contains(parent_keys(key_cache, engine, fk, exact), pack_keys(df.loc[present, names], exact))
+        if missing.any():
+            label = f"{', '.join(names)} -> {fk.referred_table.name}"
+            counts[label] = counts.get(label, 0) + int(missing.sum())
+            reasons[missing & ~orphan] = f"Sem correspondente em {label}"
+            orphan |= missing
+    if not orphan.any():
+        return df
+    orphans.append((df[orphan], reasons[orphan]))
+    return df[~orphan]
@@ -0,0 +1,120 @@
+import os
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+from load_state import get_load_profile, record_load_profile
+
+# Pool de conexões: cada tabela carregada em paralelo usa uma conexão (LOAD_WORKERS),
+# mais as de controle (marca d'água, manifesto, resumos)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+
+# Linhas por comando INSERT ... VALUES gerado pelo SQLAlchemy para executemany
+INSERTMANYVALUES_PAGE_SIZE = int(os.getenv('INSERTMANYVALUES_PAGE_SIZE', '1000'))
+
+# Modo do executemany do psycopg2 ('values_only' ou 'values_plus_batch')
+DB_EXECUTEMANY_MODE = os.getenv('DB_EXECUTEMANY_MODE', 'values_plus_batch')
+
+# Ajusta o tamanho dos lotes de gravação durante a carga (ver adaptive_batches)
+ADAPTIVE_BATCHES = os.getenv('ADAPTIVE_BATCHES') == '1'
+
+# Limites do lote de gravação, em linhas
+MIN_BATCH_ROWS = int(os.getenv('MIN_BATCH_ROWS', '1000'))
+MAX_BATCH_ROWS = int(os.getenv('MAX_BATCH_ROWS', '500000'))
+
+# Lotes mais lentos que isso são reduzidos mesmo que a vazão aumente: transações longas
+# seguram memória e bloqueios
+MAX_BATCH_SECONDS = float(os.getenv('MAX_BATCH_SECONDS', '5'))
+
+# Fator de crescimento/redução do lote e variação mínima de vazão considerada real
+BATCH_GROWTH = 1.5
+RATE_TOLERANCE = 0.05
+
+def engine_options(database_url):
+    # Opções do create_engine a partir das variáveis acima, conforme o dialeto e o driver
+    url = make_url(database_url)
+    options = {'insertmanyvalues_page_size': INSERTMANYVALUES_PAGE_SIZE, 'pool_pre_ping': True}
+    if url.get_backend_name() != 'sqlite':
+        # No SQLite o pool depende do tipo de banco (arquivo ou memória); mantém o padrão
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+    if url.get_driver_name() == 'psycopg2':
+        options['executemany_mode'] = DB_EXECUTEMANY_MODE
+    return options
+
+def create_tuned_engine(database_url):
+    return create_engine(database_url, **engine_options(database_url))
+
+def profile_target(engine):
+    # Identifica o destino sem a senha: o mesmo banco em outra máquina tem outro perfil
+    return engine.url.render_as_string(hide_password=True)[:255]
+
+def new_batch_tuner(batch_size, min_rows=None, max_rows=None):
+    min_rows = min_rows or MIN_BATCH_ROWS
+    max_rows = max_rows or MAX_BATCH_ROWS
+    return {
+        'batch_size': min(max(int(batch_size), min_rows), max_rows),
+        'min_rows': min_rows,
+        'max_rows': max_rows,
+        'direction': 1,
+        'last_rate': None,
+        'best_size': None,
+        'best_rate': None,
+        'batches': 0,
+    }
+
+def observe_batch(tuner, rows, seconds):
+    # Subida de encosta sobre a vazão (linhas/s): continua na mesma direção enquanto a vazão
+    # melhora e inverte quando piora; lotes acima de MAX_BATCH_SECONDS sempre diminuem.
+    # Lotes parciais (fim do arquivo) não dizem nada sobre o tamanho atual e são ignorados.
+    if rows < tuner['batch_size'] or seconds <= 0:
+        return
+    rate = rows / seconds
+    tuner['batches'] += 1
+    if tuner['best_rate'] is None or rate > tuner['best_rate']:
+        tuner['best_size'], tuner['best_rate'] = tuner['batch_size'], rate
+
+    if seconds > MAX_BATCH_SECONDS:
+        tuner['direction'] = -1
+    elif tuner['last_rate'] is not None and rate < tuner['last_rate'] * (1 - RATE_TOLERANCE):
+        tuner['direction'] = -tuner['direction']
+    tuner['last_rate'] = rate
+
+    size = int(tuner['batch_size'] * BATCH_GROWTH ** tuner['direction'])
+    tuner['batch_size'] = min(max(size, tuner['min_rows']), tuner['max_rows'])
+
+def adaptive_batches(chunks, tuner):
+    # Reagrupa os blocos lidos em lotes de tuner['batch_size'] linhas. O tempo entre entregar
+    # um lote e receber o pedido do próximo é o tempo de gravação desse lote (o escritor grava
+    # cada lote antes de pedir o seguinte), usado para ajustar o tamanho.
+    pending = []
+    pending_rows = 0
+
+    def deliver(df):
+        start = time.perf_counter()
+        yield df
+        observe_batch(tuner, len(df), time.perf_counter() - start)
+
+    for df in chunks:
+        pending.append(df)
+        pending_rows += len(df)
+        while pending_rows >= tuner['batch_size']:
+            buffered = pd.concat(pending) if len(pending) > 1 else pending[0]
+            batch, rest = buffered.iloc[:tuner['batch_size']], buffered.iloc[tuner['batch_size']:]
+            pending, pending_rows = ([rest] if len(rest) else []), len(rest)
+            yield from deliver(batch)
+    if pending_rows:
+        yield from deliver(pd.concat(pending) if len(pending) > 1 else pending[0])
+
+def starting_batch_size(engine, table_name, default):
+    # Melhor tamanho da última carga da tabela neste destino, ou o tamanho do bloco de leitura
+    with engine.connect() as connection:
+        profile = get_load_profile(connection, profile_target(engine), table_name)
+    return profile.BatchSize if profile is not None and profile.BatchSize else default
+
+def save_batch_profile(connection, engine, table_name, tuner):
+    # Grava o melhor tamanho observado, na mesma transação dos dados
+    if tuner['best_size'] is not None:
+        record_load_profile(connection, profile_target(engine), table_name, tuner['best_size'], tuner['best_rate'])
@@ -0,0 +1,181 @@
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import Column, String, DateTime, BigInteger, Float, select
+from sqlalchemy.orm import declarative_base
+
+from source_files import open_source, source_stat
+
+# Tabelas de controle da carga, separadas dos modelos de negócio em Base
+StateBase = declarative_base()
+
+# Formato de ModifiedDate nos arquivos de origem (ex.: 2014-02-08 10:01:36.827)
+MODIFIED_DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# Marca d'água (maior ModifiedDate já confirmado) por tabela
+class LoadWatermark(StateBase):
+    __tablename__ = 'LoadWatermark'
+    TableName = Column(String(255), primary_key=True)
+    ModifiedDate = Column(DateTime)
+    UpdatedAt = Column(DateTime)
+
+# Impressão digital de cada arquivo de origem já carregado, por tabela
+class LoadManifest(StateBase):
+    __tablename__ = 'LoadManifest'
+    TableName = Column(String(255), primary_key=True)
+    FileName = Column(String(255), primary_key=True)
+    FileSize = Column(BigInteger)
+    ModifiedTime = Column(Float)
+    ContentHash = Column(String(128))
+    LoadedAt = Column(DateTime)
+
+# Índices mantidos pelo index_advisor.py, recriados após as cargas
+class AdvisedIndex(StateBase):
+    __tablename__ = 'AdvisedIndex'
+    IndexName = Column(String(255), primary_key=True)
+    TableName = Column(String(255))
+    Columns = Column(String(1024))
+    IncludeColumns = Column(String(1024))
+    Speedup = Column(Float)
+    CreatedAt = Column(DateTime)
+
+# Melhor tamanho de lote de gravação encontrado por destino (banco) e tabela
+class LoadProfile(StateBase):
+    __tablename__ = 'LoadProfile'
+    Target = Column(String(255), primary_key=True)
+    TableName = Column(String(255), primary_key=True)
+    BatchSize = Column(BigInteger)
+    RowsPerSecond = Column(Float)
+    UpdatedAt = Column(DateTime)
+
+# Tamanho dos blocos lidos ao calcular o hash de um arquivo
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def create_state_tables(engine):
+    StateBase.metadata.create_all(engine)
+
+def get_watermark(connection, table_name):
+    table = LoadWatermark.__table__
+    return connection.execute(
+        select(table.c.ModifiedDate).where(table.c.TableName == table_name)
+    ).scalar()
+
+def set_watermark(connection, table_name, modified_date):
+    table = LoadWatermark.__table__
+    values = {'ModifiedDate': modified_date, 'UpdatedAt': datetime.now()}
+    result = connection.execute(table.update().where(table.c.TableName == table_name).values(**values))
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(TableName=table_name, **values))
+
+def modified_dates(df, column='ModifiedDate'):
+    modified = df[column]
+    if modified.dtype == object:
+        modified = pd.to_datetime(modified, format=MODIFIED_DATE_FORMAT)
+    return modified
+
+def filter_chunks_by_watermark(chunks, watermark, column='ModifiedDate'):
+    # Repassa apenas as linhas com ModifiedDate posterior à marca d'água
+    for df in chunks:
+        if watermark is not None:
+            df = df[modified_dates(df, column) > watermark]
+        if df.empty:
+            continue
+        yield df
+
+def track_modified_date(state, key, df, column, newest):
+    if df.empty:
+        return
+    dates = modified_dates(df, column)
+    value = (dates.max() if newest else dates.min()).to_pydatetime()
+    if state.get(key) is None or (value > state[key] if newest else value < state[key]):
+        state[key] = value
+
+def watermark_hook(state, column='ModifiedDate'):
+    # batch_hook dos escritores: guarda em state o maior ModifiedDate das linhas gravadas e o
+    # menor das linhas recusadas uma a uma pela quarentena (desviadas para o arquivo de rejeitadas)
+    @contextmanager
+    def record_after_write(connection, df):
+        try:
+            yield
+        except Exception:
+            if len(df) == 1:
+                track_modified_date(state, 'min_dropped_date', df, column, newest=False)
+            raise
+        track_modified_date(state, 'max_modified_date', df, column, newest=True)
+    return record_after_write
+
+def watermark_guard(function, state, column='ModifiedDate'):
+    # Envolve um estágio que remove linhas do bloco (ex.: drop_orphans) e guarda em state o menor
+    # ModifiedDate das linhas removidas
+    def guarded(df, *args):
+        kept = function(df, *args)
+        if len(kept) < len(df):
+            track_modified_date(state, 'min_dropped_date', df.loc[df.index.difference(kept.index)], column, newest=False)
+        return kept
+    return guarded
+
+def next_watermark(state, reloadable):
+    # Maior ModifiedDate gravado. Com reloadable (upsert, em que reler linhas já gravadas é
+    # inofensivo), a marca fica logo abaixo da linha desviada mais antiga, que volta a ser lida
+    # na próxima carga incremental depois de corrigidos os dados ou as tabelas pai.
+    watermark = state.get('max_modified_date')
+    dropped = state.get('min_dropped_date')
+    if watermark is not None and reloadable and dropped is not None:
+        watermark = min(watermark, dropped - timedelta(microseconds=1))
+    return watermark
+
+def hash_file(file_path, block_size=HASH_BLOCK_SIZE):
+    # Leitura incremental: o arquivo nunca é carregado inteiro em memória
+    digest = hashlib.blake2b()
+    with open_source(file_path) as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def get_manifest_entry(connection, table_name, file_name):
+    table = LoadManifest.__table__
+    return connection.execute(
+        select(table).where(table.c.TableName == table_name, table.c.FileName == file_name)
+    ).first()
+
+def check_file_fingerprint(file_path, entry):
+    # Retorna (inalterado, impressão_digital). Tamanho e mtime iguais dispensam o hash;
+    # caso contrário o conteúdo é comparado pelo hash
+    size, modified_time = source_stat(file_path)
+    fingerprint = {'FileSize': size, 'ModifiedTime': modified_time}
+    if entry is not None and entry.FileSize == size and entry.ModifiedTime == modified_time:
+        fingerprint['ContentHash'] = entry.ContentHash
+        return True, fingerprint
+    fingerprint['ContentHash'] = hash_file(file_path)
+    unchanged = entry is not None and entry.ContentHash == fingerprint['ContentHash']
+    return unchanged, fingerprint
+
+def record_manifest_entry(connection, table_name, file_name, fingerprint):
+    table = LoadManifest.__table__
+    values = dict(fingerprint, LoadedAt=datetime.now())
+    result = connection.execute(
+        table.update()
+        .where(table.c.TableName == table_name, table.c.FileName == file_name)
+        .values(**values)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(TableName=table_name, FileName=file_name, **values))
+
+def get_load_profile(connection, target, table_name):
+    table = LoadProfile.__table__
+    return connection.execute(
+        select(table).where(table.c.Target == target, table.c.TableName == table_name)
+    ).first()
+
+def record_load_profile(connection, target, table_name, batch_size, rows_per_second):
+    table = LoadProfile.__table__
+    values = {'BatchSize': batch_size, 'RowsPerSecond': rows_per_second, 'UpdatedAt': datetime.now()}
+    result = connection.execute(
+        table.update()
+        .where(table.c.Target == target, table.c.TableName == table_name)
+        .values(**values)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(Target=target, TableName=table_name, **values))
@@ -0,0 +1,138 @@
+import json
+import os
+import resource
+import time
+from datetime import datetime
+
+from source_files import source_bytes
+
+# Onde e em que formato gravar as métricas da carga ('jsonl' ou 'prometheus')
+METRICS_PATH = os.getenv('METRICS_PATH')
+METRICS_FORMAT = os.getenv('METRICS_FORMAT', 'jsonl')
+
+LOAD_STAGES = ['read', 'transform', 'references', 'changes', 'compact', 'write']
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def current_memory_bytes():
+    # RSS atual (Linux); nos demais sistemas, o pico do processo
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def new_file_metrics(table_name, file_path):
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'table': table_name,
+        'file': os.path.basename(file_path),
+        'bytes_read': source_bytes(file_path),
+        'status': 'running',
+        'seconds': 0.0,
+        'peak_memory_bytes': current_memory_bytes(),
+        'stages': {stage: {'seconds': 0.0, 'rows': 0} for stage in LOAD_STAGES},
+    }
+
+def record_memory(metrics):
+    metrics['peak_memory_bytes'] = max(metrics['peak_memory_bytes'], current_memory_bytes())
+
+def measure_chunks(chunks, metrics, stage):
+    # Tempo gasto produzindo cada bloco (ex.: leitura do CSV)
+    stage_metrics = metrics['stages'][stage]
+    iterator = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        try:
+            df = next(iterator)
+        except StopIteration:
+            stage_metrics['seconds'] += time.perf_counter() - start
+            return
+        stage_metrics['seconds'] += time.perf_counter() - start
+        stage_metrics['rows'] += len(df)
+        record_memory(metrics)
+        yield df
+
+def measure_each(chunks, metrics, stage, function, *args):
+    # Tempo gasto apenas em function(bloco, *args), sem incluir os estágios anteriores
+    stage_metrics = metrics['stages'][stage]
+    for df in chunks:
+        start = time.perf_counter()
+        df = function(df, *args)
+        stage_metrics['seconds'] += time.perf_counter() - start
+        stage_metrics['rows'] += len(df)
+        yield df
+
+def measure_writer(chunks, metrics, write):
+    # write(blocos) consome o gerador; o tempo de escrita é o total menos o tempo
+    # gasto esperando os blocos dos estágios anteriores
+    pulled = {'stages': {'pull': {'seconds': 0.0, 'rows': 0}}, 'peak_memory_bytes': 0}
+
+    start = time.perf_counter()
+    pulled_chunks = measure_chunks(chunks, pulled, 'pull')
+    try:
+        result = write(pulled_chunks)
+    finally:
+        # Encerra os estágios anteriores (e suas threads) mesmo que a escrita pare no meio
+        pulled_chunks.close()
+    elapsed = time.perf_counter() - start
+
+    metrics['seconds'] = elapsed
+    metrics['stages']['write']['seconds'] = elapsed - pulled['stages']['pull']['seconds']
+    metrics['stages']['write']['rows'] = pulled['stages']['pull']['rows']
+    metrics['status'] = 'error' if result is None else 'ok'
+    record_memory(metrics)
+    return result
+
+def format_jsonl(records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+def format_prometheus(records):
+    lines = [
+        '# HELP etl_load_stage_seconds Tempo de parede por estágio da carga.',
+        '# TYPE etl_load_stage_seconds gauge',
+    ]
+    for record in records:
+        for stage, values in record['stages'].items():
+            lines.append(f'etl_load_stage_seconds{{table="{record["table"]}",stage="{stage}"}} {values["seconds"]:.6f}')
+    lines += ['# HELP etl_load_stage_rows Linhas processadas por estágio da carga.', '# TYPE etl_load_stage_rows gauge']
+    for record in records:
+        for stage, values in record['stages'].items():
+            lines.append(f'etl_load_stage_rows{{table="{record["table"]}",stage="{stage}"}} {values["rows"]}')
+    lines += ['# HELP etl_load_queue_depth Blocos em espera na fila após cada estágio, em média.',
+              '# TYPE etl_load_queue_depth gauge']
+    for record in records:
+        for stage, values in record.get('queues', {}).items():
+            lines.append(f'etl_load_queue_depth{{table="{record["table"]}",stage="{stage}"}} {values["mean_depth"]:.3f}')
+    lines += ['# HELP etl_load_queue_wait_seconds Tempo bloqueado na fila após cada estágio (put: fila cheia; get: fila vazia).',
+              '# TYPE etl_load_queue_wait_seconds gauge']
+    for record in records:
+        for stage, values in record.get('queues', {}).items():
+            for side in ('put', 'get'):
+                lines.append(f'etl_load_queue_wait_seconds{{table="{record["table"]}",stage="{stage}",side="{side}"}} {values[f"{side}_wait_seconds"]:.6f}')
+    lines += ['# HELP etl_load_bytes_read Bytes do arquivo de origem.', '# TYPE etl_load_bytes_read gauge']
+    lines += [f'etl_load_bytes_read{{table="{r["table"]}"}} {r["bytes_read"]}' for r in records]
+    lines += ['# HELP etl_load_peak_memory_bytes Pico de memória (RSS) durante a carga do arquivo.',
+              '# TYPE etl_load_peak_memory_bytes gauge']
+    lines += [f'etl_load_peak_memory_bytes{{table="{r["table"]}"}} {r["peak_memory_bytes"]}' for r in records]
+    lines += ['# HELP etl_load_success 1 se a carga do arquivo foi confirmada (ou ignorada por não ter mudado).',
+              '# TYPE etl_load_success gauge']
+    lines += [f'etl_load_success{{table="{r["table"]}"}} {int(r["status"] in ("ok", "skipped"))}' for r in records]
+    return '\n'.join(lines) + '\n'
+
+def write_metrics(records, path=None, metrics_format=None):
+    path = path or METRICS_PATH
+    metrics_format = metrics_format or METRICS_FORMAT
+    if not path or not records:
+        return
+    if metrics_format == 'prometheus':
+        # Arquivo inteiro reescrito de forma atômica (coletor textfile do node_exporter)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(format_prometheus(records))
+        os.replace(temp_path, path)
+    elif metrics_format == 'jsonl':
+        with open(path, 'a') as f:
+            f.write(format_jsonl(records))
+    else:
+        raise ValueError(f"Formato de métricas desconhecido: {metrics_format}")
@@ -0,0 +1,134 @@
+from sqlalchemy import Column, Integer, String, Boolean, Float, Numeric, Date, Text, DateTime, ForeignKey, ForeignKeyConstraint, Uuid
+from sqlalchemy.orm import declarative_base
+
+# Modelos das tabelas de destino, sem pandas nem configuração: importados também pelos
+# comandos leves de cli.py (ex.: plan)
+
+# Definição da base declarativa
+Base = declarative_base()
+
+# Definindo a classe de modelo para SalesOrderDetail
+class SalesOrderDetail(Base):
+    __tablename__ = 'SalesOrderDetail'
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ['SpecialOfferID', 'ProductID'],
+            ['SpecialOfferProduct.SpecialOfferID', 'SpecialOfferProduct.ProductID'],
+        ),
+    )
+    SalesOrderID = Column(Integer, ForeignKey('SalesOrderHeader.SalesOrderID'), primary_key=True)
+    SalesOrderDetailID = Column(Integer, primary_key=True)
+    CarrierTrackingNumber = Column(String(255))
+    OrderQty = Column(Integer)
+    ProductID = Column(Integer)
+    SpecialOfferID = Column(Integer)
+    UnitPrice = Column(Float)
+    UnitPriceDiscount = Column(Float)
+    LineTotal = Column(Float)
+    rowguid = Column(Uuid(as_uuid=False))
+    ModifiedDate = Column(DateTime)
+
+# Definindo a classe de modelo para SalesOrderHeader
+class SalesOrderHeader(Base):
+    __tablename__ = 'SalesOrderHeader'
+    SalesOrderID = Column(Integer, primary_key=True)
+    RevisionNumber = Column(Integer)
+    OrderDate = Column(Date)
+    DueDate = Column(Date)
+    ShipDate = Column(Date)
+    Status = Column(String(50))
+    OnlineOrderFlag = Column(Boolean)
+    SalesOrderNumber = Column(String(50))
+    PurchaseOrderNumber = Column(String(50))
+    AccountNumber = Column(String(50))
+    CustomerID = Column(Integer, ForeignKey('Customer.CustomerID'))
+    SalesPersonID = Column(Integer)
+    TerritoryID = Column(Integer)
+    BillToAddressID = Column(Integer)
+    ShipToAddressID = Column(Integer)
+    ShipMethodID = Column(Integer)
+    CreditCardID = Column(Integer)
+    CreditCardApprovalCode = Column(String(50))
+    CurrencyRateID = Column(Integer)
+    SubTotal = Column(Numeric(18, 2))
+    TaxAmt = Column(Numeric(18, 2))
+    Freight = Column(Numeric(18, 2))
+    TotalDue = Column(Numeric(18, 2))
+    Comment = Column(Text)
+    rowguid = Column(Uuid(as_uuid=False))
+    ModifiedDate = Column(DateTime)
+
+# Definindo a classe de modelo para Product
+class Product(Base):
+    __tablename__ = 'Product'
+    ProductID = Column(Integer, primary_key=True)
+    Name = Column(String(255))
+    ProductNumber = Column(String(50))
+    MakeFlag = Column(Boolean)
+    FinishedGoodsFlag = Column(Boolean)
+    Color = Column(String(50))
+    SafetyStockLevel = Column(Integer)
+    ReorderPoint = Column(Integer)
+    StandardCost = Column(Numeric(18, 2))
+    ListPrice = Column(Numeric(18, 2))
+    Size = Column(String(50))
+    SizeUnitMeasureCode = Column(String(10))
+    WeightUnitMeasureCode = Column(String(10))
+    Weight = Column(Numeric(18, 2))
+    DaysToManufacture = Column(Integer)
+    ProductLine = Column(String(2))
+    Class = Column(String(2))
+    Style = Column(String(50))
+    ProductSubcategoryID = Column(Integer)
+    ProductModelID = Column(Integer)
+    SellStartDate = Column(Date)
+    SellEndDate = Column(Date)
+    DiscontinuedDate = Column(Date)
+    rowguid = Column(Uuid(as_uuid=False))
+    ModifiedDate = Column(DateTime)
+
+# Definindo a classe de modelo para SpecialOfferProduct
+class SpecialOfferProduct(Base):
+    __tablename__ = 'SpecialOfferProduct'
+    SpecialOfferID = Column(Integer, primary_key=True)
+    ProductID = Column(Integer, ForeignKey('Product.ProductID'), primary_key=True)
+    rowguid = Column(Uuid(as_uuid=False))
+    ModifiedDate = Column(DateTime)
+
+# Definindo a classe de modelo para Customer
+class Customer(Base):
+    __tablename__ = 'Customer'
+    CustomerID = Column(Integer, primary_key=True)
+    PersonID = Column(Integer, ForeignKey('Person.BusinessEntityID'))
+    StoreID = Column(Integer)
+    TerritoryID = Column(Integer)
+    AccountNumber = Column(String(50))
+    rowguid = Column(Uuid(as_uuid=False))
+    ModifiedDate = Column(DateTime)
+
+# Definindo a classe de modelo para Person
+class Person(Base):
+    __tablename__ = 'Person'
+    BusinessEntityID = Column(Integer, primary_key=True)
+    PersonType = Column(String(2))
+    NameStyle = Column(Boolean)
+    Title = Column(String(50))
+    FirstName = Column(String(50))
+    MiddleName = Column(String(50))
+    LastName = Column(String(50))
+    Suffix = Column(String(10))
+    EmailPromotion = Column(Integer)
+    AdditionalContactInfo = Column(Text)
+    Demographics = Column(Text)
+    rowguid = Column(Uuid(as_uuid=False))
+    ModifiedDate = Column(DateTime)
+
+# Mapeamento dos nomes dos arquivos para as classes de modelo
+file_to_class_mapping = {
+    'Sales.Customer': Customer,
+    'Person.Person': Person,
+    'Production.Product': Product,
+    'Sales.SalesOrderDetail': SalesOrderDetail,
+    'Sales.SalesOrderHeader': SalesOrderHeader,
+    'Sales.SpecialOfferProduct': SpecialOfferProduct
+}
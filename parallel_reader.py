@@ -0,0 +1,119 @@
+import codecs
+import io
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pandas as pd
+
+from coercion import CSV_DELIMITER, build_read_options
+from source_files import is_plain_file, open_source, source_bytes
+
+# Processos usados para interpretar um único arquivo (padrão: um por núcleo)
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', '0')) or os.cpu_count() or 1
+
+# Arquivos menores que isso são interpretados no próprio processo: iniciar os processos
+# do pool custa mais do que se ganha
+PARALLEL_MIN_BYTES = int(os.getenv('PARALLEL_MIN_MB', '64')) * 1024 * 1024
+
+# Bytes lidos do início dos dados para estimar o tamanho médio de uma linha
+LINE_SAMPLE_BYTES = 1024 * 1024
+
+# Pool compartilhado por todos os arquivos (e threads da carga), criado no primeiro uso
+parse_pools = {}
+parse_pools_lock = threading.Lock()
+
+def get_parse_pool(workers):
+    # 'spawn' em vez de fork: a carga roda em várias threads (scheduler.py)
+    with parse_pools_lock:
+        if workers not in parse_pools:
+            parse_pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+        return parse_pools[workers]
+
+def read_header(file_path):
+    # Cabeçalho lido uma única vez: nomes das colunas e posição do primeiro byte de dados
+    with open_source(file_path) as f:
+        first_line = f.readline()
+    header = first_line[len(codecs.BOM_UTF8):] if first_line.startswith(codecs.BOM_UTF8) else first_line
+    names = header.decode('utf-8').rstrip('\r\n').split(CSV_DELIMITER)
+    return [name.strip('"') for name in names], len(first_line)
+
+def average_line_bytes(file_path, data_start):
+    with open_source(file_path) as f:
+        f.read(data_start)
+        sample = f.read(LINE_SAMPLE_BYTES)
+    return max(len(sample) / max(sample.count(b'\n'), 1), 1)
+
+def byte_ranges(file_path, data_start, range_bytes):
+    # Faixas [início, fim) que terminam sempre logo após uma quebra de linha. Supõe, como nos
+    # arquivos de origem, que nenhum campo entre aspas contenha quebras de linha.
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        start = data_start
+        while start < size:
+            end = start + range_bytes
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            end = min(end, size)
+            yield start, end
+            start = end
+
+def stream_ranges(file_path, data_start, range_bytes):
+    # Arquivos comprimidos não permitem saltar para uma posição: o fluxo descomprimido é lido em
+    # sequência, em faixas que terminam logo após uma quebra de linha, entregues inteiras ao pool
+    with open_source(file_path) as f:
+        f.read(data_start)
+        while True:
+            data = f.read(range_bytes)
+            if not data:
+                return
+            yield data + f.readline()
+
+def parse_bytes(data, names, read_options):
+    # Executado nos processos do pool: mesmas regras de separador, decimal, NULL e tipos do
+    # leitor 'pandas'; sem BOM, pois a faixa começa depois do cabeçalho
+    options = dict(read_options, encoding='utf-8', header=None, names=names)
+    return pd.read_csv(io.BytesIO(data), **options)
+
+def parse_range(file_path, start, end, names, read_options):
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return parse_bytes(data, names, read_options)
+
+def read_csv_in_parallel(file_path, chunksize, model_class, workers=None):
+    # Divide o arquivo em faixas de ~chunksize linhas, interpreta-as em um pool de processos e
+    # entrega os DataFrames na ordem do arquivo, com no máximo 2 faixas por processo em andamento
+    workers = workers or PARSE_WORKERS
+    names, data_start = read_header(file_path)
+    read_options = build_read_options(model_class, file_path)
+    range_bytes = int(chunksize * average_line_bytes(file_path, data_start))
+    # Cada tarefa é (função, argumentos): faixas de bytes do arquivo em disco, lidas pelos
+    # próprios processos, ou faixas já descomprimidas
+    if is_plain_file(file_path):
+        tasks = ((parse_range, (file_path, start, end, names, read_options)) for start, end in byte_ranges(file_path, data_start, range_bytes))
+    else:
+        tasks = ((parse_bytes, (data, names, read_options)) for data in stream_ranges(file_path, data_start, range_bytes))
+
+    if workers == 1 or source_bytes(file_path) < PARALLEL_MIN_BYTES:
+        for function, args in tasks:
+            yield function(*args)
+        return
+
+    pool = get_parse_pool(workers)
+    pending = deque()
+    try:
+        for function, args in tasks:
+            pending.append(pool.submit(function, *args))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Se o consumidor parar antes do fim (ex.: erro na gravação), descarta as faixas pendentes
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+
+from arrow_reader import pa, arrow_schema_for, arrow_types_mapper
+from load_state import hash_file
+from source_files import source_stat
+
+if pa is not None:
+    import pyarrow.parquet as pq
+
+# Diretório do cache Parquet (vazio desativa o cache) e limite de tamanho
+PARQUET_CACHE_DIR = os.getenv('PARQUET_CACHE_DIR')
+PARQUET_CACHE_MAX_MB = int(os.getenv('PARQUET_CACHE_MAX_MB', '2048'))
+
+def schema_fingerprint(model_class):
+    # Muda quando o modelo muda, invalidando arquivos tipados com a definição antiga
+    definition = ';'.join(f'{column.name}:{column.type!r}' for column in model_class.__table__.columns)
+    return hashlib.blake2b(definition.encode(), digest_size=4).hexdigest()
+
+def source_hash(cache_dir, file_path, model_class):
+    # Hash do conteúdo guardado em <tabela>.source.json junto com o caminho, o tamanho e o mtime
+    # do arquivo de origem: enquanto eles não mudam, o arquivo não é relido a cada carga
+    size, modified_time = source_stat(file_path)
+    source = {'path': os.path.abspath(file_path), 'size': size, 'mtime': modified_time}
+    index_path = os.path.join(cache_dir, f'{model_class.__tablename__}.source.json')
+    try:
+        with open(index_path) as f:
+            known = json.load(f)
+        if {key: known.get(key) for key in source} == source:
+            return known['hash']
+    except (OSError, ValueError, KeyError):
+        pass
+    source['hash'] = hash_file(file_path)
+    temp_path = f'{index_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(source, f)
+    os.replace(temp_path, index_path)
+    return source['hash']
+
+def cache_path_for(cache_dir, file_path, model_class, content_hash=None):
+    # content_hash: hash já calculado pela carga (ex.: manifesto de skip_unchanged)
+    content_hash = (content_hash or source_hash(cache_dir, file_path, model_class))[:32]
+    return os.path.join(cache_dir, f'{model_class.__tablename__}-{content_hash}-{schema_fingerprint(model_class)}.parquet')
+
+def read_cached_chunks(cache_path, chunksize, memory_map=True):
+    # Atualiza o mtime para a política LRU
+    os.utime(cache_path)
+    parquet_file = pq.ParquetFile(cache_path, memory_map=memory_map)
+    for batch in parquet_file.iter_batches(batch_size=chunksize):
+        yield batch.to_pandas(types_mapper=arrow_types_mapper)
+
+def write_through_cache(chunks, cache_path, model_class, max_mb):
+    # Repassa os blocos ao próximo estágio e grava cada um no Parquet; o arquivo
+    # só passa a valer (rename) quando todos os blocos foram lidos sem erro
+    temp_path = f'{cache_path}.{os.getpid()}.tmp'
+    writer = None
+    try:
+        for df in chunks:
+            if writer is None:
+                schema = arrow_schema_for(model_class, df.columns)
+                writer = pq.ParquetWriter(temp_path, schema)
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+            yield df
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(temp_path, cache_path)
+            evict_least_recently_used(os.path.dirname(cache_path), max_mb)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def evict_least_recently_used(cache_dir, max_mb):
+    entries = []
+    for file_name in os.listdir(cache_dir):
+        if file_name.endswith('.parquet'):
+            stat = os.stat(os.path.join(cache_dir, file_name))
+            entries.append((stat.st_mtime, stat.st_size, file_name))
+    total = sum(size for _, size, _ in entries)
+    limit = max_mb * 1024 * 1024
+    for _, size, file_name in sorted(entries):
+        if total <= limit:
+            break
+        os.remove(os.path.join(cache_dir, file_name))
+        total -= size
+        print(f"Cache Parquet: {file_name} removido (limite de {max_mb} MB).")
+
+def cached_chunks(read_chunks, file_path, model_class, chunksize, cache_dir=None, max_mb=None, content_hash=None):
+    # read_chunks() gera os blocos já tipados e limpos a partir do CSV; é chamado só em caso de falta no cache
+    if pa is None:
+        raise ImportError("O cache Parquet requer o pacote pyarrow (pip install pyarrow).")
+    cache_dir = cache_dir or PARQUET_CACHE_DIR
+    max_mb = max_mb or PARQUET_CACHE_MAX_MB
+    os.makedirs(cache_dir, exist_ok=True)
+
+    cache_path = cache_path_for(cache_dir, file_path, model_class, content_hash)
+    if os.path.exists(cache_path):
+        print(f"Cache Parquet: usando {os.path.basename(cache_path)}.")
+        return read_cached_chunks(cache_path, chunksize)
+    return write_through_cache(read_chunks(), cache_path, model_class, max_mb)
@@ -0,0 +1,234 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Column, Date, ForeignKeyConstraint, MetaData, Table, create_engine, inspect, select, text
+
+# Cria SalesOrderHeader e SalesOrderDetail particionadas por mês de OrderDate (só PostgreSQL)
+PARTITION_ORDERS = os.getenv('PARTITION_ORDERS') == '1'
+
+# Coluna de partição; SalesOrderDetail não tem a data e recebe a OrderDate do seu cabeçalho
+PARTITION_COLUMN = 'OrderDate'
+PARTITIONED_TABLES = ('SalesOrderHeader', 'SalesOrderDetail')
+
+# Linhas buscadas por vez ao ler as datas dos pedidos
+ORDER_DATE_FETCH_ROWS = 100000
+
+def quote(connection, name):
+    return connection.dialect.identifier_preparer.quote(name)
+
+def layout_metadata(metadata):
+    # Os modelos com as tabelas de pedidos no layout particionado: chave primária acrescida da
+    # coluna de partição (o PostgreSQL exige) e sem a FK do detalhe para o cabeçalho, que não
+    # teria uma chave única só com SalesOrderID para referenciar (ver CHECK_REFERENCES)
+    layout = MetaData()
+    for table in metadata.sorted_tables:
+        if table.name not in PARTITIONED_TABLES:
+            table.to_metadata(layout)
+    for name in PARTITIONED_TABLES:
+        table = metadata.tables[name]
+        columns = [Column(column.name, column.type, primary_key=column.primary_key or column.name == PARTITION_COLUMN)
+                   for column in table.columns]
+        if PARTITION_COLUMN not in table.columns:
+            columns.append(Column(PARTITION_COLUMN, Date, primary_key=True))
+        foreign_keys = [
+            ForeignKeyConstraint([column.name for column in fk.columns],
+                                 [f'{element.column.table.name}.{element.column.name}' for element in fk.elements])
+            for fk in table.foreign_key_constraints if fk.referred_table.name not in PARTITIONED_TABLES
+        ]
+        Table(name, layout, *columns, *foreign_keys, postgresql_partition_by=f'RANGE ("{PARTITION_COLUMN}")')
+    return layout
+
+def partitioned_table_names(connection):
+    if connection.dialect.name != 'postgresql':
+        return set()
+    rows = connection.exec_driver_sql(
+        "SELECT c.relname FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relnamespace = current_schema()::regnamespace"
+    )
+    return {row[0] for row in rows}
+
+def create_partitioned_tables(engine, metadata):
+    # Cria as tabelas ainda inexistentes, as de pedidos já particionadas; as partições mensais
+    # são criadas pela carga conforme os meses aparecem (ensure_partitions)
+    if engine.dialect.name != 'postgresql':
+        raise ValueError(f"Particionamento não suportado para o dialeto {engine.dialect.name}.")
+    with engine.begin() as connection:
+        partitioned = partitioned_table_names(connection)
+        inspector = inspect(connection)
+        for name in PARTITIONED_TABLES:
+            if name not in partitioned and inspector.has_table(name):
+                print(f"Tabela {name} já existe sem particionamento; recrie-a para usar o layout particionado.")
+        layout_metadata(metadata).create_all(connection)
+
+def partition_name(table_name, month):
+    return f'{table_name}_{month.year:04d}_{month.month:02d}'
+
+def month_bounds(month):
+    # Intervalo [primeiro dia do mês, primeiro dia do mês seguinte) de um pd.Period mensal
+    return month.start_time.date(), (month + 1).start_time.date()
+
+def local_key_columns(table):
+    # Chave do modelo, única dentro de cada partição: é a do ON CONFLICT dos escritores
+    return [column.name for column in table.primary_key if column.name != PARTITION_COLUMN]
+
+def attached_partitions(connection, table_name):
+    rows = connection.execute(
+        text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+             "WHERE i.inhparent = CAST(:parent AS regclass) ORDER BY c.relname"),
+        {'parent': quote(connection, table_name)},
+    )
+    return [row[0] for row in rows]
+
+def create_partition(connection, table, month):
+    name = partition_name(table.name, month)
+    start, end = month_bounds(month)
+    keys = ', '.join(quote(connection, key) for key in local_key_columns(table))
+    connection.exec_driver_sql(
+        f"CREATE TABLE {quote(connection, name)} PARTITION OF {quote(connection, table.name)} "
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+    connection.exec_driver_sql(f"CREATE UNIQUE INDEX {quote(connection, name + '_key')} ON {quote(connection, name)} ({keys})")
+
+def ensure_partitions(connection, table, months):
+    # Cria, na transação da carga, as partições que faltam para os meses do bloco. Uma tabela
+    # com o nome da partição que não esteja anexada (separada com detach) não é reaproveitada:
+    # a carga para (RuntimeError não é um erro de linha para a quarentena).
+    attached = set(attached_partitions(connection, table.name))
+    inspector = inspect(connection)
+    for month in sorted(months):
+        name = partition_name(table.name, month)
+        if name in attached:
+            continue
+        if inspector.has_table(name):
+            raise RuntimeError(f"A tabela {name} existe, mas não é partição de {table.name}; anexe-a (attach) ou remova-a antes da carga.")
+        create_partition(connection, table, month)
+
+def partition_table(table, name):
+    # A partição como uma tabela comum para os escritores, com a chave local
+    return Table(name, MetaData(), *[
+        Column(column.name, column.type, primary_key=column.name in local_key_columns(table)) for column in table.columns
+    ])
+
+def order_date_source(model_class):
+    # FK do detalhe para o cabeçalho (de onde vem a OrderDate), ou None para o próprio cabeçalho
+    if PARTITION_COLUMN in model_class.__table__.columns:
+        return None
+    return next(fk for fk in model_class.__table__.foreign_key_constraints if fk.referred_table.name in PARTITIONED_TABLES)
+
+def load_order_dates(engine, fk):
+    # Chave do pedido -> OrderDate, ordenadas pela chave para a busca binária
+    header = fk.referred_table
+    key = fk.elements[0].column.name
+    ids, dates = [], []
+    with engine.connect() as connection:
+        result = connection.execution_options(yield_per=ORDER_DATE_FETCH_ROWS).execute(select(header.c[key], header.c[PARTITION_COLUMN]))
+        for rows in result.partitions():
+            frame = pd.DataFrame(rows, columns=[key, PARTITION_COLUMN])
+            ids.append(frame[key].to_numpy(dtype=np.int64))
+            dates.append(pd.to_datetime(frame[PARTITION_COLUMN]).to_numpy(dtype='datetime64[ns]'))
+    ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+    dates = np.concatenate(dates) if dates else np.empty(0, dtype='datetime64[ns]')
+    order = np.argsort(ids, kind='stable')
+    return ids[order], dates[order]
+
+def lookup_order_dates(order_dates, keys):
+    # OrderDate do cabeçalho de cada linha; NaT quando o pedido não existe
+    ids, dates = order_dates
+    keys = keys.to_numpy(dtype=np.int64)
+    found = np.zeros(len(keys), dtype=bool)
+    positions = np.searchsorted(ids, keys)
+    inside = positions < len(ids)
+    found[inside] = ids[positions[inside]] == keys[inside]
+    result = np.full(len(keys), np.datetime64('NaT'), dtype='datetime64[ns]')
+    result[found] = dates[positions[found]]
+    return result
+
+def delete_moved_rows(connection, table, df):
+    # Upsert: a mesma chave gravada em outro mês (a OrderDate do pedido mudou) sai da partição
+    # antiga antes da gravação na nova, pois a chave local não é única entre partições
+    keys = local_key_columns(table)
+    columns = keys + [PARTITION_COLUMN]
+    arrays = ', '.join(
+        f"CAST(:v{i} AS {table.c[name].type.compile(dialect=connection.dialect)}[])" for i, name in enumerate(columns)
+    )
+    aliases = ', '.join(f'v{i}' for i in range(len(columns)))
+    matches = ' AND '.join(f"t.{quote(connection, name)} = v.v{i}" for i, name in enumerate(keys))
+    values = {f'v{i}': df[name].to_numpy(dtype=object).tolist() for i, name in enumerate(keys)}
+    values[f'v{len(keys)}'] = df[PARTITION_COLUMN].dt.date.tolist()
+    connection.execute(text(
+        f"DELETE FROM {quote(connection, table.name)} AS t USING unnest({arrays}) AS v({aliases}) "
+        f"WHERE {matches} AND t.{quote(connection, PARTITION_COLUMN)} <> v.v{len(keys)}"
+    ), values)
+
+def partition_router(engine, model_class, mode='append'):
+    # route(connection, bloco) dos escritores: cria as partições dos meses do bloco e devolve
+    # [(partição, linhas do bloco desse mês)], gravadas diretamente nas partições
+    table = layout_metadata(model_class.metadata).tables[model_class.__tablename__]
+    source = order_date_source(model_class)
+    # As datas dos pedidos são lidas uma vez por arquivo: o cabeçalho é carregado antes do detalhe
+    order_dates = load_order_dates(engine, source) if source is not None else None
+
+    def route(connection, df):
+        if order_dates is not None:
+            df = df.assign(**{PARTITION_COLUMN: lookup_order_dates(order_dates, df[source.elements[0].parent.name])})
+        dates = pd.to_datetime(df[PARTITION_COLUMN])
+        if dates.isna().any():
+            raise ValueError(f"{int(dates.isna().sum())} linhas sem {PARTITION_COLUMN} (ou sem cabeçalho do pedido): não há partição para elas.")
+        df = df.assign(**{PARTITION_COLUMN: dates})
+        months = dates.dt.to_period('M')
+        ensure_partitions(connection, table, set(months))
+        if mode == 'upsert':
+            delete_moved_rows(connection, table, df)
+        return [(partition_table(table, partition_name(table.name, month)), part) for month, part in df.groupby(months)]
+    return route
+
+def detach_partition(connection, table_name, month, drop=False):
+    # O mês sai das consultas na hora, sem apagar linha a linha; a tabela separada mantém os dados
+    # (para consulta, cópia ou attach) até ser removida com drop
+    name = partition_name(table_name, month)
+    connection.exec_driver_sql(f"ALTER TABLE {quote(connection, table_name)} DETACH PARTITION {quote(connection, name)}")
+    if drop:
+        connection.exec_driver_sql(f"DROP TABLE {quote(connection, name)}")
+
+def attach_partition(connection, table_name, month):
+    # Anexa de volta uma partição separada (ou uma tabela preparada com o mesmo nome e colunas);
+    # o PostgreSQL confere se todas as linhas estão no intervalo do mês
+    name = partition_name(table_name, month)
+    start, end = month_bounds(month)
+    connection.exec_driver_sql(
+        f"ALTER TABLE {quote(connection, table_name)} ATTACH PARTITION {quote(connection, name)} "
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+
+def scanned_partitions(connection, sql, table_name):
+    # Partições de table_name que aparecem no plano da consulta (as demais foram podadas)
+    plan = '\n'.join(row[0] for row in connection.exec_driver_sql(f'EXPLAIN {sql}'))
+    return [name for name in attached_partitions(connection, table_name) if f' on {quote(connection, name)}' in plan or f' on {name}' in plan]
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    from summaries import full_queries
+
+    load_dotenv()
+    database_url = os.getenv('DATABASE_URL')
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    if not database_url or command not in ('list', 'explain', 'attach', 'detach') or (command in ('attach', 'detach') and len(sys.argv) < 4):
+        print("Uso: DATABASE_URL=... python partitioning.py [list|explain|attach <tabela> <AAAA-MM>|detach <tabela> <AAAA-MM> [--drop]]")
+        sys.exit(2)
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        if command == 'attach':
+            attach_partition(connection, sys.argv[2], pd.Period(sys.argv[3], 'M'))
+        elif command == 'detach':
+            detach_partition(connection, sys.argv[2], pd.Period(sys.argv[3], 'M'), drop='--drop' in sys.argv[4:])
+        elif command == 'explain':
+            # Consulta 5 de `respostas em SQL.sql`: deve ler apenas a partição de setembro de 2011
+            scanned = scanned_partitions(connection, full_queries['large_orders_september_2011'], 'SalesOrderHeader')
+            total = len(attached_partitions(connection, 'SalesOrderHeader'))
+            print(f"Consulta 5: {len(scanned)} de {total} partições lidas ({', '.join(scanned) or 'nenhuma'}).")
+        else:
+            for table_name in sorted(partitioned_table_names(connection)):
+                print(f"{table_name}: {', '.join(attached_partitions(connection, table_name)) or 'sem partições'}")
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+
+# Blocos que cada fila entre estágios pode guardar (0 executa os estágios em sequência,
+# na mesma thread). Com N, cada estágio fica no máximo N blocos à frente do seguinte.
+PIPELINE_DEPTH = int(os.getenv('PIPELINE_DEPTH', '2'))
+
+# Marca de fim do estágio anterior
+END = object()
+
+def new_queue_metrics(depth):
+    # mean_depth perto de capacity: o estágio seguinte é o gargalo; perto de zero: o anterior.
+    # put_wait_seconds é o tempo em que o produtor ficou bloqueado pela fila cheia, e
+    # get_wait_seconds, o tempo em que o consumidor esperou por um bloco.
+    return {'capacity': depth, 'chunks': 0, 'max_depth': 0, 'mean_depth': 0.0, 'put_wait_seconds': 0.0, 'get_wait_seconds': 0.0}
+
+def record_depth(stats, depth):
+    stats['chunks'] += 1
+    stats['max_depth'] = max(stats['max_depth'], depth)
+    stats['mean_depth'] += (depth - stats['mean_depth']) / stats['chunks']
+
+def put_until_stopped(blocks, item, stop):
+    # put com espera limitada, para que o produtor perceba quando o consumidor desistiu
+    while not stop.is_set():
+        try:
+            blocks.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def staged(chunks, stage, metrics=None, depth=None):
+    # Consome `chunks` em uma thread própria e entrega os blocos por uma fila limitada: o
+    # estágio anterior prepara o bloco N+1 enquanto o seguinte trabalha no bloco N, e a fila
+    # cheia bloqueia o produtor, limitando a memória. Erros do produtor são relançados no
+    # consumidor; se o consumidor parar antes do fim, o produtor é interrompido e fechado.
+    depth = PIPELINE_DEPTH if depth is None else depth
+    if depth <= 0:
+        yield from chunks
+        return
+
+    blocks = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    stats = new_queue_metrics(depth)
+    if metrics is not None:
+        metrics.setdefault('queues', {})[stage] = stats
+
+    def produce():
+        iterator = iter(chunks)
+        try:
+            for df in iterator:
+                start = time.perf_counter()
+                if not put_until_stopped(blocks, (df, None), stop):
+                    return
+                stats['put_wait_seconds'] += time.perf_counter() - start
+            put_until_stopped(blocks, (END, None), stop)
+        except BaseException as e:
+            put_until_stopped(blocks, (END, e), stop)
+        finally:
+            # Libera os recursos do estágio anterior (ex.: faixas pendentes do leitor 'parallel')
+            if hasattr(iterator, 'close'):
+                iterator.close()
+
+    producer = threading.Thread(target=produce, name=f'etl-{stage}', daemon=True)
+    producer.start()
+    try:
+        while True:
+            depth_now = blocks.qsize()
+            start = time.perf_counter()
+            df, error = blocks.get()
+            stats['get_wait_seconds'] += time.perf_counter() - start
+            if error is not None:
+                raise error
+            if df is END:
+                return
+            record_depth(stats, depth_now)
+            yield df
+    finally:
+        stop.set()
+        producer.join()
+
+async def async_chunks(chunks):
+    # Para escritores asyncio: cada bloco é buscado em uma thread, sem bloquear o event loop
+    iterator = iter(chunks)
+    try:
+        while True:
+            df = await asyncio.to_thread(next, iterator, END)
+            if df is END:
+                return
+            yield df
+    finally:
+        if hasattr(iterator, 'close'):
+            await asyncio.to_thread(iterator.close)
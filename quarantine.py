@@ -0,0 +1,74 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import exc
+
+from compaction import expand_compact_columns
+
+# Pasta dos arquivos de linhas rejeitadas (vazia desativa a quarentena)
+REJECT_DIR = os.getenv('REJECT_DIR')
+
+def is_row_error(error, dbapi):
+    # Erros causados pelo conteúdo das linhas (tipo, tamanho, chave duplicada...);
+    # os demais (conexão, tabela inexistente) continuam abortando a carga
+    if isinstance(error, exc.StatementError) and not isinstance(error, exc.DBAPIError):
+        return True
+    if isinstance(error, exc.DBAPIError):
+        error = error.orig
+    row_errors = (ValueError, TypeError)
+    if dbapi is not None:
+        row_errors += (dbapi.DataError, dbapi.IntegrityError)
+    return isinstance(error, row_errors)
+
+def new_run_id():
+    # Identifica uma carga nos nomes dos arquivos de rejeitadas e de órfãs: cada carga confirmada
+    # grava os seus, sem apagar os de cargas anteriores que ainda não foram recarregados
+    return datetime.now().strftime('%Y%m%dT%H%M%S%f')
+
+def reject_path_for(reject_dir, table_name, run_id=None):
+    if run_id:
+        return os.path.join(reject_dir, f'{table_name}.{run_id}.rejects.csv')
+    return os.path.join(reject_dir, f'{table_name}.rejects.csv')
+
+def append_rejects(df, errors, path):
+    # Mesmas convenções dos arquivos de origem, mais a coluna com o erro, para correção e recarga
+    df = expand_compact_columns(df).copy()
+    df['RejectError'] = errors
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    write_header = not os.path.exists(path)
+    df.to_csv(path, sep=';', decimal=',', na_rep='NULL', index=False, mode='a', header=write_header)
+
+def write_rejects(rejects, path):
+    # rejects: [(linhas, motivos)] guardados durante a carga; gravados de uma vez depois do
+    # commit, para que uma transação desfeita não deixe linhas no arquivo
+    if rejects:
+        df = pd.concat([rows for rows, _ in rejects])
+        append_rejects(df, [error for _, errors in rejects for error in errors], path)
+
+def write_with_quarantine(connection, df, write_batch, rejects, on_written=None):
+    # Tenta gravar o lote inteiro em um SAVEPOINT; se falhar por causa das linhas,
+    # divide o lote ao meio recursivamente até isolar as linhas com erro, que são guardadas
+    # em rejects (ver write_rejects). Retorna a quantidade de linhas rejeitadas.
+    # on_written(resultado de write_batch), se informado, só é chamado depois que o SAVEPOINT
+    # é liberado, para que as contagens não incluam gravações desfeitas
+    try:
+        with connection.begin_nested():
+            result = write_batch(connection, df)
+    except Exception as e:
+        if not is_row_error(e, connection.dialect.dbapi):
+            raise
+        if len(df) == 1:
+            message = str(getattr(e, 'orig', None) or e).strip().splitlines()[0]
+            rejects.append((df, [message]))
+            return 1
+    else:
+        if on_written:
+            on_written(result)
+        return 0
+
+    middle = len(df) // 2
+    return (
+        write_with_quarantine(connection, df.iloc[:middle], write_batch, rejects, on_written)
+        + write_with_quarantine(connection, df.iloc[middle:], write_batch, rejects, on_written)
+    )
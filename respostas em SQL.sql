@@ -39,16 +39,16 @@ ORDER BY
 --3
 
 SELECT 
-    p.FirstName || ' ' || p.LastName AS CustomerName,
-    COUNT(soh.SalesOrderID) AS OrderCount
+    p."FirstName" || ' ' || p."LastName" AS CustomerName,
+    COUNT(soh."SalesOrderID") AS OrderCount
 FROM 
     "Customer" c
 JOIN 
-    "Person" p ON c.PersonID = p.BusinessEntityID
+    "Person" p ON c."PersonID" = p."BusinessEntityID"
 LEFT JOIN 
-    Sales.SalesOrderHeader soh ON c.CustomerID = soh.CustomerID
+    "SalesOrderHeader" soh ON c."CustomerID" = soh."CustomerID"
 GROUP BY 
-    p.FirstName, p.LastName
+    p."FirstName", p."LastName"
 ORDER BY 
     OrderCount DESC, CustomerName;
 	
@@ -0,0 +1,165 @@
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger, Column, MetaData, Table, Uuid, and_, select
+
+from compaction import uuid_text
+from key_cache import pack_keys, packs_exactly
+from upsert import upsert_insert
+
+# Pula as linhas cujo conteúdo não mudou desde a última carga (ver drop_unchanged)
+DETECT_CHANGES = os.getenv('DETECT_CHANGES') == '1'
+
+# Linhas buscadas por vez ao ler os hashes gravados
+HASH_FETCH_ROWS = 100000
+
+# Tabelas <tabela>RowHash: chave primária da tabela de destino e o hash das demais colunas
+row_hash_metadata = MetaData()
+
+def row_hash_table(table):
+    name = f'{table.name}RowHash'
+    if name not in row_hash_metadata.tables:
+        Table(
+            name,
+            row_hash_metadata,
+            *[Column(column.name, column.type, primary_key=True) for column in table.primary_key],
+            Column('RowHash', BigInteger),
+        )
+    return row_hash_metadata.tables[name]
+
+def key_columns(table):
+    return [column.name for column in table.primary_key]
+
+def row_hashes(df, table):
+    # Hash (siphash do pandas) das colunas fora da chave, igual para qualquer representação
+    # do mesmo valor: leitores pandas/arrow/cache, blocos compactados ou não
+    keys = set(key_columns(table))
+    canonical = {}
+    for column in table.columns:
+        if column.name in keys or column.name not in df.columns:
+            continue
+        series = df[column.name]
+        if pd.api.types.is_integer_dtype(series):
+            series = series.astype('Int64')
+        elif pd.api.types.is_bool_dtype(series):
+            series = series.astype('boolean')
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            series = series.astype('datetime64[ns]')
+        elif series.dtype.kind == 'S':
+            # UUID compactado em 16 bytes: só esta coluna volta para texto
+            series = uuid_text(series)
+        elif isinstance(column.type, Uuid):
+            series = series.astype(object).str.upper()
+        canonical[column.name] = series
+    return pd.util.hash_pandas_object(pd.DataFrame(canonical, index=df.index), index=False).to_numpy().view(np.int64)
+
+def sorted_run(keys, hashes):
+    order = np.argsort(keys, kind='stable')
+    return keys[order], hashes[order]
+
+def merge_runs(older, newer):
+    # Junta duas sequências ordenadas; para a mesma chave, vale o hash da mais nova
+    keys = np.concatenate([older[0], newer[0]])
+    hashes = np.concatenate([older[1], newer[1]])
+    keys, hashes = sorted_run(keys, hashes)
+    last = np.append(keys[1:] != keys[:-1], True)
+    return keys[last], hashes[last]
+
+def add_run(runs, keys, hashes):
+    # Hashes vistos em sequências ordenadas de tamanho crescente: cada bloco vira uma sequência,
+    # fundida com a anterior enquanto esta não for mais que o dobro dela. A busca faz poucas
+    # buscas binárias por bloco, sem reordenar a tabela inteira a cada bloco.
+    runs.append(sorted_run(keys, hashes))
+    while len(runs) > 1 and len(runs[-2][0]) <= 2 * len(runs[-1][0]):
+        newer = runs.pop()
+        runs.append(merge_runs(runs.pop(), newer))
+
+def lookup(runs, keys):
+    # Hash conhecido de cada chave (da sequência mais nova que a contém) e se foi encontrado
+    hashes = np.zeros(len(keys), dtype=np.int64)
+    found = np.zeros(len(keys), dtype=bool)
+    for run_keys, run_hashes in reversed(runs):
+        pending = np.flatnonzero(~found)
+        if not len(pending) or not len(run_keys):
+            continue
+        positions = np.searchsorted(run_keys, keys[pending])
+        inside = positions < len(run_keys)
+        matches = pending[inside][run_keys[positions[inside]] == keys[pending[inside]]]
+        hashes[matches] = run_hashes[np.searchsorted(run_keys, keys[matches])]
+        found[matches] = True
+    return hashes, found
+
+def load_row_hashes(engine, table):
+    # Hashes gravados apenas das linhas que ainda existem no destino (se a tabela foi esvaziada,
+    # as linhas voltam a ser gravadas)
+    hash_table = row_hash_table(table)
+    hash_table.create(engine, checkfirst=True)
+    names = key_columns(table)
+    join = hash_table.join(table, and_(*[hash_table.c[name] == table.c[name] for name in names]))
+    query = select(*[hash_table.c[name] for name in names], hash_table.c.RowHash).select_from(join)
+    exact = packs_exactly(list(table.primary_key))
+    keys, hashes = [], []
+    with engine.connect() as connection:
+        result = connection.execution_options(yield_per=HASH_FETCH_ROWS).execute(query)
+        for rows in result.partitions():
+            frame = pd.DataFrame(rows, columns=names + ['RowHash'])
+            keys.append(pack_keys(frame[names], exact))
+            hashes.append(frame['RowHash'].to_numpy(dtype=np.int64))
+    runs = []
+    if keys:
+        add_run(runs, np.concatenate(keys), np.concatenate(hashes))
+    return runs
+
+def new_change_state(engine, model_class, updates=True):
+    # updates=False (modo append): uma chave já gravada não pode ser gravada de novo, então
+    # vale a primeira ocorrência no arquivo e as seguintes são descartadas
+    table = model_class.__table__
+    return {
+        'runs': load_row_hashes(engine, table),
+        'exact': packs_exactly(list(table.primary_key)),
+        'updates': updates,
+        'duplicates': 0,
+        'unchanged': 0,
+    }
+
+def drop_unchanged(df, model_class, state):
+    # Remove do bloco as chaves repetidas (vale a última ocorrência) e as linhas cujo hash é
+    # igual ao da última gravação, inclusive as de blocos anteriores do mesmo arquivo
+    table = model_class.__table__
+    names = key_columns(table)
+    deduplicated = df.drop_duplicates(subset=names, keep='last' if state['updates'] else 'first')
+    state['duplicates'] += len(df) - len(deduplicated)
+
+    keys = pack_keys(deduplicated[names], state['exact'])
+    hashes = row_hashes(deduplicated, table)
+    known, found = lookup(state['runs'], keys)
+    same = found & (known == hashes)
+    changed = ~found | (~same if state['updates'] else False)
+    state['unchanged'] += int(same.sum())
+    state['duplicates'] += int((found & ~same & ~changed).sum())
+    if changed.any():
+        add_run(state['runs'], keys[changed], hashes[changed])
+    return deduplicated[changed]
+
+def record_row_hashes(connection, table, df):
+    # Grava (chave, hash) das linhas gravadas no destino, na mesma transação
+    if df.empty:
+        return
+    hash_table = row_hash_table(table)
+    names = key_columns(table)
+    records = df[names].astype(object).to_dict('records')
+    for record, row_hash in zip(records, row_hashes(df, table).tolist()):
+        record['RowHash'] = row_hash
+    insert = upsert_insert(connection.dialect.name)(hash_table)
+    insert = insert.on_conflict_do_update(index_elements=names, set_={'RowHash': insert.excluded.RowHash})
+    connection.execute(insert, records)
+
+def row_hash_hook(model_class):
+    # batch_hook dos escritores: registra os hashes depois que o bloco foi gravado
+    @contextmanager
+    def record_after_write(connection, df):
+        yield
+        record_row_hashes(connection, model_class.__table__, df)
+    return record_after_write
@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Quantidade de tabelas carregadas em paralelo (respeitando as chaves estrangeiras)
+LOAD_WORKERS = int(os.getenv('LOAD_WORKERS', '4'))
+
+def build_dependency_graph(metadata, table_names):
+    # Para cada tabela, o conjunto de tabelas pai (via chaves estrangeiras) que também serão carregadas
+    table_names = set(table_names)
+    graph = {}
+    for name in table_names:
+        parents = {fk.column.table.name for fk in metadata.tables[name].foreign_keys}
+        graph[name] = (parents & table_names) - {name}
+    return graph
+
+def topological_levels(graph):
+    # Agrupa as tabelas em níveis: cada nível depende apenas dos anteriores
+    remaining = {name: set(parents) for name, parents in graph.items()}
+    levels = []
+    while remaining:
+        ready = sorted(name for name, parents in remaining.items() if not parents)
+        if not ready:
+            raise ValueError(f"Dependência circular entre as tabelas: {sorted(remaining)}")
+        levels.append(ready)
+        for name in ready:
+            del remaining[name]
+        for parents in remaining.values():
+            parents.difference_update(ready)
+    return levels
+
+def run_in_dependency_order(graph, load_table, max_workers=4):
+    # Executa load_table(nome) assim que todos os pais tiverem sido confirmados.
+    # load_table deve retornar None em caso de falha; os dependentes são então ignorados.
+    topological_levels(graph)  # valida que o grafo não tem ciclos
+    results = {}
+    pending = {name: set(parents) for name, parents in graph.items()}
+    failed = set()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for name in sorted(pending):
+                parents = pending[name]
+                if parents & failed:
+                    print(f"Tabela {name} ignorada: falha ao carregar {', '.join(sorted(parents & failed))}.")
+                    failed.add(name)
+                    results[name] = None
+                    del pending[name]
+                elif parents <= set(results):
+                    running[pool.submit(load_table, name)] = name
+                    del pending[name]
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"Erro ao carregar a tabela {name}: {e}")
+                    results[name] = None
+                if results[name] is None:
+                    failed.add(name)
+    return results
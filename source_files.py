@@ -0,0 +1,164 @@
+import gzip
+import io
+import os
+import re
+import zipfile
+from contextlib import contextmanager
+
+# Arquivos de origem aceitos: CSV puro, CSV comprimido (gzip ou zstd) e CSVs dentro de um .zip.
+# A tabela é resolvida pelo nome interno, sem as extensões (Sales.Customer.csv.gz -> Sales.Customer).
+CSV_EXTENSION = '.csv'
+COMPRESSED_EXTENSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+ARCHIVE_EXTENSION = '.zip'
+
+# Membros de um .zip são endereçados como <arquivo.zip>/<membro>, e os.path.basename dá o nome do CSV
+ARCHIVE_MEMBER = re.compile(r'^(.*?\.zip)[\\/](.+)$', re.IGNORECASE)
+
+# Bytes do início do conteúdo usados para estimar o número de linhas (estimate_rows) e bytes
+# comprimidos lidos para medir a razão de compressão de .gz e .zst
+ROW_SAMPLE_BYTES = 256 * 1024
+RATIO_SAMPLE_BYTES = 1024 * 1024
+
+def split_archive_path(file_path):
+    # (arquivo .zip, membro) ou None para arquivos comuns
+    match = ARCHIVE_MEMBER.match(file_path)
+    if match and os.path.isfile(match.group(1)):
+        return match.group(1), match.group(2)
+    return None
+
+def compression_for(file_path):
+    return COMPRESSED_EXTENSIONS.get(os.path.splitext(file_path)[1].lower())
+
+def is_plain_file(file_path):
+    # CSV puro em disco: pode ser mapeado em memória e lido por faixas de bytes
+    return split_archive_path(file_path) is None and compression_for(file_path) is None
+
+def source_base_name(file_name):
+    # Nome usado em file_to_class_mapping, ou None se não for um CSV
+    name = os.path.basename(file_name.replace('\\', '/'))
+    if compression_for(name):
+        name = os.path.splitext(name)[0]
+    if not name.lower().endswith(CSV_EXTENSION):
+        return None
+    return name[:-len(CSV_EXTENSION)]
+
+def list_source_files(folder):
+    # (nome base, caminho) dos CSVs da pasta, comprimidos ou não, e dos CSVs dentro dos .zip
+    for file_name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, file_name)
+        if file_name.lower().endswith(ARCHIVE_EXTENSION):
+            with zipfile.ZipFile(path) as archive:
+                members = [info.filename for info in archive.infolist() if not info.is_dir()]
+            for member in sorted(members):
+                yield source_base_name(member), os.path.join(path, member)
+        else:
+            yield source_base_name(file_name), path
+
+def discover_source_files(folder, mapping):
+    # {nome_tabela: (caminho_do_arquivo, classe_modelo)} dos arquivos cujo nome base está em
+    # mapping (file_to_class_mapping); se a tabela aparecer duas vezes, vale o primeiro arquivo
+    files = {}
+    for base_name, file_path in list_source_files(folder):
+        if base_name is None:
+            continue
+        if base_name in mapping:
+            model_class = mapping[base_name]
+            if model_class.__tablename__ in files:
+                print(f"Arquivo ignorado: {file_path}; a tabela {model_class.__tablename__} já vem de {files[model_class.__tablename__][0]}")
+                continue
+            files[model_class.__tablename__] = (file_path, model_class)
+        else:
+            print(f"Não foi encontrado mapeamento para o arquivo: {os.path.relpath(file_path, folder)}")
+    return files
+
+def decompressing_reader(raw, compression):
+    # Fluxo descomprimido sobre um arquivo binário já aberto
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    # pyarrow (dependência opcional) é importado só aqui: listar e amostrar os demais arquivos
+    # (ex.: cli.py plan) não paga a importação
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("Arquivos .zst requerem o pacote pyarrow (pip install pyarrow).") from None
+    # Descompressão nativa do Arrow; o BufferedReader acrescenta readline
+    return io.BufferedReader(pa.input_stream(raw, compression='zstd'))
+
+@contextmanager
+def open_source(file_path):
+    # Fluxo binário com o conteúdo do CSV, descomprimido à medida que é lido, sem arquivo temporário
+    member = split_archive_path(file_path)
+    if member is not None:
+        with zipfile.ZipFile(member[0]) as archive, archive.open(member[1]) as f:
+            yield f
+    elif compression_for(file_path):
+        with open(file_path, 'rb') as raw, decompressing_reader(raw, compression_for(file_path)) as f:
+            yield f
+    else:
+        with open(file_path, 'rb') as f:
+            yield f
+
+@contextmanager
+def open_text_source(file_path):
+    # Texto UTF-8 (sem BOM), para amostras e cabeçalhos
+    with open_source(file_path) as f, io.TextIOWrapper(f, encoding='utf-8-sig', newline='') as text:
+        yield text
+
+def source_stat(file_path):
+    # (tamanho, mtime) para a impressão digital do manifesto: o tamanho descomprimido de um
+    # membro de .zip e o mtime do próprio .zip; os demais arquivos como estão em disco
+    member = split_archive_path(file_path)
+    if member is None:
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime
+    with zipfile.ZipFile(member[0]) as archive:
+        size = archive.getinfo(member[1]).file_size
+    return size, os.stat(member[0]).st_mtime
+
+def source_bytes(file_path):
+    # Bytes lidos do disco (comprimidos, para .gz, .zst e membros de .zip)
+    member = split_archive_path(file_path)
+    if member is None:
+        return os.path.getsize(file_path)
+    with zipfile.ZipFile(member[0]) as archive:
+        return archive.getinfo(member[1]).compress_size
+
+def read_start(file_path, sample_bytes):
+    # (primeiros bytes do conteúdo, tamanho descomprimido estimado). Para .gz e .zst, o tamanho
+    # vem da razão de compressão do trecho lido; para membros de .zip, do índice do arquivo.
+    member = split_archive_path(file_path)
+    if member is not None:
+        with zipfile.ZipFile(member[0]) as archive, archive.open(member[1]) as f:
+            return f.read(sample_bytes), archive.getinfo(member[1]).file_size
+    compression = compression_for(file_path)
+    with open(file_path, 'rb') as raw:
+        if not compression:
+            return raw.read(sample_bytes), os.path.getsize(file_path)
+        f = decompressing_reader(raw, compression)
+        sample = block = f.read(sample_bytes)
+        decompressed = len(sample)
+        # Os descompressores leem o arquivo em buffers grandes: a razão só é confiável depois
+        # de consumir bem mais do que um buffer
+        while block and raw.tell() < RATIO_SAMPLE_BYTES:
+            block = f.read(sample_bytes)
+            decompressed += len(block)
+        consumed = raw.tell()
+        f.close()
+    if not block or len(sample) < sample_bytes:
+        return sample, decompressed
+    return sample, int(os.path.getsize(file_path) * decompressed / max(consumed, 1))
+
+def estimate_rows(file_path, sample_bytes=None):
+    # Colunas do cabeçalho e linhas de dados estimadas pelo início do arquivo, sem lê-lo inteiro
+    # (exact=True quando o arquivo coube na amostra e as linhas foram contadas)
+    sample, total = read_start(file_path, sample_bytes or ROW_SAMPLE_BYTES)
+    header_end = sample.find(b'\n') + 1 or len(sample)
+    header = sample[:header_end].decode('utf-8-sig').rstrip('\r\n')
+    # Mesmo separador de coercion.CSV_DELIMITER (coercion importa o pandas)
+    columns = [name.strip('"') for name in header.split(';')] if header else []
+    body = sample[header_end:]
+    if len(sample) >= total:
+        return {'columns': columns, 'rows': body.count(b'\n') + (1 if body and not body.endswith(b'\n') else 0), 'exact': True}
+    complete = body[:body.rfind(b'\n') + 1]
+    average = len(complete) / max(complete.count(b'\n'), 1)
+    return {'columns': columns, 'rows': round((total - header_end) / max(average, 1)), 'exact': False}
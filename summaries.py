@@ -0,0 +1,342 @@
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import (
+    Column, Integer, BigInteger, Date, Numeric, MetaData, Table, column, create_engine,
+    delete, func, select, table, text, true,
+)
+from sqlalchemy.orm import declarative_base
+
+from upsert import upsert_insert
+
+# Mantém as tabelas de resumo das análises de `respostas em SQL.sql` durante a carga
+MAINTAIN_SUMMARIES = os.getenv('MAINTAIN_SUMMARIES') == '1'
+
+# Limite de TotalDue dos pedidos guardados em SummaryLargeOrder (análise 5)
+LARGE_ORDER_TOTAL_DUE = 1000
+
+# Tabelas de resumo, separadas dos modelos de negócio em Base
+SummaryBase = declarative_base()
+
+# 1. Linhas de detalhe por pedido
+class SummaryOrderLineCount(SummaryBase):
+    __tablename__ = 'SummaryOrderLineCount'
+    SalesOrderID = Column(Integer, primary_key=True)
+    LineCount = Column(BigInteger)
+
+# 2. Quantidade vendida por produto
+class SummaryProductQuantity(SummaryBase):
+    __tablename__ = 'SummaryProductQuantity'
+    ProductID = Column(Integer, primary_key=True)
+    TotalQuantity = Column(BigInteger)
+    LineCount = Column(BigInteger)
+
+# 3. Pedidos por cliente
+class SummaryCustomerOrders(SummaryBase):
+    __tablename__ = 'SummaryCustomerOrders'
+    CustomerID = Column(Integer, primary_key=True)
+    OrderCount = Column(BigInteger)
+
+# 4. Quantidade vendida por produto e data do pedido
+class SummaryProductDailyQuantity(SummaryBase):
+    __tablename__ = 'SummaryProductDailyQuantity'
+    ProductID = Column(Integer, primary_key=True)
+    OrderDate = Column(Date, primary_key=True)
+    TotalQuantity = Column(BigInteger)
+    LineCount = Column(BigInteger)
+
+# 5. Pedidos com TotalDue acima de LARGE_ORDER_TOTAL_DUE
+class SummaryLargeOrder(SummaryBase):
+    __tablename__ = 'SummaryLargeOrder'
+    SalesOrderID = Column(Integer, primary_key=True)
+    OrderDate = Column(Date, index=True)
+    TotalDue = Column(Numeric(18, 2))
+
+# Colunas das tabelas de origem usadas pelos resumos
+order_detail = table('SalesOrderDetail', column('SalesOrderID'), column('ProductID'), column('OrderQty'))
+order_header = table('SalesOrderHeader', column('SalesOrderID'), column('OrderDate'), column('CustomerID'), column('TotalDue'))
+
+def create_summary_tables(engine):
+    SummaryBase.metadata.create_all(engine)
+
+def affected_orders(source, keys):
+    # Sem tabela de chaves, considera todos os pedidos (recálculo completo)
+    if keys is None:
+        return true()
+    return source.c.SalesOrderID.in_(select(keys.c.SalesOrderID))
+
+def order_line_contribution(keys):
+    return (select(order_detail.c.SalesOrderID, func.count().label('LineCount'))
+            .where(affected_orders(order_detail, keys))
+            .group_by(order_detail.c.SalesOrderID))
+
+def product_quantity_contribution(keys):
+    return (select(order_detail.c.ProductID,
+                   func.coalesce(func.sum(order_detail.c.OrderQty), 0).label('TotalQuantity'),
+                   func.count().label('LineCount'))
+            .where(affected_orders(order_detail, keys), order_detail.c.ProductID.is_not(None))
+            .group_by(order_detail.c.ProductID))
+
+def customer_orders_contribution(keys):
+    return (select(order_header.c.CustomerID, func.count().label('OrderCount'))
+            .where(affected_orders(order_header, keys), order_header.c.CustomerID.is_not(None))
+            .group_by(order_header.c.CustomerID))
+
+def product_daily_quantity_contribution(keys):
+    return (select(order_detail.c.ProductID, order_header.c.OrderDate,
+                   func.coalesce(func.sum(order_detail.c.OrderQty), 0).label('TotalQuantity'),
+                   func.count().label('LineCount'))
+            .select_from(order_detail.join(order_header, order_detail.c.SalesOrderID == order_header.c.SalesOrderID))
+            .where(affected_orders(order_detail, keys),
+                   order_detail.c.ProductID.is_not(None), order_header.c.OrderDate.is_not(None))
+            .group_by(order_detail.c.ProductID, order_header.c.OrderDate))
+
+def large_order_contribution(keys):
+    return (select(order_header.c.SalesOrderID, order_header.c.OrderDate, order_header.c.TotalDue)
+            .where(affected_orders(order_header, keys), order_header.c.TotalDue > LARGE_ORDER_TOTAL_DUE))
+
+# Para cada resumo: as tabelas de origem que o alteram, a contribuição das linhas de um
+# conjunto de pedidos e, nos resumos aditivos, a coluna de contagem (linhas com zero são removidas).
+# Resumos não aditivos têm uma linha por pedido e são simplesmente substituídos.
+SUMMARIES = [
+    {'model': SummaryOrderLineCount, 'sources': {'SalesOrderDetail'}, 'contribution': order_line_contribution, 'count_column': None},
+    {'model': SummaryProductQuantity, 'sources': {'SalesOrderDetail'}, 'contribution': product_quantity_contribution, 'count_column': 'LineCount'},
+    {'model': SummaryCustomerOrders, 'sources': {'SalesOrderHeader'}, 'contribution': customer_orders_contribution, 'count_column': 'OrderCount'},
+    {'model': SummaryProductDailyQuantity, 'sources': {'SalesOrderDetail', 'SalesOrderHeader'}, 'contribution': product_daily_quantity_contribution, 'count_column': 'LineCount'},
+    {'model': SummaryLargeOrder, 'sources': {'SalesOrderHeader'}, 'contribution': large_order_contribution, 'count_column': None},
+]
+
+def apply_contribution(connection, summary, keys, sign):
+    # Soma (sign=1) ou subtrai (sign=-1) a contribuição dos pedidos em keys
+    target = summary['model'].__table__
+    primary_keys = [key.name for key in target.primary_key]
+    measures = [c.name for c in target.columns if c.name not in primary_keys]
+    contribution = summary['contribution'](keys).subquery()
+
+    insert = upsert_insert(connection.dialect.name)(target).from_select(
+        primary_keys + measures,
+        # WHERE true evita a ambiguidade do ON CONFLICT após SELECT no SQLite
+        select(*[contribution.c[name] for name in primary_keys],
+               *[contribution.c[name] * sign for name in measures]).where(true()),
+    )
+    insert = insert.on_conflict_do_update(
+        index_elements=primary_keys,
+        set_={name: target.c[name] + insert.excluded[name] for name in measures},
+    )
+    connection.execute(insert)
+
+def remove_contribution(connection, summary, keys):
+    target = summary['model'].__table__
+    if summary['count_column']:
+        apply_contribution(connection, summary, keys, -1)
+    else:
+        connection.execute(delete(target).where(affected_orders(target, keys)))
+
+def add_contribution(connection, summary, keys):
+    target = summary['model'].__table__
+    if summary['count_column']:
+        apply_contribution(connection, summary, keys, 1)
+        connection.execute(delete(target).where(target.c[summary['count_column']] == 0))
+    else:
+        contribution = summary['contribution'](keys)
+        connection.execute(target.insert().from_select([c.name for c in target.columns], contribution))
+
+def create_key_table(connection, order_ids):
+    # Pedidos afetados pelo bloco, em uma tabela temporária da conexão
+    keys = Table('summary_keys', MetaData(), Column('SalesOrderID', Integer, primary_key=True), prefixes=['TEMPORARY'])
+    keys.create(connection)
+    connection.execute(keys.insert(), [{'SalesOrderID': int(order_id)} for order_id in order_ids])
+    return keys
+
+@contextmanager
+def maintained_summaries(connection, table_name, df, metrics=None):
+    # Envolve a gravação de um bloco: antes dela, retira dos resumos a contribuição atual dos
+    # pedidos do bloco; depois, soma a nova. Tudo roda na transação (ou SAVEPOINT) do bloco,
+    # e em caso de erro o rollback também descarta a tabela de chaves.
+    summaries = [summary for summary in SUMMARIES if table_name in summary['sources']]
+    order_ids = df['SalesOrderID'].dropna().unique() if summaries else []
+    if not len(order_ids):
+        yield
+        return
+
+    start = time.perf_counter()
+    keys = create_key_table(connection, order_ids)
+    for summary in summaries:
+        remove_contribution(connection, summary, keys)
+    seconds = time.perf_counter() - start
+
+    yield
+
+    start = time.perf_counter()
+    for summary in summaries:
+        add_contribution(connection, summary, keys)
+    keys.drop(connection)
+    seconds += time.perf_counter() - start
+
+    if metrics is not None:
+        stage = metrics['stages'].setdefault('summary', {'seconds': 0.0, 'rows': 0})
+        stage['seconds'] += seconds
+        stage['rows'] += len(df)
+
+def summary_batch_hook(table_name, metrics=None):
+    # Hook por bloco para os escritores; None se nenhum resumo depende da tabela
+    if not any(table_name in summary['sources'] for summary in SUMMARIES):
+        return None
+    return lambda connection, df: maintained_summaries(connection, table_name, df, metrics)
+
+def rebuild_summaries(engine):
+    # Recalcula todos os resumos a partir das tabelas de origem (ex.: ao ativar a
+    # manutenção em um banco já carregado)
+    with engine.begin() as connection:
+        for summary in SUMMARIES:
+            connection.execute(delete(summary['model'].__table__))
+            add_contribution(connection, summary, None)
+    print("Tabelas de resumo recalculadas.")
+
+# Análises de `respostas em SQL.sql` lidas dos resumos. Na análise 2, o empate no ranking
+# é desfeito pelo nome do produto, aqui e no recálculo, para que o resultado seja determinístico.
+summary_queries = {
+    'order_line_counts': '''
+        SELECT "SalesOrderID", "LineCount" AS QuantidadeLinhas
+        FROM "SummaryOrderLineCount"
+        WHERE "LineCount" >= 3''',
+    'top_products_by_days_to_manufacture': '''
+        WITH Offers AS (
+            SELECT "ProductID", COUNT(*) AS OfferCount
+            FROM "SpecialOfferProduct"
+            GROUP BY "ProductID"
+        ),
+        RankedProducts AS (
+            SELECT
+                p."DaysToManufacture",
+                p."Name",
+                SUM(s."TotalQuantity" * o.OfferCount) AS TotalSold,
+                ROW_NUMBER() OVER (
+                    PARTITION BY p."DaysToManufacture"
+                    ORDER BY SUM(s."TotalQuantity" * o.OfferCount) DESC, p."Name"
+                ) AS RowNumber
+            FROM "SummaryProductQuantity" s
+            JOIN Offers o ON s."ProductID" = o."ProductID"
+            JOIN "Product" p ON s."ProductID" = p."ProductID"
+            GROUP BY p."DaysToManufacture", p."Name"
+        )
+        SELECT "DaysToManufacture", "Name", TotalSold
+        FROM RankedProducts
+        WHERE RowNumber <= 3
+        ORDER BY "DaysToManufacture", TotalSold DESC''',
+    'orders_per_customer': '''
+        SELECT "CustomerID", "OrderCount" AS NumberOfOrders
+        FROM "SummaryCustomerOrders"
+        ORDER BY NumberOfOrders DESC''',
+    'quantity_per_product_and_date': '''
+        SELECT p."Name", s."ProductID", s."OrderDate", s."TotalQuantity"
+        FROM "SummaryProductDailyQuantity" s
+        JOIN "Product" p ON s."ProductID" = p."ProductID"
+        ORDER BY s."OrderDate", p."Name"''',
+    'large_orders_september_2011': '''
+        SELECT "SalesOrderID", "OrderDate", "TotalDue"
+        FROM "SummaryLargeOrder"
+        WHERE "OrderDate" >= '2011-09-01' AND "OrderDate" < '2011-10-01' AND "TotalDue" > 1000
+        ORDER BY "TotalDue" DESC''',
+}
+
+# As mesmas análises recalculadas sobre as tabelas de origem, como em `respostas em SQL.sql`
+full_queries = {
+    'order_line_counts': '''
+        SELECT "SalesOrderID", COUNT(*) AS QuantidadeLinhas
+        FROM "SalesOrderDetail"
+        GROUP BY "SalesOrderID"
+        HAVING COUNT(*) >= 3''',
+    'top_products_by_days_to_manufacture': '''
+        WITH RankedProducts AS (
+            SELECT
+                p."DaysToManufacture",
+                p."Name",
+                SUM(sod."OrderQty") AS TotalSold,
+                ROW_NUMBER() OVER (
+                    PARTITION BY p."DaysToManufacture"
+                    ORDER BY SUM(sod."OrderQty") DESC, p."Name"
+                ) AS RowNumber
+            FROM "SalesOrderDetail" sod
+            JOIN "SpecialOfferProduct" sop ON sod."ProductID" = sop."ProductID"
+            JOIN "Product" p ON sop."ProductID" = p."ProductID"
+            GROUP BY p."DaysToManufacture", p."Name"
+        )
+        SELECT "DaysToManufacture", "Name", TotalSold
+        FROM RankedProducts
+        WHERE RowNumber <= 3
+        ORDER BY "DaysToManufacture", TotalSold DESC''',
+    'orders_per_customer': '''
+        SELECT "CustomerID", COUNT(*) AS NumberOfOrders
+        FROM "SalesOrderHeader"
+        GROUP BY "CustomerID"
+        ORDER BY NumberOfOrders DESC''',
+    'quantity_per_product_and_date': '''
+        SELECT p."Name", sod."ProductID", soh."OrderDate", SUM(sod."OrderQty") AS TotalQuantity
+        FROM "SalesOrderDetail" sod
+        JOIN "SalesOrderHeader" soh ON sod."SalesOrderID" = soh."SalesOrderID"
+        JOIN "Product" p ON sod."ProductID" = p."ProductID"
+        GROUP BY p."Name", sod."ProductID", soh."OrderDate"
+        ORDER BY soh."OrderDate", p."Name"''',
+    'large_orders_september_2011': '''
+        SELECT "SalesOrderID", "OrderDate", "TotalDue"
+        FROM "SalesOrderHeader"
+        WHERE "OrderDate" >= '2011-09-01' AND "OrderDate" < '2011-10-01' AND "TotalDue" > 1000
+        ORDER BY "TotalDue" DESC''',
+}
+
+DATE_TEXT = re.compile(r'^\d{4}-\d{2}-\d{2}( \d{2}:\d{2}:\d{2}(\.\d+)?)?$')
+
+def normalize_value(value):
+    # Somas podem voltar como int ou Decimal e datas como date, datetime ou texto
+    # (o SQLite guarda '2011-09-01 00:00:00.000000'), conforme o dialeto
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return round(float(value), 6)
+    if isinstance(value, str) and DATE_TEXT.match(value):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime) and value.time() == datetime.min.time():
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value if value is None else str(value)
+
+def timed_query(connection, sql):
+    start = time.perf_counter()
+    rows = connection.execute(text(sql)).fetchall()
+    return [tuple(normalize_value(value) for value in row) for row in rows], time.perf_counter() - start
+
+def check_summaries(engine):
+    # Compara cada análise lida dos resumos com o recálculo completo; a ordem das linhas
+    # empatadas no ORDER BY pode variar, então a comparação ignora a ordem
+    results = {}
+    with engine.connect() as connection:
+        for name, sql in summary_queries.items():
+            summary_rows, summary_seconds = timed_query(connection, sql)
+            full_rows, full_seconds = timed_query(connection, full_queries[name])
+            matches = Counter(summary_rows) == Counter(full_rows)
+            results[name] = matches
+            status = 'ok' if matches else 'DIVERGENTE'
+            print(f"{name}: {status} ({len(summary_rows)} linhas; resumo {summary_seconds * 1000:.1f} ms, "
+                  f"recálculo {full_seconds * 1000:.1f} ms)")
+    return results
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    database_url = os.getenv('DATABASE_URL')
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    if not database_url or command not in ('check', 'rebuild'):
+        print("Uso: DATABASE_URL=... python summaries.py [check|rebuild]")
+        sys.exit(2)
+    engine = create_engine(database_url)
+    if command == 'rebuild':
+        rebuild_summaries(engine)
+    else:
+        sys.exit(0 if all(check_summaries(engine).values()) else 1)
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# Os testes importam os módulos do carregador (raiz do repositório) e o gerador de dados
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+# Pedidos detalhados no conjunto gerado; o suficiente para vários blocos com CHUNK_ROWS
+DETAIL_ROWS = 400
+
+# Os arquivos antigos desta pasta são scripts avulsos, não testes
+collect_ignore = ['test.py', 'test2.py', 'insertRawData_test.py']
+
+@pytest.fixture
+def dataset(tmp_path):
+    from generate_data import generate_dataset
+
+    folder = tmp_path / 'csv'
+    generate_dataset(str(folder), DETAIL_ROWS)
+    return folder
+
+@pytest.fixture
+def engine(tmp_path):
+    # Banco SQLite em arquivo, novo a cada teste, com as tabelas de controle e de resumo
+    from database_loader import create_tables
+    from load_profile import create_tuned_engine
+
+    engine = create_tuned_engine(f"sqlite:///{tmp_path / 'carga.db'}")
+    create_tables(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def reject_dir(tmp_path):
+    return tmp_path / 'rejeitadas'
@@ -0,0 +1,33 @@
+import pandas as pd
+from sqlalchemy import func, select
+
+from coercion import CSV_DELIMITER
+from models import Base, file_to_class_mapping
+
+# Funções comuns aos testes: leitura e gravação dos CSVs no formato de origem e contagens no banco
+
+def source_path(folder, table_name):
+    file_name = next(name for name, model_class in file_to_class_mapping.items() if model_class.__tablename__ == table_name)
+    return folder / f'{file_name}.csv'
+
+def model_for(table_name):
+    return next(model_class for model_class in file_to_class_mapping.values() if model_class.__tablename__ == table_name)
+
+def read_source(folder, table_name):
+    # Valores como texto, sem conversão: gravados de volta exatamente como vieram
+    return pd.read_csv(source_path(folder, table_name), sep=CSV_DELIMITER, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+
+def write_source(df, folder, table_name):
+    folder.mkdir(parents=True, exist_ok=True)
+    path = source_path(folder, table_name)
+    df.to_csv(path, sep=CSV_DELIMITER, index=False, encoding='utf-8-sig')
+    return path
+
+def count_rows(engine, table_name):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(Base.metadata.tables[table_name])).scalar()
+
+def read_table(engine, table_name, columns):
+    table = Base.metadata.tables[table_name]
+    with engine.connect() as connection:
+        return connection.execute(select(*[table.c[name] for name in columns]).order_by(*table.primary_key.columns)).all()
@@ -149,14 +149,12 @@ class Person(Base):
     # Relacionamento com Customer
     # customers = relationship("Customer", back_populates="person")
 
-engine = create_engine(DATABASE_URL)
-
 # Função para criar tabelas
-def create_tables():
+def create_tables(engine):
     Base.metadata.create_all(engine)
 
 # Função para processar e inserir dados dos CSVs
-def process_and_insert_data():
+def process_and_insert_data(engine):
     for filename in os.listdir(CSV_FOLDER_PATH):
         if filename.endswith(".csv"):
             filepath = os.path.join(CSV_FOLDER_PATH, filename)
@@ -169,5 +167,6 @@ def process_and_insert_data():
             print(f"Dados inseridos na tabela {table_name}")
 
 if __name__ == "__main__":
-    create_tables()
-    process_and_insert_data()
+    engine = create_engine(DATABASE_URL)
+    create_tables(engine)
+    process_and_insert_data(engine)
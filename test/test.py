@@ -135,10 +135,8 @@ class Person(Base):
     ModifiedDate = Column(DateTime)
 
 
-# Criação do motor do banco de dados
+# URL do banco de dados; o motor é criado em create_db_engine, e não na importação
 DATABASE_URL = os.getenv('DATABASE_URL')
-engine = create_engine(DATABASE_URL)
-Session = scoped_session(sessionmaker(bind=engine))
 
 
 # Carregar a URL do banco de dados e o caminho da pasta CSV das variáveis de ambiente
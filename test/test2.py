@@ -155,10 +155,8 @@ class Person(Base):
     # customers = relationship("Customer", back_populates="person")
 
 
-# Conexão com o Banco de Dados
+# URL do banco de dados; o motor é criado em create_db_engine, e não na importação
 DATABASE_URL = os.getenv('DATABASE_URL')
-engine = create_engine(DATABASE_URL)
-Session = scoped_session(sessionmaker(bind=engine, autoflush=False))
 
 # Caminho da pasta CSV
 CSV_FOLDER_PATH = os.getenv('CSV_FOLDER_PATH')
@@ -203,6 +201,7 @@ def clean_nan_values(df):
             df[column] = df[column].replace({np.nan: None, '': None})
             
 def process_csv_files(engine, csv_folder):
+    Session = scoped_session(sessionmaker(bind=engine, autoflush=False))
     session = Session()
     columns_to_fix = ['StandardCost', 'ListPrice', 'UnitPrice', 'UnitPriceDiscount', 'LineTotal', 'SubTotal', 'Freight', 'TotalDue', 'TaxAmt']
     
@@ -229,6 +228,7 @@ def process_csv_files(engine, csv_folder):
 
 if __name__ == "__main__":
     if DATABASE_URL and CSV_FOLDER_PATH:
+        engine = create_db_engine()
         create_tables(engine)  # Certifique-se de que a função create_tables está definida
         process_csv_files(engine, CSV_FOLDER_PATH)
     else:
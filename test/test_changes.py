@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from database_loader import load_csv_file
+from helpers import count_rows, model_for, read_source, read_table, source_path, write_source
+
+def test_unchanged_rows_are_not_written_again(engine, dataset):
+    path = str(source_path(dataset, 'Customer'))
+    metrics = []
+    first = load_csv_file(engine, path, model_for('Customer'), detect_changes=True, metrics=metrics)
+    # Em append, gravar de novo as mesmas chaves falharia; as linhas iguais nem chegam ao banco
+    second = load_csv_file(engine, path, model_for('Customer'), detect_changes=True, metrics=metrics)
+
+    assert (first, second) == (62, 0)
+    assert [record['unchanged'] for record in metrics] == [0, 62]
+
+def test_only_changed_rows_are_upserted(engine, dataset, tmp_path):
+    load_csv_file(engine, str(source_path(dataset, 'Customer')), model_for('Customer'), mode='upsert', detect_changes=True)
+    df = read_source(dataset, 'Customer')
+    df.loc[5, 'AccountNumber'] = 'AW99999999'
+    changed = write_source(df, tmp_path / 'alterado', 'Customer')
+
+    result = load_csv_file(engine, str(changed), model_for('Customer'), mode='upsert', detect_changes=True)
+
+    assert result == {'inserted': 0, 'updated': 1}
+    assert dict(read_table(engine, 'Customer', ['CustomerID', 'AccountNumber']))[6] == 'AW99999999'
+
+@pytest.mark.parametrize('mode, account', [('append', 'AW00000003'), ('upsert', 'AW00000099')])
+def test_repeated_keys_in_file_are_dropped(engine, dataset, tmp_path, mode, account):
+    # No append vale a primeira ocorrência da chave; no upsert, a última
+    df = read_source(dataset, 'Customer').head(4)
+    repeated = df.iloc[[2]].assign(AccountNumber='AW00000099')
+    path = write_source(pd.concat([df, repeated]), tmp_path / 'repetidos', 'Customer')
+    metrics = []
+
+    load_csv_file(engine, str(path), model_for('Customer'), mode=mode, detect_changes=True, metrics=metrics)
+
+    assert metrics[0]['duplicates'] == 1
+    assert count_rows(engine, 'Customer') == 4
+    assert dict(read_table(engine, 'Customer', ['CustomerID', 'AccountNumber']))[3] == account
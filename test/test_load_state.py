@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pandas as pd
+
+from database_loader import load_csv_file
+from helpers import count_rows, model_for, read_source, source_path, write_source
+from load_state import get_watermark
+
+def newest_modified_date(folder, table_name):
+    return max(datetime.strptime(value, '%Y-%m-%d %H:%M:%S.%f') for value in read_source(folder, table_name)['ModifiedDate'])
+
+def test_incremental_load_reads_only_rows_above_watermark(engine, dataset, tmp_path):
+    path = source_path(dataset, 'Customer')
+    first = load_csv_file(engine, str(path), model_for('Customer'), incremental=True)
+    second = load_csv_file(engine, str(path), model_for('Customer'), incremental=True)
+
+    assert first == count_rows(engine, 'Customer') == 62
+    assert second == 0
+    with engine.connect() as connection:
+        assert get_watermark(connection, 'Customer') == newest_modified_date(dataset, 'Customer')
+
+    # Uma linha nova, mais recente que a marca d'água, é a única gravada na carga seguinte
+    df = read_source(dataset, 'Customer')
+    new_row = df.iloc[[0]].assign(CustomerID='5000', ModifiedDate='2030-01-01 00:00:00.000')
+    newer = write_source(pd.concat([df, new_row]), tmp_path / 'novos', 'Customer')
+    assert load_csv_file(engine, str(newer), model_for('Customer'), incremental=True) == 1
+    with engine.connect() as connection:
+        assert get_watermark(connection, 'Customer') == datetime(2030, 1, 1)
+
+def test_failed_load_keeps_watermark(engine, dataset, tmp_path):
+    path = source_path(dataset, 'Customer')
+    df = read_source(dataset, 'Customer')
+    load_csv_file(engine, str(path), model_for('Customer'), incremental=True)
+
+    # Chave repetida sem quarentena: a carga falha e a marca d'água não avança
+    repeated = df.iloc[[0, 0]].assign(ModifiedDate='2030-01-01 00:00:00.000')
+    failing = write_source(repeated, tmp_path / 'repetidos', 'Customer')
+
+    assert load_csv_file(engine, str(failing), model_for('Customer'), incremental=True) is None
+    with engine.connect() as connection:
+        assert get_watermark(connection, 'Customer') == newest_modified_date(dataset, 'Customer')
+
+def test_unchanged_file_is_skipped(engine, dataset):
+    path = source_path(dataset, 'Customer')
+    metrics = []
+    first = load_csv_file(engine, str(path), model_for('Customer'), skip_unchanged=True, metrics=metrics)
+    second = load_csv_file(engine, str(path), model_for('Customer'), skip_unchanged=True, metrics=metrics)
+
+    assert (first, second) == (62, 0)
+    assert [record['status'] for record in metrics] == ['ok', 'skipped']
+
+def test_changed_file_is_loaded_again(engine, dataset):
+    path = source_path(dataset, 'Customer')
+    load_csv_file(engine, str(path), model_for('Customer'), mode='upsert', skip_unchanged=True)
+    df = read_source(dataset, 'Customer')
+    df.loc[0, 'AccountNumber'] = 'AW99999999'
+    write_source(df, dataset, 'Customer')
+
+    result = load_csv_file(engine, str(path), model_for('Customer'), mode='upsert', skip_unchanged=True)
+
+    assert result == {'inserted': 0, 'updated': 62}
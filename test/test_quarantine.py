@@ -0,0 +1,64 @@
+import pandas as pd
+
+from database_loader import csv_readers, insert_chunks_to_db, load_csv_file, transform_chunk
+from helpers import count_rows, model_for, read_source, source_path, write_source
+
+def conflicting_products(dataset, folder):
+    # Cinco produtos já carregados intercalados com cinco novos
+    df = read_source(dataset, 'Product').head(5)
+    new_rows = df.assign(ProductID=[str(1000 + number) for number in range(5)])
+    mixed = pd.concat([df, new_rows]).sort_index(kind='stable')
+    return write_source(mixed, folder, 'Product')
+
+def test_append_diverts_only_rows_with_errors(engine, dataset, tmp_path, reject_dir):
+    load_csv_file(engine, str(source_path(dataset, 'Product')), model_for('Product'))
+    path = conflicting_products(dataset, tmp_path / 'conflitos')
+
+    inserted = load_csv_file(engine, str(path), model_for('Product'), reject_dir=str(reject_dir))
+
+    assert inserted == 5
+    assert count_rows(engine, 'Product') == 509
+    [reject_file] = reject_dir.glob('Product.*.rejects.csv')
+    rejects = pd.read_csv(reject_file, sep=';')
+    assert sorted(rejects['ProductID']) == [1, 2, 3, 4, 5]
+    assert rejects['RejectError'].str.contains('UNIQUE').all()
+
+def test_each_load_writes_its_own_reject_file(engine, dataset, tmp_path, reject_dir):
+    load_csv_file(engine, str(source_path(dataset, 'Product')), model_for('Product'))
+    path = conflicting_products(dataset, tmp_path / 'conflitos')
+
+    load_csv_file(engine, str(path), model_for('Product'), reject_dir=str(reject_dir))
+    load_csv_file(engine, str(path), model_for('Product'), reject_dir=str(reject_dir))
+
+    files = sorted(reject_dir.glob('Product.*.rejects.csv'))
+    assert len(files) == 2
+    assert [len(pd.read_csv(file, sep=';')) for file in files] == [5, 10]
+
+def test_rolled_back_load_writes_no_rejects(engine, dataset, tmp_path, reject_dir):
+    load_csv_file(engine, str(source_path(dataset, 'Product')), model_for('Product'))
+    path = conflicting_products(dataset, tmp_path / 'conflitos')
+    model_class = model_for('Product')
+    chunks = (transform_chunk(df, model_class) for df in csv_readers['pandas'](str(path), 4, model_class))
+
+    def fail(connection):
+        raise RuntimeError('falha simulada antes do commit')
+
+    result = insert_chunks_to_db(engine, chunks, 'Product', finalize=fail, reject_dir=str(reject_dir))
+
+    assert result is None
+    assert count_rows(engine, 'Product') == 504
+    assert not list(reject_dir.glob('*.csv'))
+
+def test_upsert_counts_exclude_rejected_rows(engine, dataset, tmp_path, reject_dir):
+    df = read_source(dataset, 'Product').head(6)
+    # Nome duplicado viola a restrição única criada só para o teste
+    df.loc[3, 'Name'] = df.loc[1, 'Name']
+    path = write_source(df, tmp_path / 'duplicados', 'Product')
+    with engine.begin() as connection:
+        connection.exec_driver_sql('CREATE UNIQUE INDEX ux_product_name ON "Product" ("Name")')
+
+    result = load_csv_file(engine, str(path), model_for('Product'), mode='upsert', chunksize=6, reject_dir=str(reject_dir))
+
+    assert result == {'inserted': 5, 'updated': 0}
+    [reject_file] = reject_dir.glob('Product.*.rejects.csv')
+    assert list(pd.read_csv(reject_file, sep=';')['ProductID']) == [4]
@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+
+from database_loader import csv_readers, transform_chunk
+from helpers import model_for, source_path
+
+TABLES = ['Product', 'Person', 'Customer', 'SpecialOfferProduct', 'SalesOrderHeader', 'SalesOrderDetail']
+
+def read_all(reader, path, model_class, chunksize):
+    chunks = [transform_chunk(df, model_class) for df in csv_readers[reader](str(path), chunksize, model_class)]
+    df = pd.concat(chunks, ignore_index=True)
+    # None e NaN chegam ao banco como o mesmo NULL
+    return df.where(df.notna(), None)
+
+@pytest.mark.parametrize('table_name', TABLES)
+@pytest.mark.parametrize('reader', ['arrow', 'parallel'])
+def test_readers_match_pandas(dataset, table_name, reader):
+    model_class = model_for(table_name)
+    path = source_path(dataset, table_name)
+    expected = read_all('pandas', path, model_class, 64)
+
+    result = read_all(reader, path, model_class, 64)
+
+    pd.testing.assert_series_equal(result.dtypes, expected.dtypes)
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+import pytest
+
+from database_loader import load_csv_file, reload_diverted_file
+from helpers import count_rows, model_for, read_source, source_path, write_source
+from load_state import get_watermark
+
+# Ofertas por produto mantidas no arquivo cortado: os detalhes das demais ficam órfãos
+KEPT_OFFERS = 300
+
+def load_parents(engine, dataset, tmp_path):
+    # Tabelas pai completas, menos SpecialOfferProduct, cortada em KEPT_OFFERS linhas
+    for table_name in ('Product', 'Person', 'Customer', 'SalesOrderHeader'):
+        load_csv_file(engine, str(source_path(dataset, table_name)), model_for(table_name))
+    offers = read_source(dataset, 'SpecialOfferProduct').head(KEPT_OFFERS)
+    cut = write_source(offers, tmp_path / 'cortado', 'SpecialOfferProduct')
+    load_csv_file(engine, str(cut), model_for('SpecialOfferProduct'))
+    details = read_source(dataset, 'SalesOrderDetail')
+    kept = set(zip(offers['SpecialOfferID'], offers['ProductID']))
+    return details[[pair not in kept for pair in zip(details['SpecialOfferID'], details['ProductID'])]]
+
+def complete_offers(engine, dataset):
+    load_csv_file(engine, str(source_path(dataset, 'SpecialOfferProduct')), model_for('SpecialOfferProduct'), mode='upsert')
+
+def test_orphans_are_diverted_and_kept_until_reloaded(engine, dataset, tmp_path, reject_dir):
+    orphans = load_parents(engine, dataset, tmp_path)
+    path = str(source_path(dataset, 'SalesOrderDetail'))
+    options = {'incremental': True, 'references': True, 'reject_dir': str(reject_dir)}
+
+    first = load_csv_file(engine, path, model_for('SalesOrderDetail'), **options)
+    assert 0 < len(orphans) < 400
+    assert first == 400 - len(orphans)
+    [orphan_file] = reject_dir.glob('SalesOrderDetail.*.orphans.csv')
+    diverted = pd.read_csv(orphan_file, sep=';', dtype=str, keep_default_na=False)
+    assert sorted(diverted['SalesOrderDetailID'], key=int) == sorted(orphans['SalesOrderDetailID'], key=int)
+
+    # A carga seguinte não relê as órfãs (append avança a marca d'água) nem apaga o arquivo
+    assert load_csv_file(engine, path, model_for('SalesOrderDetail'), **options) == 0
+    assert list(reject_dir.glob('SalesOrderDetail.*.orphans.csv')) == [orphan_file]
+
+    complete_offers(engine, dataset)
+    reloaded = reload_diverted_file(engine, str(orphan_file), references=True, reject_dir=str(reject_dir))
+
+    assert reloaded == len(orphans)
+    assert count_rows(engine, 'SalesOrderDetail') == 400
+    assert not orphan_file.exists()
+    assert os.path.exists(f'{orphan_file}.replayed')
+    assert list(reject_dir.glob('*.orphans.csv')) == []
+
+def test_upsert_watermark_stops_before_oldest_orphan(engine, dataset, tmp_path, reject_dir):
+    orphans = load_parents(engine, dataset, tmp_path)
+    path = str(source_path(dataset, 'SalesOrderDetail'))
+    options = {'mode': 'upsert', 'incremental': True, 'references': True, 'reject_dir': str(reject_dir)}
+
+    first = load_csv_file(engine, path, model_for('SalesOrderDetail'), **options)
+    assert first['inserted'] == 400 - len(orphans)
+    oldest_orphan = pd.to_datetime(orphans['ModifiedDate']).min()
+    with engine.connect() as connection:
+        assert get_watermark(connection, 'SalesOrderDetail') < oldest_orphan
+
+    # Com as tabelas pai completas, a próxima carga incremental relê e grava as órfãs
+    complete_offers(engine, dataset)
+    load_csv_file(engine, path, model_for('SalesOrderDetail'), **options)
+    assert count_rows(engine, 'SalesOrderDetail') == 400
+
+def test_reload_rejects_unknown_file_name(engine, tmp_path):
+    path = tmp_path / 'Desconhecida.orphans.csv'
+    path.write_text('x\n')
+    with pytest.raises(ValueError):
+        reload_diverted_file(engine, str(path))
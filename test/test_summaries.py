@@ -0,0 +1,15 @@
+import pytest
+
+from database_loader import process_csv_files
+from summaries import check_summaries
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_summaries_match_full_queries_after_append_and_upsert(engine, dataset, compact):
+    results = process_csv_files(engine, str(dataset), summaries=True, compact=compact, cache_dir='')
+    assert all(result is not None for result in results.values())
+    assert all(check_summaries(engine).values())
+
+    # A segunda carga atualiza as mesmas linhas: os resumos não podem contá-las duas vezes
+    results = process_csv_files(engine, str(dataset), mode='upsert', summaries=True, compact=compact, cache_dir='')
+    assert all(result is not None for result in results.values())
+    assert all(check_summaries(engine).values())
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from database_loader import load_csv_file
+from helpers import count_rows, model_for, read_source, read_table, source_path, write_source
+
+def test_upsert_counts_inserts_then_updates(engine, dataset):
+    path = source_path(dataset, 'Product')
+    first = load_csv_file(engine, str(path), model_for('Product'), mode='upsert')
+    second = load_csv_file(engine, str(path), model_for('Product'), mode='upsert')
+
+    assert first == {'inserted': 504, 'updated': 0}
+    assert second == {'inserted': 0, 'updated': 504}
+    assert count_rows(engine, 'Product') == 504
+
+def test_upsert_updates_existing_rows_and_inserts_new_ones(engine, dataset, tmp_path):
+    load_csv_file(engine, str(source_path(dataset, 'Product')), model_for('Product'), mode='upsert')
+    df = read_source(dataset, 'Product').head(10)
+    df.loc[0, 'Name'] = 'Produto renomeado'
+    new_row = df.iloc[[1]].assign(ProductID='9999', Name='Produto novo')
+    changed = write_source(pd.concat([df, new_row]), tmp_path / 'alterados', 'Product')
+
+    result = load_csv_file(engine, str(changed), model_for('Product'), mode='upsert', chunksize=4)
+
+    assert result == {'inserted': 1, 'updated': 10}
+    assert count_rows(engine, 'Product') == 505
+    names = dict(read_table(engine, 'Product', ['ProductID', 'Name']))
+    assert names[1] == 'Produto renomeado'
+    assert names[9999] == 'Produto novo'
+
+def test_upsert_keeps_last_row_for_repeated_key(engine, dataset, tmp_path):
+    df = read_source(dataset, 'Product').head(3)
+    repeated = df.iloc[[0]].assign(Name='Última versão')
+    path = write_source(pd.concat([df, repeated]), tmp_path / 'repetidos', 'Product')
+
+    result = load_csv_file(engine, str(path), model_for('Product'), mode='upsert')
+
+    assert result == {'inserted': 3, 'updated': 0}
+    assert dict(read_table(engine, 'Product', ['ProductID', 'Name']))[1] == 'Última versão'
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_upsert_with_compact_frames_matches_source(engine, dataset, compact):
+    path = source_path(dataset, 'SalesOrderHeader')
+    result = load_csv_file(engine, str(path), model_for('SalesOrderHeader'), mode='upsert', compact=compact)
+
+    assert result == {'inserted': 100, 'updated': 0}
+    rows = read_table(engine, 'SalesOrderHeader', ['SalesOrderID', 'rowguid'])
+    expected = read_source(dataset, 'SalesOrderHeader')
+    assert [row.rowguid for row in rows] == [value.lower() for value in expected['rowguid']]
@@ -0,0 +1,125 @@
+from contextlib import nullcontext
+from sqlalchemy import Table, MetaData, Column, select, func, and_, true
+from bulk_writers import copy_rows, prepare_records, prepare_rows, resolve_write_method
+from quarantine import new_run_id, reject_path_for, write_rejects, write_with_quarantine
+
+def upsert_insert(dialect_name):
+    # Construtor de INSERT com suporte a ON CONFLICT do dialeto (None nos demais). O módulo do
+    # dialeto é importado aqui, como faz o próprio engine, e não na importação do carregador
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+def get_primary_key_columns(model_class):
+    return [key.name for key in model_class.__table__.primary_key]
+
+def create_staging_table(connection, table):
+    # Tabela temporária com as mesmas colunas do destino, sem restrições
+    staging = Table(
+        f'staging_{table.name}',
+        MetaData(),
+        *[Column(column.name, column.type) for column in table.columns],
+        prefixes=['TEMPORARY'],
+    )
+    staging.create(connection)
+    return staging
+
+def load_staging(connection, staging, df, table, write_method='auto'):
+    if resolve_write_method(connection.dialect.name, write_method) == 'copy':
+        columns, rows = prepare_rows(df, table)
+        copy_rows(connection, staging.name, columns, rows)
+    else:
+        for records in prepare_records(df, table):
+            connection.execute(staging.insert(), records)
+
+def upsert_dataframe(connection, df, model_class, write_method='auto', table=None):
+    # table: outro destino com as colunas do modelo (ex.: uma partição, ver partitioning.py)
+    table = model_class.__table__ if table is None else table
+    dialect_name = connection.dialect.name
+    if upsert_insert(dialect_name) is None:
+        raise ValueError(f"Upsert em lote não suportado para o dialeto {dialect_name}.")
+
+    primary_keys = get_primary_key_columns(model_class)
+    # ON CONFLICT não aceita a mesma chave duas vezes no mesmo comando
+    df = df.drop_duplicates(subset=primary_keys, keep='last')
+    if df.empty:
+        return {'inserted': 0, 'updated': 0}
+
+    # Em caso de erro, o rollback da transação também descarta a tabela de staging
+    staging = create_staging_table(connection, table)
+    load_staging(connection, staging, df, table, write_method)
+
+    join_condition = and_(*[staging.c[key] == table.c[key] for key in primary_keys])
+    updated = connection.execute(
+        select(func.count()).select_from(staging.join(table, join_condition))
+    ).scalar()
+
+    columns = [column.name for column in table.columns if column.name in df.columns]
+    insert = upsert_insert(dialect_name)(table).from_select(
+        columns,
+        # WHERE true evita a ambiguidade do ON CONFLICT após SELECT no SQLite
+        select(*[staging.c[name] for name in columns]).where(true()),
+    )
+    non_key_columns = [name for name in columns if name not in primary_keys]
+    if non_key_columns:
+        insert = insert.on_conflict_do_update(
+            index_elements=primary_keys,
+            set_={name: insert.excluded[name] for name in non_key_columns},
+        )
+    else:
+        insert = insert.on_conflict_do_nothing(index_elements=primary_keys)
+    connection.execute(insert)
+    staging.drop(connection)
+
+    return {'inserted': len(df) - updated, 'updated': updated}
+
+def upsert_chunks_to_db(engine, chunks, model_class, write_method=None, finalize=None, reject_dir=None, batch_hook=None, route=None, run_id=None):
+    # Um comando de merge por bloco; todos os blocos na mesma transação.
+    # Com reject_dir, linhas com erro são isoladas e desviadas em vez de abortar a tabela; elas
+    # vão para <tabela>.<run_id>.rejects.csv depois do commit.
+    # batch_hook(connection, bloco), se informado, é um context manager que envolve cada gravação
+    # route(connection, bloco), se informado, divide o bloco em [(tabela, linhas)] a gravar
+    write_method = write_method or 'auto'
+    table_name = model_class.__tablename__
+    reject_path = reject_path_for(reject_dir, table_name, run_id or new_run_id()) if reject_dir else None
+    rejects = []
+    totals = {'inserted': 0, 'updated': 0}
+    rejected_rows = 0
+
+    def write_batch(connection, df):
+        # Contagens do bloco, somadas a totals só depois do SAVEPOINT (add_counts): se uma parte
+        # falhar, ele desfaz também as anteriores, que a quarentena grava de novo
+        batch_totals = {'inserted': 0, 'updated': 0}
+        with batch_hook(connection, df) if batch_hook else nullcontext():
+            targets = route(connection, df) if route else [(None, df)]
+            for table, part in targets:
+                counts = upsert_dataframe(connection, part, model_class, write_method, table)
+                batch_totals['inserted'] += counts['inserted']
+                batch_totals['updated'] += counts['updated']
+        return batch_totals
+
+    def add_counts(batch_totals):
+        totals['inserted'] += batch_totals['inserted']
+        totals['updated'] += batch_totals['updated']
+
+    try:
+        with engine.begin() as connection:
+            for df in chunks:
+                if reject_path:
+                    rejected_rows += write_with_quarantine(connection, df, write_batch, rejects, add_counts)
+                else:
+                    add_counts(write_batch(connection, df))
+            if finalize:
+                finalize(connection)
+        print(f"Upsert concluído na tabela {table_name}: {totals['inserted']} inseridas, {totals['updated']} atualizadas.")
+        if rejected_rows:
+            write_rejects(rejects, reject_path)
+            print(f"{rejected_rows} linhas rejeitadas na tabela {table_name}; detalhes em {reject_path}.")
+        return totals
+    except Exception as e:
+        print(f"Erro ao fazer upsert na tabela {table_name}: {e}")
+        return None